@@ -0,0 +1,100 @@
+"""\
+Compressed recording benchmark
+
+Writes a noisy tone through bladeRF.CompressedRecorder for each codec
+and number of worker threads, and reports the input rate sustained, the
+compression ratio and the rate of random reads of single buffers.
+
+Usage:
+  bench_compressed.py [--codec=<c>]... [--workers=<n>]... [--num-samples=<n>] [--seconds=<s>] [--file=<f>]
+
+Options:
+  --codec=<c>        Codec, may be repeated [default: zlib lzma].
+  --workers=<n>      Compression threads, may be repeated [default: 1 2 4].
+  --num-samples=<n>  Samples per buffer [default: 16384].
+  --seconds=<s>      How long to record each case [default: 2].
+  --file=<f>         Where to write the recording [default: a temporary file].
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bladeRF.compressed import CompressedRecorder, CompressedReader
+
+
+def make_buffers(num_samples):
+    rng = np.random.RandomState(0)
+    t = np.arange(8 * num_samples)
+    iq = np.empty((len(t), 2), np.int16)
+    iq[:, 0] = 1000 * np.cos(t * 0.05) + 30 * rng.randn(len(t))
+    iq[:, 1] = 1000 * np.sin(t * 0.05) + 30 * rng.randn(len(t))
+    return iq.reshape(8, num_samples, 2)
+
+
+def run(path, codec, num_workers, buffers, seconds):
+    recorder = CompressedRecorder(path, codec=codec, num_workers=num_workers)
+    num_samples = buffers.shape[1]
+    start = time.time()
+    while time.time() - start < seconds:
+        for samples in buffers:
+            # Wait for the workers rather than drop, to measure their rate.
+            while not recorder.write(samples, num_samples):
+                recorder.dropped -= 1
+                time.sleep(0.001)
+    recorder.close()
+    elapsed = time.time() - start
+    ratio = recorder.written * 4.0 / os.path.getsize(path)
+
+    reader = CompressedReader(path)
+    rng = np.random.RandomState(1)
+    starts = rng.randint(0, reader.num_samples - num_samples, 100)
+    read_start = time.time()
+    for offset in starts:
+        reader.read(int(offset), num_samples)
+    read_rate = len(starts) / (time.time() - read_start)
+    reader.close()
+    return recorder.written / elapsed, ratio, read_rate
+
+
+def main(argv):
+    codecs = []
+    workers = []
+    num_samples = 16384
+    seconds = 2.0
+    path = None
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--codec':
+            codecs.append(value)
+        elif name == '--workers':
+            workers.append(int(value))
+        elif name == '--num-samples':
+            num_samples = int(value)
+        elif name == '--seconds':
+            seconds = float(value)
+        elif name == '--file':
+            path = value
+        else:
+            print(__doc__)
+            return 2
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.iqz')
+        os.close(handle)
+    buffers = make_buffers(num_samples)
+    try:
+        for codec in codecs or ['zlib', 'lzma']:
+            for num_workers in workers or [1, 2, 4]:
+                rate, ratio, read_rate = run(path, codec, num_workers, buffers, seconds)
+                print('%-5s %d workers: %7.1f MS/s, ratio %.2f, %6.0f random reads/s'
+                      % (codec, num_workers, rate / 1e6, ratio, read_rate))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+"""\
+Decimator throughput benchmark
+
+Feeds random complex64 buffers through bladeRF.dsp.Decimator and reports
+the sustained input rate, to compare with the 40 MS/s the device can
+deliver.
+
+Usage:
+  bench_decimator.py [--factor=<d>]... [--num-samples=<n>] [--seconds=<s>]
+
+Options:
+  --factor=<d>       Decimation factor, may be repeated [default: 2 4 8 16].
+  --num-samples=<n>  Samples per buffer [default: 16384].
+  --seconds=<s>      How long to run each factor [default: 2].
+"""
+import sys
+import time
+
+import numpy as np
+
+from bladeRF.dsp import Decimator
+
+target_rate = 40e6
+
+
+def run(factor, num_samples, seconds):
+    decimator = Decimator(factor)
+    rng = np.random.RandomState(0)
+    buffers = [(rng.randn(num_samples) + 1j * rng.randn(num_samples)).astype(np.complex64)
+               for _ in range(8)]
+    out = np.empty(decimator.output_size(num_samples), np.complex64)
+    processed = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        for samples in buffers:
+            decimator.process(samples, out=out)
+        processed += num_samples * len(buffers)
+    return processed / (time.time() - start)
+
+
+def main(argv):
+    factors = []
+    num_samples = 16384
+    seconds = 2.0
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--factor':
+            factors.append(int(value))
+        elif name == '--num-samples':
+            num_samples = int(value)
+        elif name == '--seconds':
+            seconds = float(value)
+        else:
+            print(__doc__)
+            return 2
+    failed = False
+    for factor in factors or [2, 4, 8, 16]:
+        rate = run(factor, num_samples, seconds)
+        ok = rate >= target_rate
+        failed = failed or not ok
+        print('factor %3d, %4d taps: %7.1f MS/s input %s'
+              % (factor, Decimator(factor).num_taps, rate / 1e6,
+                 '' if ok else '(below 40 MS/s)'))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
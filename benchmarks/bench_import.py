@@ -0,0 +1,68 @@
+"""\
+Import time benchmark
+
+Measures the wall clock time of 'python -c "import bladeRF"' in fresh
+interpreters, and checks that the lazily loaded modules stay unloaded.
+
+Usage:
+  bench_import.py [--runs=<n>] [--max-ms=<ms>]
+
+Options:
+  --runs=<n>     Number of interpreter runs [default: 20].
+  --max-ms=<ms>  Fail if the median exceeds this many milliseconds.
+"""
+import sys
+import time
+import subprocess
+
+# Modules that 'import bladeRF' must not pull in.
+lazy_modules = ['numpy', 'bladeRF.device', 'bladeRF.narray', 'docopt']
+
+check = ("import sys, bladeRF; "
+         "print(' '.join(m for m in %r if m in sys.modules))" % lazy_modules)
+
+
+def time_import(runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', 'import bladeRF'])
+        timings.append((time.time() - start) * 1000.0)
+    baseline = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        baseline.append((time.time() - start) * 1000.0)
+    return sorted(timings)[runs // 2], sorted(baseline)[runs // 2]
+
+
+def main(argv):
+    runs = 20
+    max_ms = None
+    for arg in argv:
+        if arg.startswith('--runs='):
+            runs = int(arg.split('=', 1)[1])
+        elif arg.startswith('--max-ms='):
+            max_ms = float(arg.split('=', 1)[1])
+        else:
+            print(__doc__)
+            return 2
+
+    loaded = subprocess.check_output([sys.executable, '-c', check]).decode().split()
+    median, baseline = time_import(runs)
+    print('import bladeRF: %.1f ms median over %d runs '
+          '(%.1f ms interpreter startup, %.1f ms for bladeRF)'
+          % (median, runs, baseline, median - baseline))
+
+    failed = False
+    if loaded:
+        print('FAIL: eagerly imported: %s' % ', '.join(loaded))
+        failed = True
+    if max_ms is not None and median > max_ms:
+        print('FAIL: median %.1f ms is over the %.1f ms limit' % (median, max_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
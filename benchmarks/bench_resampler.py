@@ -0,0 +1,62 @@
+"""\
+Rational resampler throughput benchmark
+
+Feeds random complex64 buffers through bladeRF.dsp.Resampler at common
+ratios and reports the sustained input rate.
+
+Usage:
+  bench_resampler.py [--ratio=<up/down>]... [--num-samples=<n>] [--seconds=<s>]
+
+Options:
+  --ratio=<up/down>  Resampling ratio, may be repeated [default: 3/5 4/5 147/160 160/147 2/1].
+  --num-samples=<n>  Samples per buffer [default: 16384].
+  --seconds=<s>      How long to run each ratio [default: 2].
+"""
+import sys
+import time
+
+import numpy as np
+
+from bladeRF.dsp import Resampler
+
+
+def run(up, down, num_samples, seconds):
+    resampler = Resampler(up, down)
+    rng = np.random.RandomState(0)
+    buffers = [(rng.randn(num_samples) + 1j * rng.randn(num_samples)).astype(np.complex64)
+               for _ in range(8)]
+    out = np.empty(resampler.output_size(num_samples) + 1, np.complex64)
+    processed = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        for samples in buffers:
+            resampler.process(samples, out=out)
+        processed += num_samples * len(buffers)
+    return processed / (time.time() - start), resampler.num_branch_taps
+
+
+def main(argv):
+    ratios = []
+    num_samples = 16384
+    seconds = 2.0
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--ratio':
+            up, _, down = value.partition('/')
+            ratios.append((int(up), int(down or 1)))
+        elif name == '--num-samples':
+            num_samples = int(value)
+        elif name == '--seconds':
+            seconds = float(value)
+        else:
+            print(__doc__)
+            return 2
+    for up, down in ratios or [(3, 5), (4, 5), (147, 160), (160, 147), (2, 1)]:
+        rate, num_branch_taps = run(up, down, num_samples, seconds)
+        print('%4d/%-4d %3d taps per phase: %7.1f MS/s input, %7.1f MS/s output'
+              % (up, down, num_branch_taps, rate / 1e6, rate * up / down / 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,75 @@
+"""\
+Spectrum pipeline throughput benchmark
+
+Feeds random complex64 buffers through bladeRF.dsp.SpectrumPipeline with
+a growing number of worker threads and reports the sustained input rate,
+to compare with the 40 MS/s the device can deliver.
+
+Usage:
+  bench_spectrum.py [--workers=<w>]... [--nfft=<n>] [--num-samples=<n>] [--seconds=<s>]
+
+Options:
+  --workers=<w>      Worker threads, may be repeated [default: 1 2 4].
+  --nfft=<n>         FFT size [default: 65536].
+  --num-samples=<n>  Samples per buffer [default: 65536].
+  --seconds=<s>      How long to run each pool size [default: 2].
+"""
+import sys
+import time
+
+import numpy as np
+
+from bladeRF.dsp import SpectrumEstimator, SpectrumPipeline
+
+target_rate = 40e6
+
+
+def run(num_workers, nfft, num_samples, seconds):
+    pipeline = SpectrumPipeline(SpectrumEstimator(nfft), num_workers=num_workers,
+                                num_jobs=4 * num_workers)
+    rng = np.random.RandomState(0)
+    samples = (rng.randn(num_samples) + 1j * rng.randn(num_samples)).astype(np.complex64)
+    processed = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        # Block rather than drop, this measures what the workers sustain.
+        while not pipeline.submit(samples):
+            pipeline.dropped -= 1
+            time.sleep(0.0001)
+        processed += num_samples
+    pipeline.flush()
+    rate = processed / (time.time() - start)
+    pipeline.close()
+    return rate
+
+
+def main(argv):
+    workers = []
+    nfft = 65536
+    num_samples = 65536
+    seconds = 2.0
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name == '--workers':
+            workers.append(int(value))
+        elif name == '--nfft':
+            nfft = int(value)
+        elif name == '--num-samples':
+            num_samples = int(value)
+        elif name == '--seconds':
+            seconds = float(value)
+        else:
+            print(__doc__)
+            return 2
+    failed = False
+    for num_workers in workers or [1, 2, 4]:
+        rate = run(num_workers, nfft, num_samples, seconds)
+        ok = rate >= target_rate
+        failed = failed or not ok
+        print('%2d workers, nfft %6d: %7.1f MS/s input %s'
+              % (num_workers, nfft, rate / 1e6, '' if ok else '(below 40 MS/s)'))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+"""\
+Wideband sweep benchmark
+
+Sweeps the receiver of an attached bladeRF with bladeRF.Sweep, first
+with every step processed inline and then pipelined, and reports sweeps
+per second for both.  Needs a device, unless --simulate is given, in
+which case a stand-in receiver takes as long as the hardware would to
+deliver each capture, and ``--retune`` seconds to retune, so only the
+overlap of processing with capture is measured.
+
+Usage:
+  bench_sweep.py [--start=<hz>] [--steps=<n>] [--sample-rate=<sr>] [--num-samples=<n>] [--nfft=<n>] [--settle=<s>] [--sweeps=<n>] [--simulate] [--retune=<s>]
+
+Options:
+  --start=<hz>         First center frequency [default: 400000000].
+  --steps=<n>          Steps per sweep [default: 100].
+  --sample-rate=<sr>   Sample rate [default: 10000000].
+  --num-samples=<n>    Samples captured per step [default: 16384].
+  --nfft=<n>           FFT size [default: 1024].
+  --settle=<s>         Settling time after each retune [default: 0.005].
+  --sweeps=<n>         Sweeps to time for each mode [default: 5].
+  --simulate           Use a simulated receiver instead of a device.
+  --retune=<s>         Simulated retune time [default: 0.0002].
+"""
+import sys
+import time
+
+import bladeRF
+
+
+class SimulatedModule(object):
+    """Receives silence, as slowly as a device at ``sample_rate``."""
+
+    def __init__(self, sample_rate, retune):
+        self.sample_rate = sample_rate
+        self.retune = retune
+        self.start = time.time()
+        self._frequency = 0
+
+    @property
+    def timestamp(self):
+        return int((time.time() - self.start) * self.sample_rate)
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @frequency.setter
+    def frequency(self, frequency):
+        time.sleep(self.retune)
+        self._frequency = frequency
+
+    def __call__(self, num_samples, samples=None, metadata=None, timeout_ms=0):
+        end = self.start + float(metadata.timestamp + num_samples) / self.sample_rate
+        time.sleep(max(end - time.time(), 0))
+        metadata.actual_count = num_samples
+        return samples
+
+
+class SimulatedDevice(object):
+
+    def __init__(self, sample_rate, retune):
+        self.rx = SimulatedModule(sample_rate, retune)
+        self.tx = self.rx
+
+
+def run(device, frequencies, options, pipelined):
+    sweep = bladeRF.Sweep(device, frequencies, num_samples=options['--num-samples'],
+                          nfft=options['--nfft'], settle=options['--settle'],
+                          pipelined=pipelined)
+    for i in range(options['--sweeps']):
+        sweep.run()
+    sweep.close()
+    return sweep.sweeps_per_second
+
+
+def main(argv):
+    options = {'--start': 400e6, '--steps': 100, '--sample-rate': 10000000,
+               '--num-samples': 16384, '--nfft': 1024, '--settle': 0.005,
+               '--sweeps': 5, '--simulate': False, '--retune': 0.0002}
+    for arg in argv:
+        name, _, value = arg.partition('=')
+        if name not in options:
+            print(__doc__)
+            return 2
+        if name == '--simulate':
+            options[name] = True
+        else:
+            options[name] = type(options[name])(float(value))
+
+    if options['--simulate']:
+        device = SimulatedDevice(options['--sample-rate'], options['--retune'])
+    else:
+        device = bladeRF.Device()
+        device.rx.enabled = True
+        device.rx.sample_rate = options['--sample-rate']
+        device.rx.bandwidth = int(0.75 * options['--sample-rate'])
+        device.rx.config(bladeRF.FORMAT_SC16_Q11_META, 16,
+                         2 * options['--num-samples'], 8, 3500)
+    step = 0.75 * options['--sample-rate']
+    frequencies = [options['--start'] + i * step for i in range(options['--steps'])]
+
+    serial = run(device, frequencies, options, False)
+    pipelined = run(device, frequencies, options, True)
+    print('%d steps of %d samples, %.1f MHz wide' % (
+        options['--steps'], options['--num-samples'], options['--steps'] * step / 1e6))
+    print('serial:    %6.2f sweeps/s' % serial)
+    print('pipelined: %6.2f sweeps/s (%.2fx)' % (pipelined, pipelined / serial))
+    if not options['--simulate']:
+        device.rx.enabled = False
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,10 +1,7 @@
-from ._cffi import ffi, ptop
+import sys
+import importlib
 
-has_numpy = True
-try:
-    import numpy as np
-except ImportError:
-    has_numpy = False
+from ._cffi import ffi, lib, ptop, as_pointer
 
 from .init import (
     open,
@@ -35,6 +32,9 @@ from .ctrl import (
     get_bandwidth,
     set_lpf_mode,
     get_lpf_mode,
+    set_correction,
+    get_correction,
+    calibrate_dc,
     select_band,
     set_frequency,
     get_frequency,
@@ -65,43 +65,6 @@ from .info import (
     get_timestamp
     )
 
-import bladeRF._cffi
-
-# compilation happens here in verify(),
-# all C code must be defined at this point
-# and only after here may the library functions
-# and constants be accessed. hence the many import
-# name tricks used through the implementation
-
-# http://explosm.net/comics/420/
-
-ffi.cdef("""
-float* samples_to_floats(void*, int);
-
-void free(void *ptr);
-""")
-
-bladeRF._cffi.lib = lib = ffi.verify("""
-#include <libbladeRF.h>
-#include <stdlib.h>
-
-/* this helper function is to turn the two 16 bit ints per sample into
- two normalized floats, so that it can be passed directly to
- numpy.frombuffer which can only take two 32-bit floats and turn them
- into a complex64 */
-
-float* samples_to_floats(void *samples, int num_samples) {
-    int i;
-    int16_t* data = (int16_t*)samples;
-    float* buffer = (float*)malloc(2 * num_samples * sizeof(float));
-    for (i = 0; i < num_samples; i++) {
-        buffer[i] = (float)data[i] * (1.0f/2048.0f);
-    }
-    return buffer;
-}
-
-""", libraries=['bladeRF'])
-
 
 def samples_to_floats(samples, num_samples):
     """Call optimized C function to alocate and return pointer to
@@ -112,14 +75,9 @@ def samples_to_floats(samples, num_samples):
 
 def to_float_buffer(raw_samples, num_samples):
     """Return an FFI buffer of I/Q floats."""
-    return bladeRF.ffi.buffer(samples_to_floats(raw_samples, num_samples), 2*num_samples*bladeRF.ffi.sizeof('float'))
+    return ffi.buffer(samples_to_floats(raw_samples, num_samples), 2*num_samples*ffi.sizeof('float'))
 
 
-if has_numpy:
-    def samples_to_narray(samples, num_samples):
-        """Return a numpy array of type complex64 from the samples."""
-        return np.frombuffer(to_float_buffer(samples, num_samples), np.complex64)
-
 # Enums from libbladerf.h 
 MODULE_TX = lib.BLADERF_MODULE_TX
 MODULE_RX = lib.BLADERF_MODULE_RX
@@ -154,6 +112,11 @@ BLADERF_CORR_LMS_DCOFF_Q = lib.BLADERF_CORR_LMS_DCOFF_Q
 BLADERF_CORR_FPGA_PHASE = lib.BLADERF_CORR_FPGA_PHASE
 BLADERF_CORR_FPGA_GAIN = lib.BLADERF_CORR_FPGA_GAIN
 
+BLADERF_DC_CAL_LPF_TUNING = lib.BLADERF_DC_CAL_LPF_TUNING
+BLADERF_DC_CAL_TX_LPF = lib.BLADERF_DC_CAL_TX_LPF
+BLADERF_DC_CAL_RX_LPF = lib.BLADERF_DC_CAL_RX_LPF
+BLADERF_DC_CAL_RXVGA2 = lib.BLADERF_DC_CAL_RXVGA2
+
 FORMAT_SC16_Q11 = lib.BLADERF_FORMAT_SC16_Q11
 FORMAT_SC16_Q11_META = lib.BLADERF_FORMAT_SC16_Q11_META
 
@@ -190,15 +153,54 @@ from .errors import (
     ChecksumError,
     )
 
-from device import (
-    Device,
-    )
-
-
-def power(samples):
-    return 10*np.log10(np.abs(np.vdot(samples, samples)))
 
+# These are imported on first use rather than with the package, so that
+# scripts which only control the device do not pay for numpy or the
+# Device layer at startup.
+_lazy_attributes = {
+    'Device': 'device',
+    'samples_to_narray': 'narray',
+    'narray_to_samples': 'narray',
+    'power': 'narray',
+    'squelched': 'narray',
+    'Squelch': 'squelch',
+    'Timeline': 'timeline',
+    'Sweep': 'sweep',
+    'Recorder': 'recorder',
+    'Playback': 'playback',
+    'CompressedRecorder': 'compressed',
+    'CompressedReader': 'compressed',
+    'RollingRecorder': 'rolling',
+    'SegmentIndex': 'rolling',
+    'TriggeredCapture': 'trigger',
+    }
 
-def squelched(samples, level):
-    return power(samples) < level
 
+def _has_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
+
+
+def __getattr__(name):
+    if name == 'has_numpy':
+        value = _has_numpy()
+    elif name in _lazy_attributes:
+        module = importlib.import_module('.' + _lazy_attributes[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+if sys.version_info < (3, 7):
+    # No module level __getattr__ (PEP 562), import everything now.
+    has_numpy = _has_numpy()
+    for _name in _lazy_attributes:
+        try:
+            __getattr__(_name)
+        except ImportError:
+            pass
@@ -0,0 +1,520 @@
+"""Build script for the bladeRF._bladerf cffi extension module.
+
+The C declarations live next to the python wrappers that use them, as
+``cdef(...)`` calls in the modules listed below.  They are collected
+here from the source, without importing the package, and compiled
+together with the C helpers into an out-of-line API mode module.
+
+This is run by setup.py (see ``cffi_modules``), or directly with
+``python bladeRF/_build.py`` for an in-place build.
+"""
+import os
+import sys
+import ast
+from cffi import FFI
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# Order matters: types must be declared before they are used.
+wrapper_modules = [
+    'ctrl.py',
+    'data.py',
+    'info.py',
+    'init.py',
+    'misc.py',
+    ]
+
+base_cdef = """
+const char * bladerf_strerror(int error);
+
+#define BLADERF_ERR_UNEXPECTED ...
+#define BLADERF_ERR_RANGE ...
+#define BLADERF_ERR_INVAL ...
+#define BLADERF_ERR_MEM ...
+#define BLADERF_ERR_IO ...
+#define BLADERF_ERR_TIMEOUT ...
+#define BLADERF_ERR_NODEV ...
+#define BLADERF_ERR_UNSUPPORTED ...
+#define BLADERF_ERR_MISALIGNED ...
+#define BLADERF_ERR_CHECKSUM ...
+"""
+
+helpers_cdef = """
+float* samples_to_floats(void*, int);
+void samples_to_floats_into(const int16_t *samples, float *out, size_t num_samples);
+size_t floats_to_samples_into(const float *floats, int16_t *out, size_t num_samples, float scale);
+int sync_rx_into(struct bladerf *dev, int16_t *samples, size_t num_samples,
+                 unsigned int chunk_samples, struct bladerf_metadata *metadata,
+                 unsigned int timeout_ms, size_t *transferred,
+                 uint64_t *overruns, size_t max_overruns, size_t *num_overruns);
+int sync_tx_from(struct bladerf *dev, const int16_t *samples, size_t num_samples,
+                 unsigned int chunk_samples, struct bladerf_metadata *metadata,
+                 unsigned int timeout_ms, size_t *transferred);
+
+struct sample_ring;
+struct sample_ring_stats {
+    uint64_t delivered;
+    uint64_t dropped;
+    size_t pending;
+};
+struct sample_ring *sample_ring_new(size_t num_buffers);
+void sample_ring_free(struct sample_ring *ring);
+void sample_ring_start(struct sample_ring *ring, void **buffers,
+                       size_t num_buffers, size_t num_transfers);
+void *sample_ring_callback(struct bladerf *dev, struct bladerf_stream *stream,
+                           struct bladerf_metadata *meta, void *samples,
+                           size_t num_samples, void *user_data);
+size_t sample_ring_get(struct sample_ring *ring, void **buffers, size_t max,
+                       int timeout_ms);
+void sample_ring_release(struct sample_ring *ring, void **buffers, size_t count);
+void sample_ring_shutdown(struct sample_ring *ring);
+void sample_ring_stats(struct sample_ring *ring, struct sample_ring_stats *stats);
+
+struct squelch {
+    double open_level;
+    double close_level;
+    size_t block_size;
+    unsigned int hang_blocks;
+    unsigned int hang;
+    int open;
+};
+size_t squelch_process(struct squelch *sq, const int16_t *samples,
+                       size_t num_samples, uint8_t *mask);
+
+void free(void *ptr);
+"""
+
+helpers_source = """
+#include <libbladeRF.h>
+#include <stdlib.h>
+#include <errno.h>
+#include <time.h>
+#include <sys/time.h>
+#include <pthread.h>
+
+/* SC16_Q11 to float conversion. Each sample is two 16 bit ints (I and
+ Q), so 2 * num_samples values are converted. The loop has no
+ dependencies between iterations and the pointers do not alias, so the
+ compiler is free to vectorize it. */
+
+void samples_to_floats_into(const int16_t * restrict samples,
+                            float * restrict out, size_t num_samples) {
+    size_t i;
+    for (i = 0; i < 2 * num_samples; i++) {
+        out[i] = (float)samples[i] * (1.0f/2048.0f);
+    }
+}
+
+/* The inverse of samples_to_floats_into(), for the TX path. Each value
+ is scaled, rounded to nearest and saturated to the [-2048, 2047] range
+ the DAC accepts. Returns the number of samples where I or Q had to be
+ clipped. */
+
+size_t floats_to_samples_into(const float * restrict floats,
+                              int16_t * restrict out, size_t num_samples,
+                              float scale) {
+    size_t i, clipped = 0;
+    for (i = 0; i < 2 * num_samples; i += 2) {
+        float vi = floats[i] * scale;
+        float vq = floats[i + 1] * scale;
+        vi += vi < 0.0f ? -0.5f : 0.5f;
+        vq += vq < 0.0f ? -0.5f : 0.5f;
+        clipped += (vi >= 2048.0f) | (vi <= -2049.0f) |
+                   (vq >= 2048.0f) | (vq <= -2049.0f);
+        vi = vi > 2047.0f ? 2047.0f : (vi < -2048.0f ? -2048.0f : vi);
+        vq = vq > 2047.0f ? 2047.0f : (vq < -2048.0f ? -2048.0f : vq);
+        out[i] = (int16_t)vi;
+        out[i + 1] = (int16_t)vq;
+    }
+    return clipped;
+}
+
+/* Bulk sync transfers. These loop over bladerf_sync_rx/tx in C so that a
+ large capture or playback is a single call from python, during which
+ the GIL is released. The metadata struct is optional; without it every
+ chunk is assumed to be transferred in full. For RX, the sample offsets
+ of the first max_overruns overruns are stored in overruns and the total
+ count in num_overruns. For TX with metadata, the transfer is sent as
+ one burst starting with the caller's flags and timestamp. */
+
+int sync_rx_into(struct bladerf *dev, int16_t *samples, size_t num_samples,
+                 unsigned int chunk_samples, struct bladerf_metadata *metadata,
+                 unsigned int timeout_ms, size_t *transferred,
+                 uint64_t *overruns, size_t max_overruns, size_t *num_overruns) {
+    int status;
+    size_t count, remaining;
+
+    *transferred = 0;
+    *num_overruns = 0;
+    if (chunk_samples == 0) {
+        return BLADERF_ERR_INVAL;
+    }
+    while (*transferred < num_samples) {
+        remaining = num_samples - *transferred;
+        count = remaining < chunk_samples ? remaining : chunk_samples;
+        if (metadata != NULL) {
+            metadata->status = 0;
+        }
+        status = bladerf_sync_rx(dev, samples + 2 * *transferred,
+                                 (unsigned int)count, metadata, timeout_ms);
+        if (status < 0) {
+            return status;
+        }
+        if (metadata != NULL) {
+            if (metadata->status & BLADERF_META_STATUS_OVERRUN) {
+                if (*num_overruns < max_overruns) {
+                    overruns[*num_overruns] = *transferred;
+                }
+                (*num_overruns)++;
+            }
+            /* A short read with no samples would never finish. */
+            if (metadata->actual_count == 0) {
+                return BLADERF_ERR_UNEXPECTED;
+            }
+            if (metadata->actual_count < count) {
+                count = metadata->actual_count;
+            }
+        }
+        *transferred += count;
+    }
+    return 0;
+}
+
+int sync_tx_from(struct bladerf *dev, const int16_t *samples, size_t num_samples,
+                 unsigned int chunk_samples, struct bladerf_metadata *metadata,
+                 unsigned int timeout_ms, size_t *transferred) {
+    int status = 0;
+    size_t count, remaining;
+    uint32_t flags = metadata != NULL ? metadata->flags : 0;
+
+    *transferred = 0;
+    if (chunk_samples == 0) {
+        return BLADERF_ERR_INVAL;
+    }
+    while (*transferred < num_samples) {
+        remaining = num_samples - *transferred;
+        count = remaining < chunk_samples ? remaining : chunk_samples;
+        if (metadata != NULL) {
+            metadata->flags = *transferred == 0 ?
+                flags | BLADERF_META_FLAG_TX_BURST_START : 0;
+            if (count == remaining) {
+                metadata->flags |= BLADERF_META_FLAG_TX_BURST_END;
+            }
+        }
+        status = bladerf_sync_tx(dev, (void *)(samples + 2 * *transferred),
+                                 (unsigned int)count, metadata, timeout_ms);
+        if (status < 0) {
+            break;
+        }
+        *transferred += count;
+    }
+    if (metadata != NULL) {
+        metadata->flags = flags;
+    }
+    return status;
+}
+
+/* A receive stream callback that never enters python. Filled buffers are
+ pushed onto a single producer, single consumer queue that python drains
+ in batches with sample_ring_get(); python hands buffers back with
+ sample_ring_release() onto a second queue, from which the callback
+ takes the next buffer to fill. When python has not released anything
+ the callback has no free buffer, so it drops the one just filled and
+ reuses it, counting the drop. Both queues hold every buffer at most
+ once, so they never overflow. The mutex and condition variable are
+ only used to sleep in sample_ring_get(); the callback only takes the
+ mutex when the consumer is actually waiting. */
+
+struct sample_ring_stats {
+    uint64_t delivered;
+    uint64_t dropped;
+    size_t pending;
+};
+
+struct pointer_queue {
+    void **slots;
+    size_t size;
+    size_t head;    /* written by the consumer */
+    size_t tail;    /* written by the producer */
+};
+
+struct sample_ring {
+    struct pointer_queue filled;
+    struct pointer_queue released;
+    uint64_t delivered;
+    uint64_t dropped;
+    int shutdown;
+    int waiting;
+    pthread_mutex_t lock;
+    pthread_cond_t cond;
+};
+
+static int queue_init(struct pointer_queue *q, size_t size) {
+    q->slots = (void **)calloc(size, sizeof(void *));
+    q->size = size;
+    q->head = q->tail = 0;
+    return q->slots != NULL;
+}
+
+static int queue_push(struct pointer_queue *q, void *p) {
+    size_t tail = __atomic_load_n(&q->tail, __ATOMIC_RELAXED);
+    size_t next = tail + 1 == q->size ? 0 : tail + 1;
+    if (next == __atomic_load_n(&q->head, __ATOMIC_ACQUIRE)) {
+        return 0;
+    }
+    q->slots[tail] = p;
+    __atomic_store_n(&q->tail, next, __ATOMIC_SEQ_CST);
+    return 1;
+}
+
+static int queue_pop(struct pointer_queue *q, void **p) {
+    size_t head = __atomic_load_n(&q->head, __ATOMIC_RELAXED);
+    if (head == __atomic_load_n(&q->tail, __ATOMIC_ACQUIRE)) {
+        return 0;
+    }
+    *p = q->slots[head];
+    __atomic_store_n(&q->head, head + 1 == q->size ? 0 : head + 1,
+                     __ATOMIC_RELEASE);
+    return 1;
+}
+
+static size_t queue_length(struct pointer_queue *q) {
+    size_t head = __atomic_load_n(&q->head, __ATOMIC_ACQUIRE);
+    size_t tail = __atomic_load_n(&q->tail, __ATOMIC_ACQUIRE);
+    return tail >= head ? tail - head : q->size - head + tail;
+}
+
+struct sample_ring *sample_ring_new(size_t num_buffers) {
+    struct sample_ring *ring = (struct sample_ring *)calloc(1, sizeof(*ring));
+    if (ring == NULL) {
+        return NULL;
+    }
+    if (!queue_init(&ring->filled, num_buffers + 1) ||
+        !queue_init(&ring->released, num_buffers + 1)) {
+        free(ring->filled.slots);
+        free(ring);
+        return NULL;
+    }
+    pthread_mutex_init(&ring->lock, NULL);
+    pthread_cond_init(&ring->cond, NULL);
+    return ring;
+}
+
+void sample_ring_free(struct sample_ring *ring) {
+    pthread_cond_destroy(&ring->cond);
+    pthread_mutex_destroy(&ring->lock);
+    free(ring->filled.slots);
+    free(ring->released.slots);
+    free(ring);
+}
+
+/* libbladeRF submits the first num_transfers buffers itself, the rest
+ start out free. */
+void sample_ring_start(struct sample_ring *ring, void **buffers,
+                       size_t num_buffers, size_t num_transfers) {
+    size_t i;
+    for (i = num_transfers; i < num_buffers; i++) {
+        queue_push(&ring->released, buffers[i]);
+    }
+}
+
+static void sample_ring_wake(struct sample_ring *ring) {
+    if (__atomic_load_n(&ring->waiting, __ATOMIC_SEQ_CST)) {
+        pthread_mutex_lock(&ring->lock);
+        pthread_cond_broadcast(&ring->cond);
+        pthread_mutex_unlock(&ring->lock);
+    }
+}
+
+void *sample_ring_callback(struct bladerf *dev, struct bladerf_stream *stream,
+                           struct bladerf_metadata *meta, void *samples,
+                           size_t num_samples, void *user_data) {
+    struct sample_ring *ring = (struct sample_ring *)user_data;
+    void *next;
+
+    if (__atomic_load_n(&ring->shutdown, __ATOMIC_ACQUIRE)) {
+        return BLADERF_STREAM_SHUTDOWN;
+    }
+    if (!queue_pop(&ring->released, &next)) {
+        __atomic_add_fetch(&ring->dropped, 1, __ATOMIC_RELAXED);
+        return samples;
+    }
+    queue_push(&ring->filled, samples);
+    __atomic_add_fetch(&ring->delivered, 1, __ATOMIC_RELAXED);
+    sample_ring_wake(ring);
+    return next;
+}
+
+/* Pop up to max filled buffers, waiting up to timeout_ms (forever if
+ negative) for the first one. Returns the number of buffers popped. */
+size_t sample_ring_get(struct sample_ring *ring, void **buffers, size_t max,
+                       int timeout_ms) {
+    size_t count = 0;
+    struct timeval now;
+    struct timespec deadline;
+
+    while (count < max && queue_pop(&ring->filled, &buffers[count])) {
+        count++;
+    }
+    if (count > 0 || timeout_ms == 0) {
+        return count;
+    }
+
+    gettimeofday(&now, NULL);
+    deadline.tv_sec = now.tv_sec + timeout_ms / 1000;
+    deadline.tv_nsec = now.tv_usec * 1000L + (timeout_ms % 1000) * 1000000L;
+    if (deadline.tv_nsec >= 1000000000L) {
+        deadline.tv_sec++;
+        deadline.tv_nsec -= 1000000000L;
+    }
+
+    pthread_mutex_lock(&ring->lock);
+    __atomic_store_n(&ring->waiting, 1, __ATOMIC_SEQ_CST);
+    while (queue_length(&ring->filled) == 0 &&
+           !__atomic_load_n(&ring->shutdown, __ATOMIC_ACQUIRE)) {
+        if (timeout_ms < 0) {
+            pthread_cond_wait(&ring->cond, &ring->lock);
+        } else if (pthread_cond_timedwait(&ring->cond, &ring->lock,
+                                          &deadline) == ETIMEDOUT) {
+            break;
+        }
+    }
+    __atomic_store_n(&ring->waiting, 0, __ATOMIC_SEQ_CST);
+    pthread_mutex_unlock(&ring->lock);
+
+    while (count < max && queue_pop(&ring->filled, &buffers[count])) {
+        count++;
+    }
+    return count;
+}
+
+void sample_ring_release(struct sample_ring *ring, void **buffers, size_t count) {
+    size_t i;
+    for (i = 0; i < count; i++) {
+        queue_push(&ring->released, buffers[i]);
+    }
+}
+
+void sample_ring_shutdown(struct sample_ring *ring) {
+    __atomic_store_n(&ring->shutdown, 1, __ATOMIC_RELEASE);
+    pthread_mutex_lock(&ring->lock);
+    pthread_cond_broadcast(&ring->cond);
+    pthread_mutex_unlock(&ring->lock);
+}
+
+void sample_ring_stats(struct sample_ring *ring, struct sample_ring_stats *stats) {
+    stats->delivered = __atomic_load_n(&ring->delivered, __ATOMIC_RELAXED);
+    stats->dropped = __atomic_load_n(&ring->dropped, __ATOMIC_RELAXED);
+    stats->pending = queue_length(&ring->filled);
+}
+
+/* Squelch on raw SC16_Q11 samples. The mean of I*I + Q*Q over each
+ block of block_size samples is compared with open_level while closed
+ and with close_level while open, both in squared counts, so no sample
+ is ever converted to float. Once the level drops below close_level the
+ squelch stays open for hang_blocks more blocks. The last block may be
+ short. If mask is not NULL it gets one byte per block, 1 where the
+ block is open. Returns the number of open blocks. */
+
+struct squelch {
+    double open_level;
+    double close_level;
+    size_t block_size;
+    unsigned int hang_blocks;
+    unsigned int hang;
+    int open;
+};
+
+static int64_t block_energy(const int16_t * restrict samples, size_t count) {
+    int64_t energy = 0;
+    size_t i;
+    for (i = 0; i < 2 * count; i++) {
+        energy += (int32_t)samples[i] * samples[i];
+    }
+    return energy;
+}
+
+size_t squelch_process(struct squelch *sq, const int16_t *samples,
+                       size_t num_samples, uint8_t *mask) {
+    size_t start, count, num_open = 0, block = 0;
+    double level;
+
+    for (start = 0; start < num_samples; start += count) {
+        count = num_samples - start;
+        count = count < sq->block_size ? count : sq->block_size;
+        level = (double)block_energy(samples + 2 * start, count) / count;
+        if (!sq->open) {
+            if (level >= sq->open_level) {
+                sq->open = 1;
+                sq->hang = sq->hang_blocks;
+            }
+        } else if (level >= sq->close_level) {
+            sq->hang = sq->hang_blocks;
+        } else if (sq->hang > 0) {
+            sq->hang--;
+        } else {
+            sq->open = 0;
+        }
+        if (mask != NULL) {
+            mask[block] = (uint8_t)sq->open;
+        }
+        num_open += sq->open;
+        block++;
+    }
+    return num_open;
+}
+
+/* this helper function is to turn the two 16 bit ints per sample into
+ two normalized floats, so that it can be passed directly to
+ numpy.frombuffer which can only take two 32-bit floats and turn them
+ into a complex64 */
+
+float* samples_to_floats(void *samples, int num_samples) {
+    float* buffer = (float*)malloc(2 * num_samples * sizeof(float));
+    samples_to_floats_into((int16_t*)samples, buffer, num_samples);
+    return buffer;
+}
+
+"""
+
+
+def _string(node):
+    if sys.version_info >= (3, 8):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        return None
+    # Older versions parse string literals to ast.Str, deprecated since.
+    if isinstance(node, ast.Str):
+        return node.s
+    return None
+
+
+def collect_cdefs(filename):
+    """Return the declarations passed to ``cdef()`` in a module, in
+    source order."""
+    with open(filename) as f:
+        tree = ast.parse(f.read(), filename)
+    decls = []
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == 'cdef' and node.args):
+            decl = _string(node.args[0])
+            if decl is not None:
+                decls.append((node.lineno, node.col_offset, decl))
+    return [decl for _, _, decl in sorted(decls)]
+
+
+ffibuilder = FFI()
+ffibuilder.cdef(base_cdef)
+for module in wrapper_modules:
+    for decl in collect_cdefs(os.path.join(here, module)):
+        ffibuilder.cdef(decl)
+ffibuilder.cdef(helpers_cdef)
+
+ffibuilder.set_source('bladeRF._bladerf', helpers_source,
+                      libraries=['bladeRF', 'pthread'], extra_compile_args=['-O3'])
+
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(here))
+    ffibuilder.compile(verbose=True)
@@ -1,25 +1,12 @@
 import os
-import inspect
 from functools import wraps
-from cffi import FFI
-
-lib = None
-ffi = FFI()
-
-ffi.cdef('const char * bladerf_strerror(int error);')
-
-ffi.cdef("""
-#define BLADERF_ERR_UNEXPECTED ...
-#define BLADERF_ERR_RANGE ...
-#define BLADERF_ERR_INVAL ...
-#define BLADERF_ERR_MEM ...
-#define BLADERF_ERR_IO ...
-#define BLADERF_ERR_TIMEOUT ...
-#define BLADERF_ERR_NODEV ...
-#define BLADERF_ERR_UNSUPPORTED ...
-#define BLADERF_ERR_MISALIGNED ...
-#define BLADERF_ERR_CHECKSUM ...
-""")
+
+try:
+    from bladeRF._bladerf import ffi, lib
+except ImportError:
+    raise ImportError('The bladeRF._bladerf extension module is not built. '
+                      'Install the package with setup.py, or run '
+                      '"python bladeRF/_build.py" for an in-place build.')
 
 # Code copied from michelp/pyczmq which was authored by me -mp
 
@@ -29,8 +16,35 @@ def ptop(typ, val=ffi.NULL):
     return ptop
 
 
+def as_pointer(samples, ctype='int16_t *'):
+    """Return ``samples`` as a C pointer of type ``ctype``.
+
+    ``samples`` may be a cdata pointer or array (for example an entry of
+    ``Stream.buffers``) or any object supporting the buffer protocol,
+    such as a numpy array.  No data is copied.
+    """
+    if not isinstance(samples, ffi.CData):
+        samples = ffi.from_buffer(samples)
+    return ffi.cast(ctype, samples)
+
+
+def getargspec(f):
+    """Same as inspect.getargspec(), which is slow to import."""
+    code = f.__code__
+    args = code.co_varnames[:code.co_argcount]
+    pos = code.co_argcount + getattr(code, 'co_kwonlyargcount', 0)
+    varargs = varkw = None
+    if code.co_flags & 0x04:
+        varargs = code.co_varnames[pos]
+        pos += 1
+    if code.co_flags & 0x08:
+        varkw = code.co_varnames[pos]
+    return args, varargs, varkw, f.__defaults__
+
+
 def cdef(decl, returns_string=False, nullable=False):
-    ffi.cdef(decl)
+    # The declaration itself is compiled into bladeRF._bladerf by
+    # _build.py, here it is only used for the docstring.
     def wrap(f):
         @wraps(f)
         def inner_f(*args):
@@ -44,7 +58,7 @@ def cdef(decl, returns_string=False, nullable=False):
         # this insanity inserts a formatted argspec string
         # into the function's docstring, so that sphinx
         # gets the right args instead of just the wrapper args
-        args, varargs, varkw, defaults = inspect.getargspec(f)
+        args, varargs, varkw, defaults = getargspec(f)
         defaults = () if defaults is None else defaults
         defaults = ["\"{}\"".format(a) if type(a) == str else a for a in defaults]
         l = ["{}={}".format(arg, defaults[(idx+1)*-1])
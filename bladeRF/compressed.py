@@ -0,0 +1,354 @@
+"""Compressed, chunk indexed SC16_Q11 recordings with random access.
+
+A file starts with a ``file_header`` naming the codec and filters, and
+holds a sequence of chunks, each a ``chunk_header`` followed by the
+compressed samples.  Closing the writer appends the index of all chunks,
+the metadata as JSON and a ``trailer`` locating them.  The chunk
+headers repeat the index entries, so a file whose writer never closed
+can still be read by scanning it.
+"""
+import json
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from bladeRF._cffi import ffi, as_pointer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+magic = b'BRFIQZ01'
+# magic, codec, delta filter, shuffle filter
+file_header = struct.Struct('<8s8s??6x')
+# sample offset, timestamp, compressed size, number of samples
+chunk_header = struct.Struct('<QQII')
+# index offset, number of chunks, metadata size, magic
+trailer = struct.Struct('<QQQ8s')
+
+index_dtype = np.dtype([('sample', '<u8'), ('timestamp', '<u8'),
+                        ('size', '<u4'), ('count', '<u4'), ('offset', '<u8')])
+
+codecs = {
+    'none': (lambda data, level: data, lambda data: data),
+    'zlib': (zlib.compress, zlib.decompress),
+    }
+if lzma is not None:
+    codecs['lzma'] = (lambda data, level: lzma.compress(data, preset=level),
+                      lzma.decompress)
+
+
+def delta_encode(iq):
+    """Replace I and Q by their differences from the previous sample,
+    in place, wrapping around as int16."""
+    iq[1:] -= iq[:-1].copy()
+    return iq
+
+
+def delta_decode(iq):
+    """Undo ``delta_encode()`` in place."""
+    np.cumsum(iq, axis=0, dtype=np.int16, out=iq)
+    return iq
+
+
+def shuffle_bytes(iq):
+    """Return the bytes of ``iq`` grouped by their position in a sample,
+    which puts the slowly changing high bytes next to each other."""
+    return np.ascontiguousarray(iq.view(np.uint8).reshape(-1, 4).T).tobytes()
+
+
+def unshuffle_bytes(data):
+    """Undo ``shuffle_bytes()``, returning a (count, 2) int16 array."""
+    planes = np.frombuffer(data, np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(planes.T).view(np.int16).reshape(-1, 2)
+
+
+class CompressedRecorder(object):
+    """
+    Records SC16_Q11 buffers into a compressed, chunk indexed file.
+
+    Samples are gathered into chunks of ``chunk_samples`` samples, which
+    ``num_workers`` threads compress in parallel with ``codec`` (one of
+    ``codecs``) at ``level``, after the optional ``delta`` and
+    ``shuffle`` filters, and write out in order.  Each chunk records the
+    sample offset and device timestamp of its first sample.  Passing a
+    ``timestamp`` to ``write()`` that does not follow on from the
+    previous samples ends the current chunk early, so every chunk is
+    contiguous.
+
+    ``write()`` has the same interface as ``Recorder.write()``: it only
+    copies, and drops the whole buffer (returning False) when not enough
+    of the ``num_chunks`` chunk buffers are free to hold it.  A drop also
+    ends the current chunk, leaving a gap in the timestamps.
+
+    If compressing or writing a chunk fails, ``full`` is set, every
+    later buffer is dropped and ``close()`` raises the error, leaving the
+    file without an index, so that only the chunks before the failure
+    are read back.
+    """
+
+    def __init__(self, path, codec='zlib', level=1, delta=True, shuffle=True,
+                 chunk_samples=1 << 16, num_workers=4, num_chunks=None,
+                 metadata=None):
+        if codec not in codecs:
+            raise ValueError('codec must be one of %s' % ', '.join(sorted(codecs)))
+        self.compress = codecs[codec][0]
+        try:
+            self.compress(b'', level)
+        except Exception as error:
+            raise ValueError('invalid level %r for %s: %s' % (level, codec, error))
+        self.level = level
+        self.delta = delta
+        self.shuffle = shuffle
+        self.chunk_samples = chunk_samples
+        self.metadata = dict(metadata or {}, codec=codec, delta=delta,
+                             shuffle=shuffle, chunk_samples=chunk_samples)
+        self.file = open(path, 'wb')
+        self.file.write(file_header.pack(magic, codec.encode('ascii'), delta, shuffle))
+        self.position = file_header.size
+        self.index = []
+        self.lock = threading.Lock()
+
+        self.written = 0
+        self.dropped = 0
+        self.full = False
+        self.error = None
+        self.next_timestamp = 0
+        self.chunk = None
+        self.fill = 0
+        self.seq = 0
+        self.next_seq = 0
+        self.done = {}
+        self.free = queue.Queue()
+        for i in range(num_chunks or 2 * num_workers):
+            self.free.put(np.empty((chunk_samples, 2), np.int16))
+        self.work = queue.Queue()
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    @property
+    def backlog(self):
+        return self.work.qsize()
+
+    def write(self, samples, num_samples, timestamp=None):
+        """Copy ``num_samples`` samples, a stream buffer or an int16
+        array, starting at device time ``timestamp`` if known.  Returns
+        False if they were dropped."""
+        if self.error is not None:
+            self.full = True
+            self.dropped += 1
+            return False
+        if timestamp is not None and timestamp != self.next_timestamp:
+            self._submit()
+            self.next_timestamp = timestamp
+        # Only this thread takes chunk buffers, so there are at least as
+        # many free as qsize() says.
+        room = self.chunk_samples - self.fill if self.chunk is not None else 0
+        needed = -(-(num_samples - room) // self.chunk_samples)
+        if needed > self.free.qsize():
+            self.dropped += 1
+            self._submit()
+            self.next_timestamp += num_samples
+            return False
+        source = ffi.buffer(as_pointer(samples, 'char *'), num_samples * 4)
+        source = np.frombuffer(source, np.int16).reshape(-1, 2)
+        done = 0
+        while done < num_samples:
+            if self.chunk is None:
+                self.chunk = self.free.get_nowait()
+                self.chunk_start = (self.written, self.next_timestamp)
+                self.fill = 0
+            count = min(num_samples - done, self.chunk_samples - self.fill)
+            self.chunk[self.fill:self.fill + count] = source[done:done + count]
+            self.fill += count
+            done += count
+            self.written += count
+            self.next_timestamp += count
+            if self.fill == self.chunk_samples:
+                self._submit()
+        return True
+
+    def _submit(self):
+        if self.chunk is None:
+            return
+        sample, timestamp = self.chunk_start
+        self.work.put((self.seq, self.chunk, self.fill, sample, timestamp))
+        self.seq += 1
+        self.chunk = None
+
+    def _worker(self):
+        while True:
+            job = self.work.get()
+            if job is None:
+                return
+            seq, chunk, count, sample, timestamp = job
+            try:
+                iq = chunk[:count]
+                if self.delta:
+                    delta_encode(iq)
+                data = shuffle_bytes(iq) if self.shuffle else iq.tobytes()
+                data = self.compress(data, self.level)
+                with self.lock:
+                    self.done[seq] = (chunk, count, sample, timestamp, data)
+                    while self.next_seq in self.done:
+                        self._write_chunk(*self.done.pop(self.next_seq))
+                        self.next_seq += 1
+            except Exception as error:
+                # Later chunks can no longer be written in order.
+                with self.lock:
+                    if self.error is None:
+                        self.error = error
+
+    def _write_chunk(self, chunk, count, sample, timestamp, data):
+        self.file.write(chunk_header.pack(sample, timestamp, len(data), count))
+        self.position += chunk_header.size
+        self.index.append((sample, timestamp, len(data), count, self.position))
+        self.file.write(data)
+        self.position += len(data)
+        self.free.put(chunk)
+
+    def stats(self):
+        """Return the recording counters as a dict."""
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'backlog': self.backlog,
+            'chunks': len(self.index),
+            'bytes': self.position,
+            }
+
+    def close(self):
+        """Compress and write the last chunk, then the index, metadata
+        and trailer.  Raises the error a chunk failed with, if any."""
+        if self.error is None:
+            self._submit()
+        for worker in self.workers:
+            self.work.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self.error is not None:
+            self.file.close()
+            raise self.error
+        index = np.array(self.index, index_dtype).tobytes()
+        metadata = dict(self.metadata, num_samples=self.written, dropped=self.dropped)
+        metadata = json.dumps(metadata, sort_keys=True).encode('utf-8')
+        self.file.write(index)
+        self.file.write(metadata)
+        self.file.write(trailer.pack(self.position, len(self.index), len(metadata), magic))
+        self.file.close()
+
+
+class CompressedReader(object):
+    """
+    Random access to a file written by ``CompressedRecorder``.
+
+    ``read(start, count)`` decompresses only the chunks holding the
+    samples asked for, and keeps the last one decompressed for the next
+    call.  ``sample_at()`` maps a device timestamp to a sample offset.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = self.file.read(file_header.size)
+        if len(header) < file_header.size or header[:len(magic)] != magic:
+            raise ValueError('%s is not a compressed bladeRF recording' % path)
+        _, codec, self.delta, self.shuffle = file_header.unpack(header)
+        self.decompress = codecs[codec.rstrip(b'\0').decode('ascii')][1]
+        self.file.seek(0, 2)
+        end = None
+        if self.file.tell() >= file_header.size + trailer.size:
+            self.file.seek(-trailer.size, 2)
+            index_offset, num_chunks, metadata_size, end = trailer.unpack(
+                self.file.read(trailer.size))
+        if end == magic:
+            self.file.seek(index_offset)
+            self.index = np.frombuffer(self.file.read(num_chunks * index_dtype.itemsize),
+                                       index_dtype)
+            self.metadata = json.loads(self.file.read(metadata_size).decode('utf-8'))
+        else:
+            # The writer did not close the file; rebuild the index.
+            self.index = self._scan()
+            self.metadata = {}
+        self.num_samples = int(self.index['sample'][-1] + self.index['count'][-1]) \
+            if len(self.index) else 0
+        self.cached = None
+
+    def _scan(self):
+        entries = []
+        position = file_header.size
+        self.file.seek(position)
+        while True:
+            header = self.file.read(chunk_header.size)
+            if len(header) < chunk_header.size:
+                break
+            sample, timestamp, size, count = chunk_header.unpack(header)
+            position += chunk_header.size
+            if len(self.file.read(size)) < size:
+                break
+            entries.append((sample, timestamp, size, count, position))
+            position += size
+        return np.array(entries, index_dtype)
+
+    def chunk(self, number):
+        """Return chunk ``number`` decompressed, as a (count, 2) int16 array."""
+        if self.cached is not None and self.cached[0] == number:
+            return self.cached[1]
+        entry = self.index[number]
+        self.file.seek(int(entry['offset']))
+        data = self.decompress(self.file.read(int(entry['size'])))
+        if self.shuffle:
+            iq = unshuffle_bytes(data)
+        else:
+            iq = np.frombuffer(data, np.int16).reshape(-1, 2).copy()
+        if self.delta:
+            delta_decode(iq)
+        self.cached = (number, iq)
+        return iq
+
+    def read(self, start, count, out=None):
+        """Return ``count`` samples from sample offset ``start`` as a
+        (count, 2) int16 array, fewer at the end of the recording."""
+        if start < 0 or count < 0:
+            raise ValueError('start and count must not be negative')
+        count = max(min(count, self.num_samples - start), 0)
+        if out is None:
+            out = np.empty((count, 2), np.int16)
+        done = 0
+        number = int(np.searchsorted(self.index['sample'], start, 'right')) - 1
+        while done < count:
+            entry = self.index[number]
+            iq = self.chunk(number)
+            offset = start + done - int(entry['sample'])
+            n = min(count - done, int(entry['count']) - offset)
+            out[done:done + n] = iq[offset:offset + n]
+            done += n
+            number += 1
+        return out[:count]
+
+    def sample_at(self, timestamp):
+        """Return the sample offset recorded at device time ``timestamp``,
+        or None if it falls in a gap or outside the recording."""
+        number = int(np.searchsorted(self.index['timestamp'], timestamp, 'right')) - 1
+        if number < 0:
+            return None
+        entry = self.index[number]
+        offset = timestamp - int(entry['timestamp'])
+        if offset >= entry['count']:
+            return None
+        return int(entry['sample']) + offset
+
+    def close(self):
+        self.file.close()
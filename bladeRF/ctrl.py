@@ -157,10 +157,28 @@ def get_sample_rate(dev, module):
     return int(rate[0])
 
 
+cdef("""
+/**
+ * Rational sample rate representation
+ */
+struct bladerf_rational_rate {
+    uint64_t integer;           /**< Integer portion */
+    uint64_t num;               /**< Numerator in fractional portion */
+    uint64_t den;               /**< Denominator in fractional portion. This
+                                     must be > 0. */
+};
+""")
+
+
 @cdef('int bladerf_get_rational_sample_rate(struct bladerf *dev,'
       'bladerf_module module, struct bladerf_rational_rate *rate);')
 def get_rational_sample_rate(dev, module):
-    pass
+    """Return the exact sample rate as ``(integer, num, den)``, that is
+    ``integer + num / den`` samples per second."""
+    rate = ffi.new('struct bladerf_rational_rate *')
+    err = _cffi.lib.bladerf_get_rational_sample_rate(dev, module, rate)
+    bladeRF.errors.check_retcode(err)
+    return int(rate.integer), int(rate.num), int(rate.den)
 
 
 @cdef('int bladerf_set_txvga2(struct bladerf *dev, int gain);')
@@ -267,6 +285,28 @@ def get_lpf_mode(dev, module):
     return int(mode[0])
 
 
+@cdef('int bladerf_set_correction(struct bladerf *dev, bladerf_module module, '
+      'bladerf_correction corr, int16_t value);')
+def set_correction(dev, module, corr, value):
+    err = _cffi.lib.bladerf_set_correction(dev, module, corr, int(value))
+    bladeRF.errors.check_retcode(err)
+
+
+@cdef('int bladerf_get_correction(struct bladerf *dev, bladerf_module module, '
+      'bladerf_correction corr, int16_t *value);')
+def get_correction(dev, module, corr):
+    value = ffi.new('int16_t *')
+    err = _cffi.lib.bladerf_get_correction(dev, module, corr, value)
+    bladeRF.errors.check_retcode(err)
+    return int(value[0])
+
+
+@cdef('int bladerf_calibrate_dc(struct bladerf *dev, bladerf_cal_module module);')
+def calibrate_dc(dev, module):
+    err = _cffi.lib.bladerf_calibrate_dc(dev, module)
+    bladeRF.errors.check_retcode(err)
+
+
 @cdef('int bladerf_select_band(struct bladerf *dev, bladerf_module module,'
       'unsigned int frequency);')
 def select_band(dev, module, frequency):
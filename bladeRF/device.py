@@ -1,10 +1,15 @@
 from threading import Thread, RLock
+from collections import namedtuple
 import weakref
 import bladeRF
+from bladeRF.stats import StreamStats, RingStreamStats, clock
 
 
 sample_size = bladeRF.ffi.sizeof('int16_t') * 2
 
+# One chunk of received samples, as yielded by Module.iter_rx()
+RxChunk = namedtuple('RxChunk', 'samples timestamp overrun actual_count')
+
 
 class Stream(Thread):
     """
@@ -28,11 +33,15 @@ This condition from the documents still holds:
         self.num_buffers = num_buffers
         self.device = device
         self.module = module
+        self.stats = stats = StreamStats()
 
         @bladeRF.ffi.callback('bladerf_stream_cb')
         def raw_callback(raw_device, raw_stream, meta, raw_samples, num_samples, user_data):
             user_data = bladeRF.ffi.from_handle(user_data)
+            start = clock()
             v = callback(self.device, self, meta, raw_samples, num_samples, user_data)
+            stats.duration(clock() - start)
+            stats.delivered += 1
             if v is None:
                 return bladeRF.ffi.NULL
             return v
@@ -44,6 +53,22 @@ This condition from the documents still holds:
         self.raw_stream, self.buffers = bladeRF.init_stream(
             self.device.raw_device, raw_callback, num_buffers, format,
             num_samples, num_transfers, self.user_data_handle)
+        self.arrays = self.buffer_arrays()
+
+    def buffer_arrays(self):
+        """Return a list of numpy views, one per entry in ``buffers``.
+
+        Each view is a writable ``(num_samples, 2)`` int16 array of I/Q
+        pairs sharing memory with the libbladeRF buffer, so reading or
+        filling it copies nothing.  Returns None without numpy.
+        """
+        if not bladeRF.has_numpy:
+            return None
+        import numpy
+        size = self.num_samples * sample_size
+        return [numpy.frombuffer(bladeRF.ffi.buffer(self.buffers[i], size),
+                                 numpy.int16).reshape(self.num_samples, 2)
+                for i in range(self.num_buffers)]
 
     def next(self):
         if not self.running:
@@ -60,18 +85,106 @@ This condition from the documents still holds:
     def current_as_buffer(self):
         return bladeRF.ffi.buffer(self.current(), self.num_samples*sample_size)
 
+    def current_as_array(self):
+        return self.arrays[self.current_buff]
+
+    def drop(self):
+        """Count the buffer just received as dropped and return it to be
+        refilled.  Call from the callback when the consumer is behind."""
+        self.stats.dropped += 1
+        return self.current()
+
     def run(self):
         bladeRF.stream(self.raw_stream, self.module)
 
 
+class RingStream(Stream):
+    """
+    A receive stream whose callback is implemented in C.
+
+    The libbladeRF callback never takes the GIL.  It pushes each filled
+    buffer onto a lock-free queue, which python drains in batches with
+    ``get()``.  Buffers stay owned by python until handed back with
+    ``release()``; while none are free the callback drops what it just
+    received and counts it, rather than overwriting data python holds.
+
+    ``get()`` and ``release()`` must be called from a single thread.
+    """
+
+    def __init__(self, device, module, num_buffers, format, num_samples,
+                 num_transfers):
+        Thread.__init__(self)
+        self.running = True
+        self.current_buff = 0
+        self.num_buffers = num_buffers
+        self.num_samples = num_samples
+        self.device = device
+        self.module = module
+
+        ring = bladeRF.lib.sample_ring_new(num_buffers)
+        if ring == bladeRF.ffi.NULL:
+            raise MemoryError('could not allocate sample ring')
+        self.ring = bladeRF.ffi.gc(ring, bladeRF.lib.sample_ring_free)
+        self.raw_stream, self.buffers = bladeRF.init_stream(
+            self.device.raw_device,
+            bladeRF.ffi.addressof(bladeRF.lib, 'sample_ring_callback'),
+            num_buffers, format, num_samples, num_transfers, self.ring)
+        bladeRF.lib.sample_ring_start(self.ring, self.buffers,
+                                      num_buffers, num_transfers)
+        self.arrays = self.buffer_arrays()
+
+        self.held = []
+        self._batch = bladeRF.ffi.new('void *[]', num_buffers)
+        self._index = dict((int(bladeRF.ffi.cast('uintptr_t', self.buffers[i])), i)
+                           for i in range(num_buffers))
+        self.stats = RingStreamStats(self.ring)
+
+    def get(self, timeout=None, max_buffers=None):
+        """Return a list of the buffer indexes filled since the last call.
+
+        Blocks for up to ``timeout`` seconds, or forever if None, until
+        at least one buffer is available; returns an empty list on
+        timeout or once the stream is stopped.  The samples are in
+        ``arrays[i]`` and ``buffers[i]`` and stay valid until released.
+        """
+        if max_buffers is None:
+            max_buffers = self.num_buffers
+        timeout_ms = -1 if timeout is None else int(timeout * 1000)
+        count = bladeRF.lib.sample_ring_get(self.ring, self._batch,
+                                            max_buffers, timeout_ms)
+        batch = [self._index[int(bladeRF.ffi.cast('uintptr_t', self._batch[i]))]
+                 for i in range(count)]
+        self.held.extend(batch)
+        return batch
+
+    def release(self, count=None):
+        """Hand the oldest ``count`` held buffers, or all of them, back
+        to the stream to be refilled."""
+        if count is None:
+            count = len(self.held)
+        released, self.held = self.held[:count], self.held[count:]
+        for i, index in enumerate(released):
+            self._batch[i] = self.buffers[index]
+        bladeRF.lib.sample_ring_release(self.ring, self._batch, len(released))
+
+    def stop(self):
+        """Shut the stream down at the next transfer and wake up
+        ``get()``."""
+        self.running = False
+        bladeRF.lib.sample_ring_shutdown(self.ring)
+
+
 class Module(object):
     """ A module, either rx or tx.
     """
 
     def __init__(self, device, module):
+        # The Device is kept open while a Module or Stream is in use.
         self.device = device
         self.raw_device = device.raw_device
         self.module = module
+        self.format = None
+        self.stats = StreamStats()
 
     @property
     def enabled(self):
@@ -105,6 +218,10 @@ class Module(object):
     def sample_rate(self, sample_rate):
         bladeRF.set_sample_rate(self.raw_device, self.module, sample_rate)
 
+    @property
+    def rational_sample_rate(self):
+        return bladeRF.get_rational_sample_rate(self.raw_device, self.module)
+
     @property
     def vga1(self):
         if self.module == bladeRF.MODULE_RX:
@@ -153,13 +270,24 @@ class Module(object):
     def timestamp(self):
         return bladeRF.get_timestamp(self.raw_device,self.module)   
 
+    def get_correction(self, corr):
+        return bladeRF.get_correction(self.raw_device, self.module, corr)
+
+    def set_correction(self, corr, value):
+        bladeRF.set_correction(self.raw_device, self.module, corr, value)
+
     def stream(self, callback, num_buffers, format, num_samples,
                num_transfers, user_data=None):
         return Stream(self, self.module, callback,
                       num_buffers, format, num_samples,
                       num_transfers, user_data=user_data)
 
+    def ring_stream(self, num_buffers, format, num_samples, num_transfers):
+        return RingStream(self, self.module, num_buffers, format,
+                          num_samples, num_transfers)
+
     def config(self, format, num_buffers, buffer_size, num_transfers, stream_timeout=0):
+        self.format = format
         return bladeRF.sync_config(self.raw_device, self.module, format, num_buffers,
                                    buffer_size, num_transfers, stream_timeout)
 
@@ -170,15 +298,140 @@ class Module(object):
             func = bladeRF.rx
         else:
             func = bladeRF.tx
+        start = clock()
         func(self.raw_device, bladeRF.ffi.cast('void *', samples), num_samples, metadata, timeout_ms)
+        self.stats.duration(clock() - start)
+        self.stats.delivered += 1
+        if metadata and self.module == bladeRF.MODULE_RX:
+            self.stats.metadata(metadata[0])
         return samples
 
+    def iter_rx(self, chunk_samples, n_buffers=2, timeout_ms=0,
+                flags=bladeRF.BLADERF_META_FLAG_RX_NOW, num_chunks=None):
+        """Generate chunks of received samples using the sync interface.
+
+        The module must have been configured with ``config()`` using
+        ``FORMAT_SC16_Q11_META``.  Samples are received into a ring of
+        ``n_buffers`` preallocated ``(chunk_samples, 2)`` int16 arrays
+        with a single reused metadata struct, so nothing is allocated
+        per chunk beyond the yielded ``RxChunk``.  A chunk's samples are
+        only valid until the generator has advanced ``n_buffers`` more
+        times.
+
+        Stops after ``num_chunks`` chunks, or runs forever if None.
+        Raises ValueError if the module is configured with another
+        format, as only metadata gives the number of samples received.
+        """
+        if self.format != bladeRF.FORMAT_SC16_Q11_META:
+            raise ValueError('iter_rx() needs the module configured with '
+                             'FORMAT_SC16_Q11_META')
+        import numpy
+        ring = numpy.empty((n_buffers, chunk_samples, 2), numpy.int16)
+        views = [ring[i] for i in range(n_buffers)]
+        pointers = [bladeRF.as_pointer(view, 'void *') for view in views]
+        metadata = bladeRF.ffi.new('struct bladerf_metadata *')
+        metadata.flags = flags
+        stats = self.stats
+        current = count = 0
+        while num_chunks is None or count < num_chunks:
+            metadata.status = 0
+            start = clock()
+            bladeRF.rx(self.raw_device, pointers[current], chunk_samples,
+                       metadata, timeout_ms)
+            stats.duration(clock() - start)
+            stats.delivered += 1
+            stats.metadata(metadata)
+            actual_count = metadata.actual_count
+            samples = views[current]
+            if actual_count < chunk_samples:
+                samples = samples[:actual_count]
+            yield RxChunk(samples, metadata.timestamp,
+                          bool(metadata.status & bladeRF.BLADERF_META_STATUS_OVERRUN),
+                          actual_count)
+            current += 1
+            if current == n_buffers:
+                current = 0
+            count += 1
+
+    def _bulk_metadata(self):
+        if self.format != bladeRF.FORMAT_SC16_Q11_META:
+            return bladeRF.ffi.NULL
+        return bladeRF.ffi.new('struct bladerf_metadata *')
+
+    def read_into(self, array, timeout_ms=0, chunk_samples=16384,
+                  max_overruns=64):
+        """Fill ``array`` with received samples using the sync interface.
+
+        ``array`` is an int16 numpy array (or other writable buffer) of
+        interleaved I/Q pairs.  The whole transfer happens in a single C
+        call with the GIL released, so other threads keep running.
+
+        Returns ``(num_samples, overruns)`` where ``overruns`` lists the
+        sample offsets, at most ``max_overruns`` of them, at which the
+        device reported an overrun.  Overruns are only reported when the
+        module was configured with ``FORMAT_SC16_Q11_META``.
+        """
+        num_samples = memoryview(array).nbytes // sample_size
+        metadata = self._bulk_metadata()
+        if metadata:
+            metadata.flags = bladeRF.BLADERF_META_FLAG_RX_NOW
+        transferred = bladeRF.ffi.new('size_t *')
+        overruns = bladeRF.ffi.new('uint64_t[]', max_overruns)
+        num_overruns = bladeRF.ffi.new('size_t *')
+        err = bladeRF.lib.sync_rx_into(
+            self.raw_device, bladeRF.as_pointer(array), num_samples,
+            chunk_samples, metadata, timeout_ms, transferred,
+            overruns, max_overruns, num_overruns)
+        bladeRF.errors.check_retcode(err)
+        self.stats.delivered += 1
+        self.stats.overruns += int(num_overruns[0])
+        return (int(transferred[0]),
+                [int(overruns[i]) for i in range(min(num_overruns[0], max_overruns))])
+
+    def write_from(self, array, timeout_ms=0, chunk_samples=16384,
+                   timestamp=None):
+        """Transmit all samples in ``array`` using the sync interface.
+
+        ``array`` is an int16 numpy array (or other buffer) of
+        interleaved I/Q pairs, sent in a single C call with the GIL
+        released.  When the module was configured with
+        ``FORMAT_SC16_Q11_META`` the samples are sent as one burst, at
+        ``timestamp`` if given or immediately otherwise.
+
+        Returns the number of samples sent.
+        """
+        num_samples = memoryview(array).nbytes // sample_size
+        metadata = self._bulk_metadata()
+        if metadata:
+            if timestamp is None:
+                metadata.flags = bladeRF.BLADERF_META_FLAG_TX_NOW
+            else:
+                metadata.timestamp = timestamp
+        transferred = bladeRF.ffi.new('size_t *')
+        err = bladeRF.lib.sync_tx_from(
+            self.raw_device, bladeRF.as_pointer(array), num_samples,
+            chunk_samples, metadata, timeout_ms, transferred)
+        bladeRF.errors.check_retcode(err)
+        self.stats.delivered += 1
+        return int(transferred[0])
+
 
 class Device(object):
+    """
+    An open bladeRF.
+
+    Its ``rx`` and ``tx`` Modules, and their Streams, refer back to it, so
+    the handle stays open while any of them is in use, until ``close()``
+    or the end of a ``with`` block closes it.  Otherwise it is closed
+    when the garbage collector frees the Device and its Modules.
+    """
 
     def __init__(self, device_identifier=''):
         self._device = bladeRF.open(device_identifier)
+        self.closed = False
         self.lock = RLock()
+        self._rx = Module(self, bladeRF.MODULE_RX)
+        self._tx = Module(self, bladeRF.MODULE_TX)
 
     @classmethod
     def from_params(cls, device_identifier='',
@@ -204,11 +457,11 @@ class Device(object):
 
     @property
     def rx(self):
-        return Module(self, bladeRF.MODULE_RX)
+        return self._rx
 
     @property
     def tx(self):
-        return Module(self, bladeRF.MODULE_TX)
+        return self._tx
 
     @property
     def fpga_size(self):
@@ -222,6 +475,11 @@ class Device(object):
     def lna_gain(self, gain):
         return bladeRF.set_lna_gain(self.raw_device, gain)
 
+    def calibrate_dc(self, module):
+        """Run libbladeRF's DC calibration of ``module``, one of the
+        ``BLADERF_DC_CAL_*`` constants."""
+        bladeRF.calibrate_dc(self.raw_device, module)
+
     @property
     def expansion(self):
         return bladeRF.expansion_get_attached(self.raw_device)
@@ -230,6 +488,20 @@ class Device(object):
     def expansion(self, xb):
         return bladeRF.expansion_attach(self.raw_device,xb)
 
+    def close(self):
+        """Close the device handle; further calls do nothing."""
+        if not self.closed:
+            self.closed = True
+            bladeRF.close(self.raw_device)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def __del__(self):
-        bladeRF.close(self.raw_device)
+        # __init__ may have failed to open the device.
+        if hasattr(self, 'closed'):
+            self.close()
 
@@ -0,0 +1,15 @@
+"""Streaming signal processing stages for received and transmitted
+samples.
+
+Each stage is an object that keeps its state between buffers, so a
+stream can be processed one transfer at a time with the same result as
+processing it in one piece.  Stages work on complex64 numpy arrays.
+"""
+from .filters import lowpass
+from .decimator import Decimator
+from .spectrum import SpectrumEstimator, SpectrumPipeline
+from .correction import IQCorrector
+from .waterfall import Waterfall
+from .channelizer import Channelizer
+from .mixer import Mixer
+from .resampler import Resampler, resampling_ratio
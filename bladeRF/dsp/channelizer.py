@@ -0,0 +1,96 @@
+"""Polyphase filterbank channelizer."""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .filters import lowpass
+
+
+class Channelizer(object):
+    """
+    Split a stream of complex64 samples into ``num_channels`` channels.
+
+    Channel ``k`` is the input shifted down by ``k * sample_rate /
+    num_channels``, low pass filtered and decimated by ``num_channels``,
+    so channels above the middle index are the negative frequencies, in
+    FFT order.  Each output group costs one pass of the prototype filter
+    over ``num_channels * taps_per_channel`` samples, folded into
+    ``num_channels`` sums, and a single FFT; all groups in a buffer are
+    computed together as matrix operations.  The samples still needed
+    by the next group are kept between calls, as in ``Decimator``.
+
+    Without ``taps``, a Kaiser windowed low pass with its cutoff at the
+    channel edge is used.
+    """
+
+    def __init__(self, num_channels, taps_per_channel=8, taps=None):
+        self.num_channels = num_channels = int(num_channels)
+        if num_channels < 1:
+            raise ValueError('num_channels must be at least 1')
+        if taps is None:
+            taps = lowpass(num_channels * taps_per_channel, 1.0 / num_channels)
+        taps = np.asarray(taps, np.float32)
+        self.taps_per_channel = -(-len(taps) // num_channels)
+        self.num_taps = num_taps = self.taps_per_channel * num_channels
+        taps = np.concatenate([taps, np.zeros(num_taps - len(taps), np.float32)])
+        # One row of the time reversed filter per block of num_channels
+        # input samples, each tap repeated for I and Q.
+        self.window = taps[::-1].reshape(self.taps_per_channel, num_channels).copy()
+        self.iq_window = np.repeat(self.window, 2, axis=1)
+        # Folding the time reversed filter this way delays every channel
+        # by one sample of its own frequency, undone after the FFT.
+        self.rotation = np.exp(-2j * np.pi * np.arange(num_channels) / num_channels)
+        self.rotation = self.rotation.astype(np.complex64)[:, None]
+        self.work = np.zeros(0, np.complex64)
+        self.folded = np.zeros((0, num_channels), np.complex64)
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state, as if the stream started again."""
+        self.history = np.zeros(self.num_taps - 1, np.complex64)
+
+    def output_size(self, num_samples):
+        """Return the most outputs per channel one call with
+        ``num_samples`` can give."""
+        return (len(self.history) + num_samples - self.num_taps) // self.num_channels + 1
+
+    def frequencies(self, sample_rate, center=0.0):
+        """Return the center frequency of each channel."""
+        return center + np.fft.fftfreq(self.num_channels, 1.0 / sample_rate)
+
+    def process(self, samples, out=None):
+        """Channelize ``samples``, returning a ``(num_channels, n)`` array
+        with the ``n`` new outputs of each channel in its row.
+
+        If ``out`` is given, of shape ``(num_channels, m)`` with ``m`` at
+        least ``output_size(len(samples))``, the outputs are written into
+        it and a view of the part written is returned.
+        """
+        num_channels = self.num_channels
+        size = len(self.history) + len(samples)
+        num_out = max(self.output_size(len(samples)), 0)
+
+        if len(self.work) < size:
+            self.work = np.empty(size, np.complex64)
+            self.folded = np.empty((size // num_channels + 1, num_channels), np.complex64)
+        work = self.work
+        work[:len(self.history)] = self.history
+        work[len(self.history):size] = samples
+
+        if out is None:
+            out = np.empty((num_channels, num_out), np.complex64)
+        out = out[:, :num_out]
+        if num_out:
+            # Row m holds the I/Q floats of the num_taps samples ending
+            # at the m-th output, as taps_per_channel blocks.
+            iq = work.view(np.float32)
+            row_size = 2 * num_channels * iq.itemsize
+            segments = as_strided(iq, (num_out, self.taps_per_channel, 2 * num_channels),
+                                  (row_size, row_size, iq.itemsize))
+            folded = self.folded[:num_out]
+            np.einsum('npc,pc->nc', segments, self.iq_window,
+                      out=folded.view(np.float32))
+            channels = np.fft.fft(folded, axis=1)
+            np.multiply(channels.T, self.rotation, out=out)
+
+        self.history = work[num_out * num_channels:size].copy()
+        return out
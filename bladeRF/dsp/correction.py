@@ -0,0 +1,132 @@
+"""DC offset and IQ imbalance correction."""
+import math
+
+import numpy as np
+
+from .. import (BLADERF_CORR_LMS_DCOFF_I, BLADERF_CORR_LMS_DCOFF_Q,
+                BLADERF_CORR_FPGA_PHASE, BLADERF_CORR_FPGA_GAIN)
+
+# FPGA phase correction counts per degree, and gain correction counts
+# per unit of gain, from the bladerf_correction documentation.
+phase_counts = 4096 / 10.0
+gain_counts = 4096.0
+
+
+class IQCorrector(object):
+    """
+    Removes DC offset and IQ imbalance from a stream of complex64 samples.
+
+    The means of I and Q and their second moments are estimated on every
+    buffer and smoothed across buffers with weight ``alpha`` for the
+    newest one.  From them the correction subtracts the DC offset, removes
+    the part of Q correlated with I (phase error) and scales Q to the
+    power of I (gain error).  Everything is done on whole buffers with a
+    single preallocated work array.
+
+    ``write_back()`` moves the estimated residuals into the device's
+    correction registers, so they are removed before the samples reach
+    the host.
+    """
+
+    def __init__(self, alpha=0.05, dc=True, iq=True):
+        self.alpha = alpha
+        self.dc_enabled = dc
+        self.iq_enabled = iq
+        self.work = np.zeros(0, np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget the estimates."""
+        self.count = 0
+        # E[I], E[Q], E[I*I], E[Q*Q], E[I*Q]
+        self.moments = np.zeros(5)
+
+    def estimate(self, samples):
+        """Update the estimates with ``samples`` without correcting them."""
+        iq = samples.view(np.float32).reshape(-1, 2)
+        i, q = iq[:, 0], iq[:, 1]
+        n = float(len(samples))
+        moments = np.array([i.sum(dtype=np.float64) / n,
+                            q.sum(dtype=np.float64) / n,
+                            np.dot(i, i) / n, np.dot(q, q) / n,
+                            np.dot(i, q) / n])
+        if self.count == 0:
+            self.moments[:] = moments
+        else:
+            self.moments += self.alpha * (moments - self.moments)
+        self.count += 1
+
+    @property
+    def dc(self):
+        """The estimated DC offset, as a complex number."""
+        return complex(self.moments[0], self.moments[1])
+
+    def _covariance(self):
+        mi, mq, ii, qq, iq = self.moments
+        return ii - mi * mi, qq - mq * mq, iq - mi * mq
+
+    @property
+    def gain(self):
+        """The estimated amplitude of Q relative to I."""
+        ii, qq, iq = self._covariance()
+        return math.sqrt(qq / ii) if ii > 0 else 1.0
+
+    @property
+    def phase(self):
+        """The estimated phase error between I and Q, in degrees."""
+        ii, qq, iq = self._covariance()
+        if ii <= 0 or qq <= 0:
+            return 0.0
+        return math.degrees(math.asin(max(-1.0, min(1.0, iq / math.sqrt(ii * qq)))))
+
+    def coefficients(self):
+        """Return ``(dc_i, dc_q, p, g)`` such that the corrected sample
+        is ``I - dc_i + 1j * g * ((Q - dc_q) - p * (I - dc_i))``."""
+        dc_i, dc_q = self.moments[:2] if self.dc_enabled else (0.0, 0.0)
+        p, g = 0.0, 1.0
+        ii, qq, iq = self._covariance()
+        if self.iq_enabled and ii > 0:
+            p = iq / ii
+            residual = qq - p * iq
+            if residual > 0:
+                g = math.sqrt(ii / residual)
+        return dc_i, dc_q, p, g
+
+    def process(self, samples, out=None):
+        """Update the estimates with ``samples`` and return them
+        corrected.  ``out`` may be ``samples`` itself."""
+        samples = np.asarray(samples, np.complex64)
+        if out is None:
+            out = np.empty(len(samples), np.complex64)
+        self.estimate(samples)
+        dc_i, dc_q, p, g = self.coefficients()
+
+        iq = samples.view(np.float32).reshape(-1, 2)
+        out_iq = out[:len(samples)].view(np.float32).reshape(-1, 2)
+        if len(self.work) < len(samples):
+            self.work = np.empty(len(samples), np.float32)
+        work = self.work[:len(samples)]
+        # Q first, it needs the uncorrected I when working in place.
+        np.multiply(iq[:, 0], g * p, out=work)
+        np.multiply(iq[:, 1], g, out=out_iq[:, 1])
+        out_iq[:, 1] -= work
+        out_iq[:, 1] += g * (p * dc_i - dc_q)
+        np.subtract(iq[:, 0], dc_i, out=out_iq[:, 0])
+        return out[:len(samples)]
+
+    def write_back(self, module, step=0.5):
+        """Move ``step`` of the estimated residuals into the correction
+        registers of ``module`` (such as ``device.rx``) and reset the
+        estimates.  Calling this repeatedly while receiving converges on
+        registers that leave no residual for the software stage."""
+        changes = []
+        if self.dc_enabled:
+            changes += [(BLADERF_CORR_LMS_DCOFF_I, -self.moments[0] * 2048, 2048),
+                        (BLADERF_CORR_LMS_DCOFF_Q, -self.moments[1] * 2048, 2048)]
+        if self.iq_enabled:
+            changes += [(BLADERF_CORR_FPGA_PHASE, -self.phase * phase_counts, 4096),
+                        (BLADERF_CORR_FPGA_GAIN, (1.0 - self.gain) * gain_counts, 4096)]
+        for corr, delta, limit in changes:
+            value = module.get_correction(corr) + int(round(step * delta))
+            module.set_correction(corr, max(-limit, min(limit, value)))
+        self.reset()
@@ -0,0 +1,87 @@
+"""Polyphase FIR decimation."""
+import numpy as np
+
+from .filters import lowpass
+
+
+class Decimator(object):
+    """
+    Low pass filter and decimate a stream of complex64 samples.
+
+    The filter is split into ``factor`` polyphase branches, so only the
+    outputs that are kept get computed.  Input is processed a block at a
+    time: the I/Q floats are viewed as a matrix with one row per output
+    and two columns per branch, and each group of taps becomes a real
+    matrix product, which numpy hands to BLAS.  The samples still needed
+    by the next output are kept between calls, so buffers of any length
+    can be passed in.
+
+    Without ``taps``, a Kaiser windowed low pass of ``16 * factor`` taps
+    with its cutoff at 80% of the output Nyquist frequency is used.
+    """
+
+    def __init__(self, factor, taps=None):
+        self.factor = factor = int(factor)
+        if factor < 1:
+            raise ValueError('factor must be at least 1')
+        if taps is None:
+            taps = lowpass(16 * factor, 0.8 / factor)
+        taps = np.asarray(taps, np.float32)
+        self.num_branch_taps = num_branch_taps = -(-len(taps) // factor)
+        self.num_taps = num_taps = num_branch_taps * factor
+        taps = np.concatenate([taps, np.zeros(num_taps - len(taps), np.float32)])
+
+        # branch_taps[k] maps the I/Q floats of the k-th newest row that
+        # contributes to an output onto that output's I and Q.
+        self.branch_taps = np.zeros((num_branch_taps, 2 * factor, 2), np.float32)
+        for k in range(num_branch_taps):
+            branch = taps[k * factor:(k + 1) * factor][::-1]
+            self.branch_taps[k, 0::2, 0] = branch
+            self.branch_taps[k, 1::2, 1] = branch
+        self.work = np.zeros(0, np.complex64)
+        self.product = np.zeros((0, 2), np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state, as if the stream started again."""
+        self.history = np.zeros(self.num_taps - 1, np.complex64)
+
+    def output_size(self, num_samples):
+        """Return the most outputs one call with ``num_samples`` can give."""
+        return (len(self.history) + num_samples - self.num_taps) // self.factor + 1
+
+    def process(self, samples, out=None):
+        """Filter and decimate ``samples``, returning the new outputs.
+
+        If ``out`` is given the outputs are written into it, and a view
+        of the part written is returned.  It must hold at least
+        ``output_size(len(samples))`` samples.
+        """
+        factor = self.factor
+        num_branch_taps = self.num_branch_taps
+        size = len(self.history) + len(samples)
+        num_out = max(self.output_size(len(samples)), 0)
+
+        if len(self.work) < size:
+            self.work = np.empty(size, np.complex64)
+            self.product = np.empty((size // factor + 1, 2), np.float32)
+        work = self.work
+        work[:len(self.history)] = self.history
+        work[len(self.history):size] = samples
+
+        if out is None:
+            out = np.empty(num_out, np.complex64)
+        out = out[:num_out]
+        if num_out:
+            rows = work[:(num_out + num_branch_taps - 1) * factor]
+            rows = rows.view(np.float32).reshape(-1, 2 * factor)
+            product = self.product[:num_out]
+            out_iq = out.view(np.float32).reshape(-1, 2)
+            out_iq[:] = 0
+            for k in range(num_branch_taps):
+                start = num_branch_taps - 1 - k
+                np.dot(rows[start:start + num_out], self.branch_taps[k], out=product)
+                out_iq += product
+
+        self.history = work[num_out * factor:size].copy()
+        return out
@@ -0,0 +1,15 @@
+"""FIR filter design."""
+import numpy as np
+
+
+def lowpass(num_taps, cutoff, beta=8.0):
+    """Return the taps of a linear phase low pass FIR filter.
+
+    ``cutoff`` is relative to the Nyquist frequency, so it lies between
+    0 and 1, as with ``scipy.signal.firwin``.  The windowed sinc uses a
+    Kaiser window with the given ``beta`` and is normalised to unity
+    gain at DC.
+    """
+    n = np.arange(num_taps) - (num_taps - 1) / 2.0
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(num_taps, beta)
+    return (taps / taps.sum()).astype(np.float32)
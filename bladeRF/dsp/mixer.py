@@ -0,0 +1,53 @@
+"""Phase continuous frequency shifting."""
+import math
+
+import numpy as np
+
+
+class Mixer(object):
+    """
+    Shift a stream of complex64 samples up by ``frequency`` Hz.
+
+    The complex exponential for ``table_size`` samples is computed once
+    per frequency; each buffer is multiplied by a slice of it and by a
+    single complex phase, which carries the phase over from the previous
+    buffer.  Changing ``frequency`` between buffers keeps the phase
+    continuous.  Negative frequencies shift down.
+    """
+
+    def __init__(self, frequency, sample_rate, table_size=16384):
+        self.sample_rate = float(sample_rate)
+        self.table_size = table_size
+        self.table = np.empty(table_size, np.complex64)
+        self.frequency = frequency
+        self.reset()
+
+    def reset(self):
+        """Start again from zero phase."""
+        self.phase = 0.0
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @frequency.setter
+    def frequency(self, frequency):
+        self._frequency = frequency
+        self.step = 2 * math.pi * frequency / self.sample_rate
+        np.exp(1j * self.step * np.arange(self.table_size), out=self.table,
+               casting='same_kind')
+
+    def process(self, samples, out=None):
+        """Return ``samples`` shifted in frequency.  ``out`` may be
+        ``samples`` itself."""
+        samples = np.asarray(samples, np.complex64)
+        if out is None:
+            out = np.empty(len(samples), np.complex64)
+        out = out[:len(samples)]
+        for start in range(0, len(samples), self.table_size):
+            stop = min(start + self.table_size, len(samples))
+            block = out[start:stop]
+            np.multiply(samples[start:stop], self.table[:stop - start], out=block)
+            block *= np.complex64(complex(math.cos(self.phase), math.sin(self.phase)))
+            self.phase = (self.phase + self.step * (stop - start)) % (2 * math.pi)
+        return out
@@ -0,0 +1,127 @@
+"""Rational polyphase resampling."""
+from fractions import Fraction
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from .filters import lowpass
+
+
+def exact_rate(rate):
+    """Return ``rate`` as a Fraction.  ``rate`` may be a number or an
+    ``(integer, num, den)`` tuple as returned by
+    ``get_rational_sample_rate()``."""
+    if isinstance(rate, tuple):
+        integer, num, den = rate
+        return integer + Fraction(num, den)
+    return Fraction(rate)
+
+
+def resampling_ratio(rate, target, max_factor=None):
+    """Return ``(up, down)`` so that ``rate * up / down == target``.
+
+    With ``max_factor`` the ratio is approximated by the closest one with
+    ``up`` no larger than it, for rates whose exact ratio would need an
+    impractically long filter.
+    """
+    ratio = exact_rate(target) / exact_rate(rate)
+    if max_factor is not None and ratio.numerator > max_factor:
+        ratio = _limit_numerator(ratio, max_factor)
+    return ratio.numerator, ratio.denominator
+
+
+def _limit_numerator(ratio, max_numerator):
+    inverse = (1 / ratio).limit_denominator(max_numerator)
+    return 1 / inverse
+
+
+class Resampler(object):
+    """
+    Resample a stream of complex64 samples by ``up / down``.
+
+    The ratio is used exactly, so the output rate is exactly the input
+    rate times ``up / down``; use ``resampling_ratio()`` to get it from
+    the device's rational sample rate and the rate wanted.  The low pass
+    filter, ``taps_per_phase * max(up, down)`` taps long unless ``taps``
+    is given, is split into ``up`` polyphase branches.  The outputs
+    using each branch are evenly spaced in the input, so each branch is
+    one real matrix product over a strided view of the I/Q floats.  The
+    input still needed and the output phase are kept between calls.
+
+    For large decimations, reduce the rate with ``Decimator`` first.
+    """
+
+    def __init__(self, up, down, taps=None, taps_per_phase=16):
+        ratio = Fraction(int(up), int(down))
+        self.up = up = ratio.numerator
+        self.down = down = ratio.denominator
+        if taps is None:
+            taps = lowpass(taps_per_phase * max(up, down), 0.8 / max(up, down))
+        taps = np.asarray(taps, np.float32) * up
+        self.num_branch_taps = num_branch_taps = -(-len(taps) // up)
+        taps = np.concatenate([taps, np.zeros(num_branch_taps * up - len(taps), np.float32)])
+
+        # branches[p] maps the I/Q floats of the num_branch_taps input
+        # samples ending at an output with phase p onto its I and Q.
+        self.branches = np.zeros((up, 2 * num_branch_taps, 2), np.float32)
+        for phase in range(up):
+            branch = taps[phase::up][::-1]
+            self.branches[phase, 0::2, 0] = branch
+            self.branches[phase, 1::2, 1] = branch
+        self.work = np.zeros(0, np.complex64)
+        self.product = np.zeros((0, 2), np.float32)
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state, as if the stream started again."""
+        self.history = np.zeros(self.num_branch_taps - 1, np.complex64)
+        # Position of the next output in the upsampled work buffer.
+        self.time = len(self.history) * self.up
+
+    def output_size(self, num_samples):
+        """Return the most outputs one call with ``num_samples`` can give."""
+        size = len(self.history) + num_samples
+        return max((size * self.up - 1 - self.time) // self.down + 1, 0)
+
+    def process(self, samples, out=None):
+        """Resample ``samples``, returning the new outputs.
+
+        If ``out`` is given the outputs are written into it, and a view
+        of the part written is returned.  It must hold at least
+        ``output_size(len(samples))`` samples.
+        """
+        up, down = self.up, self.down
+        size = len(self.history) + len(samples)
+        num_out = self.output_size(len(samples))
+
+        if len(self.work) < size:
+            self.work = np.empty(size, np.complex64)
+            self.product = np.empty((size * up // down + 1, 2), np.float32)
+        work = self.work
+        work[:len(self.history)] = self.history
+        work[len(self.history):size] = samples
+
+        if out is None:
+            out = np.empty(num_out, np.complex64)
+        out = out[:num_out]
+        out_iq = out.view(np.float32).reshape(-1, 2)
+        iq = work.view(np.float32)
+        itemsize = iq.itemsize
+        num_columns = 2 * self.num_branch_taps
+        for first in range(min(up, num_out)):
+            # Outputs first, first + up, ... share a branch and step
+            # through the input by down samples.
+            time = self.time + first * down
+            start = time // up - self.num_branch_taps + 1
+            count = len(range(first, num_out, up))
+            rows = as_strided(iq[2 * start:], (count, num_columns),
+                              (2 * down * itemsize, itemsize))
+            product = self.product[:count]
+            np.dot(rows, self.branches[time % up], out=product)
+            out_iq[first::up] = product
+
+        end = self.time + num_out * down
+        keep = min(end // up - self.num_branch_taps + 1, size)
+        self.history = work[keep:size].copy()
+        self.time = end - keep * up
+        return out
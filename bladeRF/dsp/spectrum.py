@@ -0,0 +1,288 @@
+"""Averaged power spectrum estimation."""
+import threading
+
+import numpy as np
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+windows = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+    'rectangular': np.ones,
+    }
+
+
+def _fft_has_out():
+    try:
+        np.fft.fft(np.zeros(2, np.complex64), out=np.zeros(2, np.complex128))
+    except TypeError:
+        return False
+    return True
+
+
+class SpectrumEstimator(object):
+    """
+    Welch power spectrum estimate of a stream of complex64 samples.
+
+    Samples are split into windowed segments of ``nfft`` samples, each
+    ``overlap`` (a fraction) overlapping the previous one, carried across
+    calls to ``update()``.  Each segment's power spectrum is averaged
+    either exponentially, with weight ``alpha`` for the newest segment,
+    or as a boxcar over the last ``num_average`` segments, kept in a
+    ring with a running sum.  The window and every intermediate buffer
+    are allocated once, so the cost per sample stays constant.
+
+    Power is scaled so that a full scale tone in the middle of a bin
+    reads 0 dBFS.  ``window`` is one of the names in ``windows`` or an
+    array of ``nfft`` weights.
+    """
+
+    def __init__(self, nfft, overlap=0.5, window='hann',
+                 averaging='exponential', alpha=0.1, num_average=10):
+        self.nfft = nfft
+        self.step = max(nfft - int(nfft * overlap), 1)
+        if isinstance(window, str):
+            window = windows[window](nfft)
+        self.window = np.asarray(window, np.float32)
+        self.scale = 1.0 / float(np.sum(self.window)) ** 2
+        if averaging not in ('exponential', 'boxcar'):
+            raise ValueError('averaging must be exponential or boxcar')
+        self.averaging = averaging
+        self.alpha = alpha
+        self.num_average = num_average
+
+        self.segment = np.empty(nfft, np.complex64)
+        self.transform = np.empty(nfft, np.complex128)
+        self.power = np.empty(nfft, np.float32)
+        self.fft_has_out = _fft_has_out()
+        self.work = np.zeros(0, np.complex64)
+        if averaging == 'boxcar':
+            self.ring = np.zeros((num_average, nfft), np.float32)
+            self.total = np.zeros(nfft, np.float64)
+        else:
+            self.average = np.zeros(nfft, np.float32)
+        self.reset()
+
+    def reset(self):
+        """Discard the average and any partial segment."""
+        self.pending = 0
+        self.count = 0
+        self.index = 0
+        if self.averaging == 'boxcar':
+            self.ring[:] = 0
+            self.total[:] = 0
+        else:
+            self.average[:] = 0
+
+    def scratch(self):
+        """Return a new set of the intermediate buffers used by
+        ``frame_power()``, for calling it from another thread."""
+        return (np.empty(self.nfft, np.complex64),
+                np.empty(self.nfft, np.complex128))
+
+    def frame_power(self, segment, out, scratch=None):
+        """Write the scaled power spectrum of one ``nfft`` long segment
+        into ``out``.  This touches no averaging state, so it is safe to
+        call from several threads as long as each passes its own
+        ``scratch()`` buffers."""
+        windowed, transform = scratch or (self.segment, self.transform)
+        np.multiply(segment, self.window, out=windowed)
+        if self.fft_has_out:
+            transform = np.fft.fft(windowed, out=transform)
+        else:
+            transform = np.fft.fft(windowed)
+        iq = transform.view(np.float64).reshape(-1, 2)
+        np.einsum('ij,ij->i', iq, iq, out=out, casting='same_kind')
+        out *= self.scale
+        return out
+
+    def accumulate(self, power):
+        """Add one segment's power spectrum to the average."""
+        if self.averaging == 'boxcar':
+            self.total -= self.ring[self.index]
+            self.ring[self.index] = power
+            self.total += power
+            self.index = (self.index + 1) % self.num_average
+        elif self.count == 0:
+            self.average[:] = power
+        else:
+            self.average *= 1.0 - self.alpha
+            power *= self.alpha
+            self.average += power
+        self.count += 1
+
+    def update(self, samples):
+        """Add ``samples`` to the estimate, returning the number of new
+        segments averaged in."""
+        size = self.pending + len(samples)
+        if len(self.work) < size:
+            work = np.empty(size, np.complex64)
+            work[:self.pending] = self.work[:self.pending]
+            self.work = work
+        self.work[self.pending:size] = samples
+
+        start = 0
+        segments = 0
+        while start + self.nfft <= size:
+            self.accumulate(self.frame_power(self.work[start:start + self.nfft],
+                                             self.power))
+            start += self.step
+            segments += 1
+        start = min(start, size)
+        self.pending = size - start
+        self.work[:self.pending] = self.work[start:size]
+        return segments
+
+    def spectrum(self, out=None):
+        """Return the averaged power spectrum, with DC in the middle."""
+        if out is None:
+            out = np.empty(self.nfft, np.float32)
+        if self.averaging == 'boxcar':
+            average = self.total / max(min(self.count, self.num_average), 1)
+        else:
+            average = self.average
+        half = self.nfft // 2
+        out[:self.nfft - half] = average[half:]
+        out[self.nfft - half:] = average[:half]
+        return out
+
+    def db(self, out=None):
+        """Return the averaged power spectrum in dBFS, with DC in the
+        middle."""
+        out = self.spectrum(out)
+        np.maximum(out, 1e-20, out=out)
+        np.log10(out, out=out)
+        out *= 10
+        return out
+
+    def frequencies(self, sample_rate, center=0.0):
+        """Return the frequency of each bin of ``spectrum()``."""
+        return center + np.fft.fftshift(np.fft.fftfreq(self.nfft, 1.0 / sample_rate))
+
+
+class _Job(object):
+    """A run of samples holding ``count`` whole segments, and room for
+    their power spectra."""
+
+    def __init__(self, nfft):
+        self.seq = 0
+        self.count = 0
+        self.samples = np.zeros(0, np.complex64)
+        self.power = np.zeros((0, nfft), np.float32)
+
+
+class SpectrumPipeline(object):
+    """
+    Feed a ``SpectrumEstimator`` from a pool of worker threads.
+
+    ``submit()`` copies samples into one of ``num_jobs`` preallocated
+    jobs and returns at once; ``num_workers`` threads compute the
+    segment spectra in parallel (numpy's FFT releases the GIL), and the
+    results are merged into the estimator's average in submission
+    order, so the estimate is the same as calling ``estimator.update()``
+    directly.  When every job is busy the samples are dropped, counted
+    in ``dropped``, and segmenting restarts with the next submission.
+
+    Read the estimate with ``spectrum()`` or ``db()``, which hold the
+    merge lock, and ``close()`` the pipeline when done.
+    """
+
+    def __init__(self, estimator, num_workers=2, num_jobs=16):
+        self.estimator = estimator
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.tail = np.zeros(estimator.nfft, np.complex64)
+        self.seq = 0
+        self.next_seq = 0
+        self.done = {}
+        self.free = queue.Queue()
+        for i in range(num_jobs):
+            self.free.put(_Job(estimator.nfft))
+        self.work = queue.Queue()
+        self.workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._worker)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, samples):
+        """Queue a copy of ``samples`` for processing.  Returns False if
+        they had to be dropped."""
+        try:
+            job = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            self.pending = 0
+            return False
+        nfft, step = self.estimator.nfft, self.estimator.step
+        size = self.pending + len(samples)
+        if len(job.samples) < size:
+            job.samples = np.empty(size, np.complex64)
+        job.samples[:self.pending] = self.tail[:self.pending]
+        job.samples[self.pending:size] = samples
+
+        job.count = 0 if size < nfft else (size - nfft) // step + 1
+        start = min(job.count * step, size)
+        self.pending = size - start
+        if len(self.tail) < self.pending:
+            self.tail = np.empty(self.pending, np.complex64)
+        self.tail[:self.pending] = job.samples[start:size]
+        if job.count == 0:
+            self.free.put(job)
+            return True
+        job.seq = self.seq
+        self.seq += 1
+        self.work.put(job)
+        return True
+
+    def _worker(self):
+        estimator = self.estimator
+        scratch = estimator.scratch()
+        while True:
+            job = self.work.get()
+            if job is None:
+                self.work.task_done()
+                return
+            if len(job.power) < job.count:
+                job.power = np.empty((job.count, estimator.nfft), np.float32)
+            for i in range(job.count):
+                start = i * estimator.step
+                estimator.frame_power(job.samples[start:start + estimator.nfft],
+                                      job.power[i], scratch)
+            with self.lock:
+                self.done[job.seq] = job
+                while self.next_seq in self.done:
+                    ready = self.done.pop(self.next_seq)
+                    for i in range(ready.count):
+                        estimator.accumulate(ready.power[i])
+                    self.next_seq += 1
+                    self.free.put(ready)
+            self.work.task_done()
+
+    def flush(self):
+        """Wait until every submitted job has been merged."""
+        self.work.join()
+
+    def spectrum(self, out=None):
+        """Same as ``SpectrumEstimator.spectrum()``."""
+        with self.lock:
+            return self.estimator.spectrum(out)
+
+    def db(self, out=None):
+        """Same as ``SpectrumEstimator.db()``."""
+        with self.lock:
+            return self.estimator.db(out)
+
+    def close(self):
+        """Stop the worker threads after the queued jobs."""
+        for worker in self.workers:
+            self.work.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
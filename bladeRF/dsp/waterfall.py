@@ -0,0 +1,93 @@
+"""Scrolling spectrum history for waterfall displays."""
+import numpy as np
+
+
+class Waterfall(object):
+    """
+    The last ``num_rows`` spectra, ``num_columns`` bins each, in a ring.
+
+    ``add()`` writes one row in place and advances the ring index, so a
+    new line costs one row rather than a shift of the whole image.
+    ``view()`` assembles the rows in time order into a contiguous array,
+    only when the display needs it.
+
+    Each added line is averaged down by ``decimation`` bins per column,
+    and ``average`` lines are averaged into each row.  With ``db`` true
+    the lines are linear power and rows are stored in dB.  If ``scale``
+    is a ``(low, high)`` pair rows are then mapped linearly to [0, 1]
+    and clipped, ready for a fixed colour map.
+    """
+
+    def __init__(self, num_rows, num_columns, decimation=1, average=1,
+                 db=False, scale=None, fill=0.0):
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.decimation = decimation
+        self.average = average
+        self.db = db
+        self.scale = scale
+        self.rows = np.empty((num_rows, num_columns), np.float32)
+        self.image = np.empty((num_rows, num_columns), np.float32)
+        self.binned = np.empty(num_columns, np.float32)
+        self.sum = np.zeros(num_columns, np.float32)
+        self.fill = fill
+        self.reset()
+
+    def reset(self):
+        """Clear all rows."""
+        self.rows[:] = self.fill
+        self.sum[:] = 0
+        self.pending = 0
+        self.index = 0
+        self.count = 0
+
+    def add(self, line):
+        """Add a spectrum of ``num_columns * decimation`` bins.  Returns
+        True if it completed a row."""
+        line = np.asarray(line, np.float32)
+        if self.decimation > 1:
+            bins = line[:self.num_columns * self.decimation]
+            line = np.mean(bins.reshape(self.num_columns, self.decimation),
+                           axis=1, out=self.binned)
+        row = self.rows[self.index]
+        if self.average > 1:
+            self.sum += line
+            self.pending += 1
+            if self.pending < self.average:
+                return False
+            np.multiply(self.sum, 1.0 / self.average, out=row)
+            self.sum[:] = 0
+            self.pending = 0
+        else:
+            row[:] = line
+        if self.db:
+            np.maximum(row, 1e-20, out=row)
+            np.log10(row, out=row)
+            row *= 10
+        if self.scale is not None:
+            low, high = self.scale
+            row -= low
+            row *= 1.0 / (high - low)
+            np.clip(row, 0.0, 1.0, out=row)
+        self.index = (self.index + 1) % self.num_rows
+        self.count += 1
+        return True
+
+    def latest(self):
+        """Return the most recent row."""
+        return self.rows[self.index - 1]
+
+    def view(self, out=None, newest_first=True):
+        """Return the rows in time order as one contiguous array, newest
+        first unless ``newest_first`` is false.  ``out`` defaults to a
+        buffer owned by the waterfall, overwritten by the next call."""
+        if out is None:
+            out = self.image
+        index = self.index
+        if newest_first:
+            out[:index] = self.rows[:index][::-1]
+            out[index:] = self.rows[index:][::-1]
+        else:
+            out[:self.num_rows - index] = self.rows[index:]
+            out[self.num_rows - index:] = self.rows[:index]
+        return out
@@ -9,8 +9,8 @@ app = QtGui.QApplication([])
 import pyqtgraph.parametertree.parameterTypes as pTypes
 from pyqtgraph.parametertree import Parameter, ParameterTree, ParameterItem, registerParameterType
 
-from scipy import signal
 import bladeRF
+from bladeRF.dsp import SpectrumEstimator, Waterfall
 
 device = bladeRF.Device()
 device.rx.enabled = True
@@ -115,23 +115,25 @@ win = QtGui.QWidget()
 layout = QtGui.QGridLayout()
 win.setLayout(layout)
 
-Arx = np.zeros([Nf, Ns])
+waterfall = Waterfall(Nf, Ns)
+# One averaged periodogram per waterfall row.
+estimator = SpectrumEstimator(Ns, window='hamming', averaging='exponential', alpha=0.5)
+line = np.empty(Ns, np.float32)
 inwin = pg.ImageView(view=pg.PlotItem())
-inwin.setImage(Arx, scale=[2, 2])
+inwin.setImage(waterfall.view(), scale=[2, 2])
 
 queue = Queue.Queue(num_buffers)
+# One converted buffer per stream buffer, so the callback never allocates.
+iq_buffers = np.empty((num_buffers, num_samples), np.complex64)
 
 def update():
-    global Arx
-    Arx = np.roll(Arx, 1, axis=0)
     try:
         samples = queue.get_nowait()
     except Queue.Empty:
         return
-    f, fft = signal.periodogram(samples, window='hamming', scaling='density', nfft=Ns)
-    fft = 10*np.log10(fft)
-    Arx[0] = fft
-    inwin.setImage(Arx.T, autoRange=False, scale=[2, 2])
+    estimator.update(samples)
+    waterfall.add(estimator.db(out=line))
+    inwin.setImage(waterfall.view().T, autoRange=False, scale=[2, 2])
 
 layout.addWidget(inwin, 1, 0, 1, 10)
 
@@ -160,11 +162,11 @@ win.show()
 win.resize(1600,800)
 
 def rx(device, stream, meta_data, samples, num_samples, user_data):
-    samples = bladeRF.samples_to_narray(samples, num_samples)
+    samples = bladeRF.samples_to_narray(samples, num_samples, out=iq_buffers[stream.current_buff])
     try:
         queue.put_nowait(samples)
     except Queue.Full:
-        pass
+        stream.stats.dropped += 1
     return stream.next()
 
 stream = device.rx.stream(
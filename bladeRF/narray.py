@@ -0,0 +1,66 @@
+"""Conversion between SC16_Q11 samples and numpy arrays."""
+import numpy as np
+
+from ._cffi import ffi, lib, as_pointer
+
+
+def samples_to_narray(samples, num_samples, out=None):
+    """Return a numpy array of type complex64 from the samples.
+
+    Both I and Q of all ``num_samples`` samples are converted.  If
+    ``out`` is given it must be a C-contiguous complex64 array of at
+    least ``num_samples`` elements.  The samples are converted
+    straight into it and a view of the first ``num_samples``
+    elements is returned, so nothing is allocated per call.
+    """
+    if out is None:
+        out = np.empty(num_samples, np.complex64)
+    elif (out.dtype != np.complex64 or not out.flags.c_contiguous
+          or len(out) < num_samples):
+        raise ValueError('out must be a contiguous complex64 array '
+                         'of at least %d samples' % num_samples)
+    lib.samples_to_floats_into(as_pointer(samples),
+                               as_pointer(out, 'float *'),
+                               num_samples)
+    return out[:num_samples]
+
+
+def narray_to_samples(array, out=None, scale=2048.0):
+    """Convert a complex array to SC16_Q11 samples for transmission.
+
+    Values are multiplied by ``scale``, rounded and saturated to
+    [-2048, 2047].  ``out`` may be any buffer of at least
+    ``len(array)`` samples, such as an entry of ``Stream.buffers``,
+    an ``int16_t[]`` or an int16 numpy array; it is written in place,
+    and ValueError is raised if it is known to be too small.
+    If it is omitted a new ``int16_t[]`` is allocated.
+
+    Returns ``(out, clipped)`` where ``clipped`` is the number of
+    samples that had I or Q saturated.
+    """
+    array = np.ascontiguousarray(array, np.complex64)
+    num_samples = len(array)
+    if out is None:
+        out = ffi.new('int16_t[]', 2 * num_samples)
+    else:
+        # The size of a bare pointer, such as an entry of Stream.buffers,
+        # is unknown and taken on trust.
+        if isinstance(out, ffi.CData):
+            size = ffi.sizeof(out) if ffi.typeof(out).kind == 'array' else None
+        else:
+            size = len(ffi.from_buffer(out))
+        if size is not None and size < num_samples * 2 * ffi.sizeof('int16_t'):
+            raise ValueError('out must hold at least %d samples' % num_samples)
+    clipped = lib.floats_to_samples_into(as_pointer(array, 'float *'),
+                                         as_pointer(out),
+                                         num_samples, scale)
+    return out, int(clipped)
+
+
+def power(samples):
+    return 10*np.log10(np.abs(np.vdot(samples, samples)))
+
+
+def squelched(samples, level):
+    return power(samples) < level
+
@@ -0,0 +1,118 @@
+"""Feeding recorded samples to a TX stream."""
+import mmap
+
+from bladeRF._cffi import ffi, as_pointer
+
+sample_size = ffi.sizeof('int16_t') * 2
+
+
+class Playback(object):
+    """
+    Plays an SC16_Q11 file into TX buffers.
+
+    A regular file is memory mapped and ``fill()`` copies the next slice
+    of it straight into a buffer such as an entry of ``Stream.buffers``,
+    without a system call per buffer.  Playback starts ``start`` samples
+    into the file and, with ``loop``, wraps around to ``start`` at the
+    end.  The kernel is told the file is read sequentially and, every
+    ``prefetch`` samples, to read ahead the next ``prefetch`` samples, so
+    page faults do not stall the stream.
+
+    ``path`` may also be ``'-'`` or any file that cannot be mapped, such
+    as a pipe; it is then read with ``readinto()``, without looping.
+    """
+
+    def __init__(self, path, loop=False, start=0, prefetch=1 << 20):
+        self.loop = loop
+        self.start = start
+        self.prefetch = prefetch
+        self.map = None
+        self.owns_file = isinstance(path, str) and path != '-'
+        if path == '-':
+            import sys
+            self.file = getattr(sys.stdin, 'buffer', sys.stdin)
+        elif self.owns_file:
+            self.file = open(path, 'rb')
+        else:
+            self.file = path
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, EnvironmentError):
+            self.loop = False
+            if start:
+                self.file.read(start * sample_size)
+            self.position = start
+            return
+        self.view = ffi.from_buffer(self.map)
+        self.num_samples = len(self.map) // sample_size
+        if not 0 <= start < self.num_samples:
+            raise ValueError('start must be within the %d samples of the file'
+                             % self.num_samples)
+        self.position = start
+        self._advise(getattr(mmap, 'MADV_SEQUENTIAL', None), 0, len(self.map))
+        self.prefetched = start
+        self._prefetch()
+
+    def _advise(self, option, offset, size):
+        if size > 0 and option is not None and hasattr(self.map, 'madvise'):
+            # Offsets must be page aligned.
+            aligned = offset - offset % mmap.PAGESIZE
+            self.map.madvise(option, aligned, min(size + offset - aligned,
+                                                  len(self.map) - aligned))
+
+    def _prefetch(self):
+        if self.position < self.prefetched - self.prefetch // 2:
+            return
+        start = self.position
+        count = min(self.prefetch, self.num_samples - start)
+        self._advise(getattr(mmap, 'MADV_WILLNEED', None),
+                     start * sample_size, count * sample_size)
+        self.prefetched = start + count
+
+    def fill(self, buffer, num_samples):
+        """Copy the next ``num_samples`` samples into ``buffer``.  Returns
+        the number copied; the rest of a short buffer is zeroed, and 0
+        means playback has ended."""
+        dest = as_pointer(buffer, 'char *')
+        if self.map is None:
+            return self._read(dest, num_samples)
+        filled = 0
+        while filled < num_samples:
+            if self.position >= self.num_samples:
+                if not self.loop:
+                    break
+                self.position = self.prefetched = self.start
+            count = min(num_samples - filled, self.num_samples - self.position)
+            ffi.memmove(dest + filled * sample_size,
+                        self.view + self.position * sample_size,
+                        count * sample_size)
+            filled += count
+            self.position += count
+            self._prefetch()
+        if filled < num_samples:
+            ffi.memmove(dest + filled * sample_size,
+                        b'\0' * ((num_samples - filled) * sample_size),
+                        (num_samples - filled) * sample_size)
+        return filled
+
+    def _read(self, dest, num_samples):
+        size = num_samples * sample_size
+        data = ffi.buffer(dest, size)
+        got = 0
+        while got < size:
+            count = self.file.readinto(memoryview(data)[got:])
+            if not count:
+                break
+            got += count
+        filled = got // sample_size
+        data[filled * sample_size:] = b'\0' * (size - filled * sample_size)
+        self.position += filled
+        return filled
+
+    def close(self):
+        if self.map is not None:
+            del self.view
+            self.map.close()
+            self.map = None
+        if self.owns_file:
+            self.file.close()
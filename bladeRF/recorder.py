@@ -0,0 +1,203 @@
+"""Recording received samples to disk off the stream thread."""
+import json
+import mmap
+import os
+import threading
+import time
+
+from bladeRF._cffi import ffi, as_pointer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+sample_size = ffi.sizeof('int16_t') * 2
+
+
+def preallocate(f, size):
+    """Allocate ``size`` bytes of disk space for the open file ``f``, so
+    that writing to it later does not have to, falling back to setting
+    its size where the file system cannot."""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+            return
+        except OSError:
+            # Not supported by the file system.
+            pass
+    f.truncate(size)
+
+
+def capture_metadata(device, module=None):
+    """Return a dict describing the current settings of ``module``
+    (``device.rx`` by default), for a recording's sidecar file.
+
+    ``setup_timestamp`` is the module's timestamp counter when this is
+    called, before streaming starts; ``Recorder`` adds the wall clock
+    time, and the device timestamp if known, of the first buffer."""
+    module = module or device.rx
+    return {
+        'format': 'SC16_Q11',
+        'frequency': module.frequency,
+        'sample_rate': module.sample_rate,
+        'rational_sample_rate': list(module.rational_sample_rate),
+        'bandwidth': module.bandwidth,
+        'lna_gain': device.lna_gain,
+        'vga1': module.vga1,
+        'vga2': module.vga2,
+        'setup_timestamp': module.timestamp,
+        }
+
+
+class Recorder(object):
+    """
+    Records SC16_Q11 buffers without doing any I/O on the caller's thread.
+
+    With ``num_samples`` the file at ``path`` is preallocated to that
+    many samples and memory mapped, and ``write()`` copies each buffer
+    into the mapping; the kernel writes it back in the background.  Once
+    a buffer does not fit ``full`` is set and it, and every buffer after
+    it, is dropped.
+
+    Otherwise ``path`` may also be an open binary file such as stdout.
+    ``write()`` copies each buffer into one of ``num_slots`` preallocated
+    slots of ``buffer_samples`` samples and queues it for a writer
+    thread.  When every slot is waiting to be written the buffer is
+    dropped.  ``backlog`` is the number of slots waiting and
+    ``max_backlog`` its high water mark.  If writing to the file fails,
+    ``write()`` and ``close()`` raise the error.
+
+    ``metadata``, such as the result of ``capture_metadata()``, is
+    written to ``path + '.json'`` when recording starts, and again when
+    the recorder is closed, with the sample and drop counts, the wall
+    clock ``start_time`` of the first buffer and, if ``write()`` was
+    given it, its device ``start_timestamp``.
+    """
+
+    def __init__(self, path, num_samples=None, buffer_samples=16384,
+                 num_slots=256, metadata=None):
+        self.metadata = metadata
+        self.written = 0
+        self.dropped = 0
+        self.max_backlog = 0
+        self.full = False
+        self.error = None
+        self.start = None
+        self.capacity = num_samples
+        if isinstance(path, str):
+            self.path = path
+            self.file = open(path, 'w+b' if num_samples else 'wb')
+        else:
+            self.path = None
+            self.file = path
+        if num_samples:
+            preallocate(self.file, num_samples * sample_size)
+            self.map = mmap.mmap(self.file.fileno(), num_samples * sample_size)
+            self.view = ffi.from_buffer(self.map)
+            self.writer = None
+        else:
+            self.map = None
+            self.buffer_samples = buffer_samples
+            self.slots = [ffi.new('int16_t[]', 2 * buffer_samples)
+                          for i in range(num_slots)]
+            self.free = queue.Queue()
+            for slot in self.slots:
+                self.free.put(slot)
+            self.filled = queue.Queue()
+            self.writer = threading.Thread(target=self._writer)
+            self.writer.daemon = True
+            self.writer.start()
+        self._write_sidecar()
+
+    @property
+    def backlog(self):
+        return self.filled.qsize() if self.writer else 0
+
+    def write(self, samples, num_samples, timestamp=None):
+        """Copy ``num_samples`` samples, a stream buffer or an int16
+        array, received at device ``timestamp`` if known, for writing.
+        Returns False if they were dropped."""
+        if self.error is not None:
+            raise self.error
+        if self.start is None:
+            self.start = {'start_time': time.time()}
+            if timestamp is not None:
+                self.start['start_timestamp'] = timestamp
+        size = num_samples * sample_size
+        if self.map is not None:
+            if self.full or self.written + num_samples > self.capacity:
+                self.full = True
+                self.dropped += 1
+                return False
+            ffi.memmove(self.view + self.written * sample_size,
+                        as_pointer(samples, 'char *'), size)
+            self.written += num_samples
+            return True
+
+        if num_samples > self.buffer_samples:
+            raise ValueError('at most %d samples per write' % self.buffer_samples)
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        ffi.memmove(slot, as_pointer(samples), size)
+        self.filled.put((slot, num_samples))
+        self.written += num_samples
+        self.max_backlog = max(self.max_backlog, self.filled.qsize())
+        return True
+
+    def _writer(self):
+        while True:
+            slot, num_samples = self.filled.get()
+            if slot is None:
+                return
+            try:
+                if self.error is None:
+                    self.file.write(ffi.buffer(slot, num_samples * sample_size))
+            except Exception as error:
+                self.error = error
+                self.full = True
+            finally:
+                self.free.put(slot)
+
+    def stats(self):
+        """Return the recording counters as a dict."""
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'backlog': self.backlog,
+            'max_backlog': self.max_backlog,
+            }
+
+    def close(self):
+        """Write out everything queued, trim a preallocated file to the
+        samples written and write the sidecar.  Raises the error writing
+        failed with, if any, without updating the sidecar."""
+        if self.writer is not None:
+            self.filled.put((None, 0))
+            self.writer.join()
+            self.writer = None
+        if self.error is not None:
+            if self.path is not None:
+                self.file.close()
+            raise self.error
+        if self.map is not None:
+            del self.view
+            self.map.flush()
+            self.map.close()
+            self.map = None
+            self.file.truncate(self.written * sample_size)
+        self.file.flush()
+        if self.path is not None:
+            self.file.close()
+            self._write_sidecar(num_samples=self.written, dropped=self.dropped,
+                                **(self.start or {}))
+
+    def _write_sidecar(self, **counts):
+        if self.path is None or self.metadata is None:
+            return
+        metadata = dict(self.metadata, **counts)
+        with open(self.path + '.json', 'w') as sidecar:
+            json.dump(metadata, sidecar, indent=2, sort_keys=True)
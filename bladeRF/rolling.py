@@ -0,0 +1,328 @@
+"""Continuous recording into a rolling set of fixed length segments."""
+import bisect
+import errno
+import json
+import mmap
+import os
+import threading
+import time
+
+import numpy as np
+
+from bladeRF._cffi import ffi, as_pointer
+from bladeRF.recorder import preallocate
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+sample_size = ffi.sizeof('int16_t') * 2
+index_name = 'index.json'
+
+
+class SegmentIndex(object):
+    """
+    Finds samples in a rolling capture by device timestamp or wall clock.
+
+    Each segment has a list of anchors ``[offset, timestamp, time]``: the
+    sample at ``offset`` in the segment file was received at device
+    ``timestamp`` and, approximately, wall clock ``time``, and the
+    samples up to the next anchor follow on from it.
+    """
+
+    def __init__(self, directory, sample_rate, segments):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.segments = segments
+        # Contiguous runs of samples: (timestamp, time, file, offset, count)
+        self.runs = []
+        for segment in segments:
+            anchors = segment['anchors']
+            for i, (offset, timestamp, wall) in enumerate(anchors):
+                end = anchors[i + 1][0] if i + 1 < len(anchors) else segment['num_samples']
+                if end > offset:
+                    self.runs.append((timestamp, wall, segment['file'], offset, end - offset))
+        self.timestamps = [run[0] for run in self.runs]
+        self.times = [run[1] for run in self.runs]
+
+    @classmethod
+    def load(cls, directory):
+        """Read the index a ``RollingRecorder`` left in ``directory``."""
+        with open(os.path.join(directory, index_name)) as f:
+            index = json.load(f)
+        return cls(directory, index['sample_rate'], index['segments'])
+
+    @property
+    def start(self):
+        """The timestamp of the oldest sample, None if there are none."""
+        return self.runs[0][0] if self.runs else None
+
+    def _run(self, timestamp):
+        i = bisect.bisect_right(self.timestamps, timestamp) - 1
+        if i < 0 or timestamp >= self.runs[i][0] + self.runs[i][4]:
+            return None
+        return self.runs[i]
+
+    def locate(self, timestamp):
+        """Return ``(path, offset)`` of the sample received at device
+        ``timestamp``, or None if it was not recorded or is gone."""
+        run = self._run(timestamp)
+        if run is None:
+            return None
+        run_timestamp, _, name, offset, _ = run
+        return os.path.join(self.directory, name), offset + timestamp - run_timestamp
+
+    def timestamp_at(self, wall_time):
+        """Return the device timestamp of the sample received at
+        ``wall_time`` (as from ``time.time()``), or None."""
+        i = bisect.bisect_right(self.times, wall_time) - 1
+        if i < 0:
+            return None
+        run_timestamp, run_time, _, _, count = self.runs[i]
+        offset = int((wall_time - run_time) * self.sample_rate)
+        return run_timestamp + offset if offset < count else None
+
+    def read(self, timestamp, count):
+        """Return up to ``count`` samples from device ``timestamp`` on as
+        a (count, 2) int16 array, stopping early at a gap.
+
+        An index taken from a running recorder goes stale as its oldest
+        segments are recycled; reading one of those raises IOError.
+        """
+        out = np.empty((count, 2), np.int16)
+        filled = 0
+        while filled < count:
+            run = self._run(timestamp)
+            if run is None:
+                break
+            run_timestamp, _, name, offset, run_count = run
+            skip = timestamp - run_timestamp
+            n = min(count - filled, run_count - skip)
+            try:
+                f = open(os.path.join(self.directory, name), 'rb')
+            except IOError as error:
+                if error.errno != errno.ENOENT:
+                    raise
+                raise IOError(errno.ENOENT, 'segment has been recycled', name)
+            with f:
+                f.seek((offset + skip) * sample_size)
+                data = np.fromfile(f, np.int16, 2 * n)
+            out[filled:filled + len(data) // 2] = data.reshape(-1, 2)
+            filled += len(data) // 2
+            timestamp += n
+            if len(data) < 2 * n:
+                break
+        return out[:filled]
+
+
+class RollingRecorder(object):
+    """
+    Records SC16_Q11 buffers continuously into segments of
+    ``segment_seconds`` in ``directory``, keeping ``num_segments`` segment
+    files, or as many as fit in ``max_bytes``.  They hold the segment
+    being written, the one ready to be written next and the newest
+    complete segments.
+
+    Segment files are preallocated and memory mapped, so ``write()``
+    only copies; the kernel writes the samples back in the background.
+    A housekeeping thread keeps the next segment ready, recycling the
+    oldest segment's file by renaming it once enough are kept, so the
+    disk space is allocated once and the stream thread never waits for
+    the file system.  If the next segment is not ready in time the rest
+    of the buffer is dropped.
+
+    ``index.json`` in ``directory`` is rewritten as segments complete; it
+    describes the kept segments for ``SegmentIndex``, which maps device
+    timestamps and wall clock times to segment files and offsets.
+    Timestamps advance by one per sample recorded, from
+    ``start_timestamp``, unless ``write()`` is given them.
+
+    If the housekeeping thread fails, ``write()`` and ``close()`` raise
+    its error.
+    """
+
+    def __init__(self, directory, sample_rate, segment_seconds=60,
+                 num_segments=None, max_bytes=None, start_timestamp=0,
+                 metadata=None):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.sample_rate = sample_rate
+        self.segment_samples = int(segment_seconds * sample_rate)
+        self.segment_bytes = self.segment_samples * sample_size
+        if num_segments is None:
+            if max_bytes is None:
+                raise ValueError('num_segments or max_bytes is required')
+            num_segments = max_bytes // self.segment_bytes
+        if num_segments < 3:
+            raise ValueError('at least 3 segments must be kept')
+        self.num_segments = num_segments
+        self.metadata = metadata or {}
+
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self.next_timestamp = start_timestamp
+        self.anchor = True
+        self.segments = []
+        self.lock = threading.Lock()
+        self.current = self._prepare(0)
+        self.current['anchors'] = []
+        self.fill = 0
+        self.ready = queue.Queue()
+        self.ready.put(self._prepare(1))
+        self.next_sequence = 2
+        self.tasks = queue.Queue()
+        self.housekeeper = threading.Thread(target=self._housekeeper)
+        self.housekeeper.daemon = True
+        self.housekeeper.start()
+
+    def _name(self, sequence):
+        return 'segment-%08d.sc16' % sequence
+
+    def _next_segment(self):
+        try:
+            self.current = self.ready.get_nowait()
+        except queue.Empty:
+            return False
+        self.current['anchors'] = []
+        self.fill = 0
+        # Keep one segment ready beyond this one.
+        self.tasks.put(('prepare', self.next_sequence))
+        self.next_sequence += 1
+        return True
+
+    def _finish_segment(self, size=None):
+        segment = self.current
+        self.current = None
+        entry = {'file': segment['file'], 'sequence': segment['sequence'],
+                 'num_samples': self.fill, 'anchors': segment['anchors']}
+        with self.lock:
+            self.segments.append(entry)
+        self.tasks.put(('finish', (segment, size)))
+        self.anchor = True
+
+    def write(self, samples, num_samples, timestamp=None):
+        """Copy ``num_samples`` samples, a stream buffer or an int16
+        array, received at device ``timestamp`` if known.  Returns False
+        if they were dropped."""
+        if self.error is not None:
+            raise self.error
+        if timestamp is not None and timestamp != self.next_timestamp:
+            self.next_timestamp = timestamp
+            self.anchor = True
+        source = as_pointer(samples, 'char *')
+        done = 0
+        while done < num_samples:
+            if self.current is None and not self._next_segment():
+                self.dropped += 1
+                self.next_timestamp += num_samples - done
+                self.anchor = True
+                return False
+            if self.anchor:
+                self.current['anchors'].append([self.fill, self.next_timestamp, time.time()])
+                self.anchor = False
+            count = min(num_samples - done, self.segment_samples - self.fill)
+            ffi.memmove(self.current['view'] + self.fill * sample_size,
+                        source + done * sample_size, count * sample_size)
+            self.fill += count
+            done += count
+            self.written += count
+            self.next_timestamp += count
+            if self.fill == self.segment_samples:
+                self._finish_segment()
+        return True
+
+    def index(self):
+        """Return a ``SegmentIndex`` of the completed segments."""
+        with self.lock:
+            segments = list(self.segments)
+        return SegmentIndex(self.directory, self.sample_rate, segments)
+
+    def _housekeeper(self):
+        while True:
+            task, argument = self.tasks.get()
+            if task is None:
+                return
+            try:
+                if task == 'prepare':
+                    if self.error is None:
+                        self.ready.put(self._prepare(argument))
+                else:
+                    # Finished segments are unmapped even after a failure.
+                    self._close_segment(*argument)
+                    if self.error is None:
+                        self._write_index()
+            except Exception as error:
+                if self.error is None:
+                    self.error = error
+
+    def _prepare(self, sequence):
+        name = self._name(sequence)
+        path = os.path.join(self.directory, name)
+        recycled = None
+        with self.lock:
+            # With this segment, the one before it and the newest complete
+            # ones make up num_segments.
+            if self.segments and \
+                    self.segments[0]['sequence'] <= sequence - self.num_segments:
+                recycled = self.segments.pop(0)
+        if recycled is not None:
+            self._write_index()
+            os.rename(os.path.join(self.directory, recycled['file']), path)
+            f = open(path, 'r+b')
+            if os.fstat(f.fileno()).st_size < self.segment_bytes:
+                preallocate(f, self.segment_bytes)
+        else:
+            f = open(path, 'w+b')
+            preallocate(f, self.segment_bytes)
+        segment_map = mmap.mmap(f.fileno(), self.segment_bytes)
+        return {'file': name, 'sequence': sequence, 'handle': f,
+                'map': segment_map, 'view': ffi.from_buffer(segment_map)}
+
+    def _close_segment(self, segment, size=None):
+        del segment['view']
+        segment['map'].close()
+        if size is not None:
+            segment['handle'].truncate(size)
+        segment['handle'].close()
+
+    def _write_index(self):
+        with self.lock:
+            segments = list(self.segments)
+        index = dict(self.metadata, sample_rate=self.sample_rate,
+                     segment_samples=self.segment_samples, segments=segments)
+        path = os.path.join(self.directory, index_name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.rename(path + '.tmp', path)
+
+    def stats(self):
+        """Return the recording counters as a dict."""
+        with self.lock:
+            num_segments = len(self.segments)
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'segments': num_segments,
+            }
+
+    def close(self):
+        """Trim the last segment to the samples written, remove the
+        spare segment and write the final index.  Raises the error the
+        housekeeping thread failed with, if any."""
+        if self.current is not None and self.fill:
+            self._finish_segment(self.fill * sample_size)
+        self.tasks.put((None, None))
+        self.housekeeper.join()
+        spares = [self.current] if self.current is not None else []
+        while not self.ready.empty():
+            spares.append(self.ready.get())
+        for spare in spares:
+            self._close_segment(spare)
+            os.remove(os.path.join(self.directory, spare['file']))
+        self.current = None
+        if self.error is not None:
+            raise self.error
+        self._write_index()
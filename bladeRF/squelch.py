@@ -0,0 +1,81 @@
+"""Power squelch on raw SC16_Q11 buffers."""
+from ._cffi import ffi, lib, as_pointer
+
+full_scale = 2048.0 ** 2
+
+
+def dbfs_to_counts(level):
+    """Return the mean I*I + Q*Q in squared counts of a ``level`` dBFS
+    signal, where 0 dBFS is a full scale tone."""
+    return full_scale * 10.0 ** (level / 10.0)
+
+
+class Squelch(object):
+    """
+    Decides which received buffers carry a signal, without converting
+    them from SC16_Q11.
+
+    Each buffer is split into blocks of ``block_size`` samples and the
+    mean power of each block is computed in C on the int16 samples.  The
+    squelch opens when a block reaches ``level`` dBFS and closes when
+    one falls below ``level - hysteresis``, after staying open for
+    ``hang_blocks`` more blocks.  The state carries across buffers.
+
+    ``process()`` returns the number of open blocks and fills ``mask``
+    with one byte per block; ``keep()`` is the per-buffer decision.
+    """
+
+    def __init__(self, level, hysteresis=3.0, hang_blocks=0, block_size=1024,
+                 max_samples=65536):
+        if block_size <= 0:
+            raise ValueError('block_size must be positive')
+        self.state = ffi.new('struct squelch *')
+        self.state.block_size = block_size
+        self.state.hang_blocks = hang_blocks
+        self._hysteresis = hysteresis
+        self.level = level
+        self.max_samples = max_samples
+        self.num_blocks = 0
+        self.mask = ffi.new('uint8_t[]', -(-max_samples // block_size))
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        self._level = level
+        self.state.open_level = dbfs_to_counts(level)
+        self.state.close_level = dbfs_to_counts(level - self._hysteresis)
+
+    @property
+    def hysteresis(self):
+        return self._hysteresis
+
+    @hysteresis.setter
+    def hysteresis(self, hysteresis):
+        self._hysteresis = hysteresis
+        self.state.close_level = dbfs_to_counts(self._level - hysteresis)
+
+    @property
+    def is_open(self):
+        return bool(self.state.open)
+
+    def reset(self):
+        """Close the squelch."""
+        self.state.open = 0
+        self.state.hang = 0
+
+    def process(self, samples, num_samples):
+        """Run the squelch over ``num_samples`` samples, which may be a
+        stream buffer or an int16 array, and return the number of open
+        blocks.  ``mask[:num_blocks]`` holds the state of each block."""
+        if num_samples > self.max_samples:
+            raise ValueError('at most %d samples per call' % self.max_samples)
+        self.num_blocks = -(-num_samples // self.state.block_size)
+        return lib.squelch_process(self.state, as_pointer(samples),
+                                   num_samples, self.mask)
+
+    def keep(self, samples, num_samples):
+        """Return True if any block of the buffer is open."""
+        return self.process(samples, num_samples) > 0
@@ -0,0 +1,105 @@
+"""Stream health counters."""
+import time
+
+import bladeRF
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class StreamStats(object):
+    """
+    Cheap counters describing the health of a stream or sync module.
+
+    ``delivered`` counts transfers handed to the application and
+    ``dropped`` those the application had to throw away because it was
+    behind.  ``overruns``, ``underruns`` and ``timestamp_gaps`` come from
+    the sync interface metadata; a gap is any transfer that does not
+    start where the previous one ended.
+
+    Durations (of the stream callback, or of the sync call) go into a
+    histogram of power of two microsecond buckets, from which ``p50``
+    and ``p99`` are estimated.  Counters are updated from the stream
+    thread without locking and may be read at any time with
+    ``snapshot()``.
+    """
+
+    num_buckets = 32
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.delivered = 0
+        self.dropped = 0
+        self.overruns = 0
+        self.underruns = 0
+        self.timestamp_gaps = 0
+        self.next_timestamp = None
+        self.histogram = [0] * self.num_buckets
+        self.started = time.time()
+
+    def duration(self, seconds):
+        """Record how long one callback or sync call took."""
+        microseconds = int(seconds * 1000000)
+        bucket = microseconds.bit_length() if microseconds > 0 else 0
+        self.histogram[min(bucket, self.num_buckets - 1)] += 1
+
+    def metadata(self, meta):
+        """Record the status and timestamp of a completed sync transfer."""
+        if meta.status & bladeRF.BLADERF_META_STATUS_OVERRUN:
+            self.overruns += 1
+        if meta.status & bladeRF.BLADERF_META_STATUS_UNDERRUN:
+            self.underruns += 1
+        if (self.next_timestamp is not None and
+                meta.timestamp != self.next_timestamp):
+            self.timestamp_gaps += 1
+        self.next_timestamp = meta.timestamp + meta.actual_count
+
+    def percentile(self, fraction):
+        """Return the upper bound in seconds of the histogram bucket
+        holding the given fraction of durations, or None if empty."""
+        total = sum(self.histogram)
+        if not total:
+            return None
+        target = fraction * total
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                break
+        return (1 << bucket) / 1000000.0
+
+    def snapshot(self):
+        return {
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'overruns': self.overruns,
+            'underruns': self.underruns,
+            'timestamp_gaps': self.timestamp_gaps,
+            'duration_p50': self.percentile(0.5),
+            'duration_p99': self.percentile(0.99),
+            'elapsed': time.time() - self.started,
+            }
+
+
+class RingStreamStats(StreamStats):
+    """StreamStats for a RingStream, whose delivered and dropped
+    counters are kept by the C callback."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self._raw = bladeRF.ffi.new('struct sample_ring_stats *')
+        self.pending = 0
+        StreamStats.__init__(self)
+
+    def update(self):
+        bladeRF.lib.sample_ring_stats(self.ring, self._raw)
+        self.delivered = int(self._raw.delivered)
+        self.dropped = int(self._raw.dropped)
+        self.pending = int(self._raw.pending)
+
+    def snapshot(self):
+        self.update()
+        snapshot = StreamStats.snapshot(self)
+        snapshot['pending'] = self.pending
+        return snapshot
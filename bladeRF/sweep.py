@@ -0,0 +1,160 @@
+"""Pipelined wideband frequency sweeps."""
+import threading
+
+import numpy as np
+
+import bladeRF
+from bladeRF.dsp import SpectrumEstimator
+from bladeRF.stats import clock
+from bladeRF.timeline import Timeline
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class Sweep(object):
+    """
+    Sweeps the receiver over ``frequencies`` and stitches the power
+    spectra of all steps into one wideband array.
+
+    Each step retunes, waits ``settle`` seconds in device time and
+    captures ``num_samples`` samples with a timestamped sync transfer.
+    With ``pipelined`` true the captures are handed to a worker thread,
+    which computes the averaged ``nfft`` point spectrum of step N while
+    step N+1 is retuned and captured; ``num_buffers`` bounds how far the
+    capture may run ahead.  Retuning and settling are not overlapped
+    with capture, as the receiver cannot capture while it retunes.  Only
+    the central ``usable`` fraction of each spectrum goes into
+    ``power``, whose frequencies are in ``frequency_axis``, so the steps
+    should be spaced by ``usable * sample_rate``.
+
+    If ``tx_samples`` is given the transmitter follows the receiver at
+    ``tx_offset`` Hz from its center, and the samples are transmitted
+    over the capture window of every step, as needed for frequency
+    response measurements.
+
+    Both modules in use must be configured with ``FORMAT_SC16_Q11_META``.
+    If processing a step fails, ``run()`` stops capturing and raises the
+    error once the steps already captured are done with.
+    """
+
+    def __init__(self, device, frequencies, num_samples=16384, nfft=1024,
+                 usable=0.75, settle=0.005, window='hann', tx_samples=None,
+                 tx_offset=0, timeline=None, num_buffers=4, pipelined=True,
+                 timeout_ms=3500):
+        self.device = device
+        self.frequencies = [int(f) for f in frequencies]
+        self.num_samples = num_samples
+        self.settle = settle
+        self.tx_samples = tx_samples
+        self.tx_offset = tx_offset
+        self.timeline = timeline or Timeline(device, timeout_ms=timeout_ms)
+        self.pipelined = pipelined
+
+        num_segments = (num_samples - nfft) // (nfft - nfft // 2) + 1
+        self.estimator = SpectrumEstimator(nfft, window=window, averaging='boxcar',
+                                           num_average=num_segments)
+        self.keep = int(nfft * usable)
+        first = (nfft - self.keep) // 2
+        self.bins = slice(first, first + self.keep)
+        offsets = self.estimator.frequencies(self.timeline.sample_rate)[self.bins]
+        self.frequency_axis = (np.array(self.frequencies, np.float64)[:, None]
+                               + offsets).ravel()
+        self.power = np.zeros(len(self.frequencies) * self.keep, np.float32)
+        self.timestamps = np.zeros(len(self.frequencies), np.uint64)
+        self.iq = np.empty(num_samples, np.complex64)
+        self.db = np.empty(nfft, np.float32)
+
+        self.buffers = [bladeRF.ffi.new('int16_t[]', 2 * num_samples)
+                        for i in range(num_buffers)]
+        self.free = queue.Queue()
+        for i in range(num_buffers):
+            self.free.put(i)
+        self.work = queue.Queue()
+        self.error = None
+        self.worker = None
+        if pipelined:
+            self.worker = threading.Thread(target=self._worker)
+            self.worker.daemon = True
+            self.worker.start()
+        self.sweeps = 0
+        self.elapsed = 0.0
+
+    def capture(self, step, buffer):
+        """Retune to step ``step`` and capture into ``buffers[buffer]``.
+        Returns the number of samples received."""
+        frequency = self.frequencies[step]
+        self.device.rx.frequency = frequency
+        if self.tx_samples is not None:
+            self.device.tx.frequency = frequency + self.tx_offset
+        timestamp = self.timeline.rx_time(self.settle)
+        if self.tx_samples is not None:
+            self.timeline.tx_at(timestamp + self.timeline.tx_offset,
+                                self.tx_samples, num_samples=self.num_samples)
+        samples, count = self.timeline.rx_at(timestamp, self.num_samples,
+                                             self.buffers[buffer])
+        self.timestamps[step] = timestamp
+        return count
+
+    def process(self, step, buffer, count):
+        """Compute the spectrum of a capture into its slice of ``power``."""
+        iq = bladeRF.samples_to_narray(self.buffers[buffer], count, out=self.iq)
+        self.estimator.reset()
+        self.estimator.update(iq)
+        self.estimator.db(out=self.db)
+        self.power[step * self.keep:(step + 1) * self.keep] = self.db[self.bins]
+
+    def _worker(self):
+        while True:
+            job = self.work.get()
+            if job is None:
+                self.work.task_done()
+                return
+            try:
+                if self.error is None:
+                    self.process(*job)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.free.put(job[1])
+                self.work.task_done()
+
+    def run(self):
+        """Sweep once and return ``power``, in dBFS."""
+        start = clock()
+        for step in range(len(self.frequencies)):
+            if self.error is not None:
+                break
+            buffer = self.free.get()
+            try:
+                count = self.capture(step, buffer)
+            except Exception:
+                self.free.put(buffer)
+                raise
+            if self.pipelined:
+                self.work.put((step, buffer, count))
+            else:
+                try:
+                    self.process(step, buffer, count)
+                finally:
+                    self.free.put(buffer)
+        self.work.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.elapsed += clock() - start
+        self.sweeps += 1
+        return self.power
+
+    @property
+    def sweeps_per_second(self):
+        return self.sweeps / self.elapsed if self.elapsed else 0.0
+
+    def close(self):
+        """Stop the worker thread."""
+        if self.worker is not None:
+            self.work.put(None)
+            self.worker.join()
+            self.worker = None
@@ -0,0 +1,111 @@
+"""Timestamped RX and TX scheduling with the sync interface."""
+import time
+
+import bladeRF
+from bladeRF._cffi import as_pointer
+
+sample_size = bladeRF.ffi.sizeof('int16_t') * 2
+
+
+class Timeline(object):
+    """
+    Schedules timestamped RX and TX transfers on a device.
+
+    Both modules must have been configured with ``FORMAT_SC16_Q11_META``.
+    The device timestamps are read once by ``sync()``; after that the
+    current time is estimated locally from the end of the last received
+    transfer and the wall clock, so no timestamp query is made on the
+    hot path.  The metadata structs are allocated once and reused.
+
+    RX and TX have separate sample counters, assumed to run at the same
+    sample rate; their offset is measured by ``sync()``.
+    """
+
+    def __init__(self, device, timeout_ms=3500):
+        self.device = device
+        self.timeout_ms = timeout_ms
+        self.sample_rate = device.rx.sample_rate
+        self.rx_meta = bladeRF.ffi.new('struct bladerf_metadata *')
+        self.tx_meta = bladeRF.ffi.new('struct bladerf_metadata *')
+        self.burst_open = False
+        self.tx_end = 0
+        self.sync()
+
+    def sync(self):
+        """Read the device's RX and TX timestamps to anchor the timeline."""
+        rx_timestamp = self.device.rx.timestamp
+        self.tx_offset = self.device.tx.timestamp - rx_timestamp
+        self._anchor(rx_timestamp)
+
+    def _anchor(self, rx_timestamp):
+        self.anchor_timestamp = rx_timestamp
+        self.anchor_time = time.time()
+
+    def rx_time(self, delay=0.0):
+        """Return the estimated RX timestamp ``delay`` seconds from now."""
+        elapsed = time.time() - self.anchor_time + delay
+        return self.anchor_timestamp + int(elapsed * self.sample_rate)
+
+    def tx_time(self, delay=0.0):
+        """Return the estimated TX timestamp ``delay`` seconds from now."""
+        return self.rx_time(delay) + self.tx_offset
+
+    def rx_at(self, timestamp, num_samples, samples=None):
+        """Receive ``num_samples`` samples starting at ``timestamp``.
+
+        Returns ``(samples, actual_count)``.  ``samples`` may be a
+        preallocated buffer to receive into.
+        """
+        meta = self.rx_meta
+        meta.flags = 0
+        meta.status = 0
+        meta.timestamp = timestamp
+        samples = self.device.rx(num_samples, samples=samples, metadata=meta,
+                                 timeout_ms=self.timeout_ms)
+        # The last sample has only just arrived, so its timestamp is a
+        # good estimate of the current time.
+        self._anchor(meta.timestamp + meta.actual_count)
+        return samples, meta.actual_count
+
+    def tx_at(self, timestamp, samples, burst=True, num_samples=None):
+        """Transmit ``samples`` starting at ``timestamp``.
+
+        ``samples`` is a cdata array or an int16 array of I/Q pairs,
+        sent whole unless ``num_samples`` is given; it is required for a
+        cdata pointer, whose length is unknown.  With ``burst`` true the
+        samples form a complete burst.  Otherwise the burst is left open
+        and continued by the next call, which may pass None as
+        ``timestamp``; the call passing ``burst=True`` closes it.
+        Returns the TX timestamp just after the last sample.
+        """
+        if num_samples is None:
+            num_samples = _num_samples(samples)
+        meta = self.tx_meta
+        if self.burst_open:
+            if timestamp is not None and timestamp != self.tx_end:
+                raise ValueError('a burst is open, it continues at %d'
+                                 % self.tx_end)
+            meta.flags = 0
+            start = self.tx_end
+        elif timestamp is None:
+            raise ValueError('a timestamp is required to start a burst')
+        else:
+            meta.flags = bladeRF.BLADERF_META_FLAG_TX_BURST_START
+            meta.timestamp = timestamp
+            start = timestamp
+        if burst:
+            meta.flags |= bladeRF.BLADERF_META_FLAG_TX_BURST_END
+        self.device.tx(num_samples, samples=as_pointer(samples), metadata=meta,
+                       timeout_ms=self.timeout_ms)
+        # Only a transfer that went through changes the burst state.
+        self.burst_open = not burst
+        self.tx_end = start + num_samples
+        return self.tx_end
+
+
+def _num_samples(samples):
+    if isinstance(samples, bladeRF.ffi.CData):
+        if bladeRF.ffi.typeof(samples).kind != 'array':
+            raise ValueError('num_samples is required with a pointer')
+        return bladeRF.ffi.sizeof(samples) // sample_size
+    return len(bladeRF.ffi.from_buffer(samples)) // sample_size
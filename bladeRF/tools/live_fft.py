@@ -7,10 +7,11 @@
 import numpy as np
 from pyqtgraph.Qt import QtGui, QtCore
 import pyqtgraph as pg
-import sys, Queue
+import sys
 
 # bladeRF Setup 
 import bladeRF
+from bladeRF.dsp import SpectrumEstimator, SpectrumPipeline
 device = bladeRF.Device()
 device.rx.enabled = True
 device.rx.frequency = 440000000
@@ -20,13 +21,16 @@ device.rx.sample_rate = 40000000
 num_buffers = 16
 num_transfers = 16
 num_samples = 2**16
+num_workers = 4
 Nf = 512     # No. of frames
 Ns = 2048    # Signal length
 
 averaging = 10
-averaging_buffer = np.zeros((averaging,num_samples))
-
-queue = Queue.Queue(num_buffers)
+estimator = SpectrumEstimator(num_samples, averaging='boxcar', num_average=averaging)
+# The FFTs run on worker threads, the callback only converts and copies.
+pipeline = SpectrumPipeline(estimator, num_workers=num_workers, num_jobs=num_buffers)
+spectrum_db = np.empty(num_samples, np.float32)
+iq = np.empty(num_samples, np.complex64)
 
 # PyQtGraph Setup Stuff
 app = QtGui.QApplication([])
@@ -42,28 +46,18 @@ p1.showGrid(x=True, y=True)
 p1.setLabel('bottom',"Frequency (Hz)")
 p1.setLabel('left',"Power (dBFS)")
 p1_data = p1.plot([0])
-p1_freq_range = np.linspace(device.rx.frequency-device.rx.sample_rate/2.0,device.rx.frequency+device.rx.sample_rate/2.0,num_samples)
+p1_freq_range = estimator.frequencies(device.rx.sample_rate, device.rx.frequency)
 
 
 def update():
-    global averaging_buffer
-    try:
-        data = queue.get_nowait()
-    except Queue.Empty:
-        return
-    data_fft = np.fft.fftshift(10*np.log10(np.abs(np.fft.fft(data**2.0))))
-    averaging_buffer = np.roll(averaging_buffer,1,axis=0)
-    averaging_buffer[0] = data_fft
-    p1_data.setData(p1_freq_range,averaging_buffer.mean(axis=0))
+    if estimator.count:
+        p1_data.setData(p1_freq_range, pipeline.db(out=spectrum_db))
 
 
 def rx(device, stream, meta_data, samples, num_samples, user_data):
-    samples = bladeRF.samples_to_narray(samples, num_samples)
-    try:
-        queue.put_nowait(samples)
-    except Queue.Full:
-        #print "Buffer Overrun!"
-        pass
+    samples = bladeRF.samples_to_narray(samples, num_samples, out=iq)
+    if not pipeline.submit(samples):
+        stream.stats.dropped += 1
     return stream.next()
 
 stream = device.rx.stream(
@@ -93,4 +87,5 @@ if __name__ == '__main__':
     if (sys.flags.interactive != 1) or not hasattr(QtCore, 'PYQT_VERSION'):
         QtGui.QApplication.instance().exec_()
         stream.running = False
-        stream.join()
\ No newline at end of file
+        stream.join()
+        pipeline.close()
\ No newline at end of file
@@ -20,13 +20,12 @@ Options:
   -w --rx-vga2-gain=<sq>   Set rx vga2 squelch [default: 17]
   -r --tx-vga1-gain=<lg>   Set tx vga1 [default: 0]
   -u --tx-vga2-gain=<sq>   Set tx vga2 squelch [default: 0]
-  -q --squelch=<sq>        Set power squelch [default: 25]
+  -q --squelch=<sq>        Squelch level in dBFS [default: -14]
+  --squelch-hang=<n>       Blocks of 1024 samples to hold the squelch open [default: 8]
 """
 import sys
 import bladeRF
 import threading
-from numpy import vdot, log10
-from docopt import docopt
 
 
 class Repeater(object):
@@ -40,6 +39,7 @@ class Repeater(object):
 
 
 def main():
+    from docopt import docopt
     args = docopt(__doc__, version='bladeRF Repeater 1.0')
     device = bladeRF.Device(args['--device'])
 
@@ -59,21 +59,22 @@ def main():
     device.rx.vga1 = int(args['--tx-vga1-gain'])
     device.rx.vga2 = int(args['--tx-vga2-gain'])
 
-    squelch = float(args['--squelch'])
     num_buffers = int(args['--num-buffers'])
     num_transfers = int(args['--num-transfers'])
     num_samples = int(args['--num-samples'])
+    squelch = bladeRF.Squelch(float(args['--squelch']),
+                              hang_blocks=int(args['--squelch-hang']),
+                              max_samples=num_samples)
 
     def rx(dev, stream, meta_data, samples, num_samples, repeater):
         with repeater.samples_available:
             if not stream.running:
                 return
-            samples = bladeRF.samples_to_narray(samples, num_samples)
-            if bladeRF.squelched(samples, squelch):
+            if not squelch.keep(samples, num_samples):
                 return stream.current()
             if repeater.num_filled >= 2 * repeater.num_buffers:
                 # "RX Overrun encountered, stop advancing
-                return stream.current()
+                return stream.drop()
             ret = stream.next()
             repeater.num_filled += 1
             repeater.samples_available.notify()
@@ -84,6 +85,7 @@ def main():
             if not stream.running:
                 return
             if repeater.num_filled == 0:
+                stream.stats.underruns += 1
                 return repeater.zerobuf
             ret = stream.next()
             repeater.num_filled -= 1
@@ -108,6 +110,7 @@ def main():
         repeater)
 
     tx_stream.buffers = rx_stream.buffers  # wire up tx buffers to rx
+    tx_stream.arrays = rx_stream.arrays
 
     rx_stream.start()
     tx_stream.start()
@@ -119,6 +122,8 @@ def main():
 
     rx_stream.join()
     tx_stream.join()
+    sys.stderr.write('RX %r\nTX %r\n' % (rx_stream.stats.snapshot(),
+                                         tx_stream.stats.snapshot()))
     sys.exit(0)
 
 if __name__ == '__main__':
@@ -11,6 +11,10 @@ Options:
   -v --version             Show version.
   -d --device=<d>          Device identifier [default: ]
   -f --file=<f>            File to write samples to [default: -].
+  -c --capture=<n>         Preallocate the file for this many samples and stop when it is full, 0 to write through a writer thread [default: 0]
+  -z --compress=<codec>    Write a chunk indexed file compressed with zlib or lzma, or none [default: none]
+  -r --rolling=<s>         Record continuously into segments this many seconds long in the directory --file, 0 for one file; the index counts recorded samples from the timestamp read at setup, not device timestamps [default: 0]
+  -k --keep=<n>            Number of segment files a rolling recording keeps [default: 60]
   -b --bandwidth=<bw>      Bandwidth in Hertz [default: 7000000].
   -s --sample-rate=<sr>    Sample rate in samples per second [default: 10000000].
   -n --num-buffers=<nb>    Number of transfer buffers [default: 16].
@@ -19,38 +23,111 @@ Options:
   -g --lna-gain=<g>        Set LNA gain [default: LNA_GAIN_MAX]
   -o --rx-vga1=<g>         Set vga1 [default: 21]
   -w --rx-vga2=<g>         Set vga2 squelch [default: 18]
-  -q --squelch=<sq>        Set squelch [default: 0]
-  -e --decimate=<f>        Decimate factor [default: 0]
+  -q --squelch=<sq>        Squelch level in dBFS, 0 for none [default: 0]
+  --squelch-hang=<n>       Blocks of 1024 samples to hold the squelch open [default: 8]
+  -p --pre-trigger=<s>     With --squelch, record each burst with this many seconds before it into its own file in the directory --file, 0 to drop quiet buffers [default: 0]
+  --post-trigger=<s>       Seconds to record after each burst [default: 0.01]
+  -e --decimate=<f>        Decimate by this factor, 0 or 1 for none [default: 0]
+  --offset=<hz>            Tune the LO this far away and shift back digitally [default: 0]
 """
 import sys
 import bladeRF
-from docopt import docopt
+from bladeRF.recorder import Recorder, capture_metadata
+from bladeRF.compressed import CompressedRecorder
+from bladeRF.rolling import RollingRecorder
+from bladeRF.trigger import TriggeredCapture
 
 
 def get_args():
+    from docopt import docopt
     return docopt(__doc__, version='bladeRF Receiver 1.0')
 
 
 def get_stream(args):
-    outfile = sys.stdout if args['--file'] == '-' else open(args['--file'], 'wb')
     device = bladeRF.Device(args['--device'])
     device.rx.enabled = True
-    device.rx.frequency = int(args['<frequency>'])
+    offset = int(args['--offset'])
+    device.rx.frequency = int(args['<frequency>']) + offset
     device.rx.bandwidth = int(args['--bandwidth'])
     device.rx.sample_rate = int(args['--sample-rate'])
     device.lna_gain = getattr(bladeRF, args['--lna-gain'])
     device.rx.vga1 = int(args['--rx-vga1'])
     device.rx.vga2 = int(args['--rx-vga2'])
-    squelch = float(args['--squelch'])
+    squelch = None
+    if float(args['--squelch']):
+        squelch = bladeRF.Squelch(float(args['--squelch']),
+                                  hang_blocks=int(args['--squelch-hang']),
+                                  max_samples=int(args['--num-samples']))
+    decimate = int(args['--decimate'])
+    pre_trigger = float(args['--pre-trigger'])
+
+    if args['--file'] == '-':
+        recorder = Recorder(getattr(sys.stdout, 'buffer', sys.stdout),
+                            buffer_samples=int(args['--num-samples']))
+    else:
+        # Describe the samples as written, after mixing and decimation.
+        metadata = capture_metadata(device)
+        metadata['frequency'] -= offset
+        if decimate > 1:
+            metadata['sample_rate'] /= float(decimate)
+            metadata['decimation'] = decimate
+        if squelch and pre_trigger:
+            # The squelch triggers the capture instead of dropping buffers.
+            recorder = TriggeredCapture(args['--file'], squelch, metadata['sample_rate'],
+                                        pre_seconds=pre_trigger,
+                                        post_seconds=float(args['--post-trigger']),
+                                        buffer_samples=int(args['--num-samples']),
+                                        metadata=metadata)
+            squelch = None
+        elif float(args['--rolling']):
+            # The stream gives no timestamps, so the index counts
+            # recorded samples, which drift from the device's after an
+            # overrun, and never match them with decimation.
+            recorder = RollingRecorder(args['--file'], metadata['sample_rate'],
+                                       segment_seconds=float(args['--rolling']),
+                                       num_segments=int(args['--keep']),
+                                       start_timestamp=metadata['setup_timestamp']
+                                       if decimate <= 1 else 0,
+                                       metadata=metadata)
+        elif args['--compress'] != 'none':
+            recorder = CompressedRecorder(args['--file'], codec=args['--compress'],
+                                          metadata=metadata)
+        else:
+            recorder = Recorder(args['--file'], num_samples=int(args['--capture']),
+                                buffer_samples=int(args['--num-samples']),
+                                metadata=metadata)
+
+    mixer = decimator = None
+    if offset or decimate > 1:
+        import numpy
+        iq = numpy.empty(int(args['--num-samples']), numpy.complex64)
+        iq_raw = numpy.empty((len(iq), 2), numpy.int16)
+    if offset:
+        from bladeRF.dsp import Mixer
+        # The wanted frequency lands at -offset, shift it back to DC.
+        mixer = Mixer(offset, device.rx.sample_rate, table_size=len(iq))
+    if decimate > 1:
+        from bladeRF.dsp import Decimator
+        decimator = Decimator(decimate)
+        decimated = numpy.empty(decimator.output_size(len(iq)), numpy.complex64)
 
     def rx(device, stream, meta_data, samples, num_samples, user_data):
-        if squelch:
-            samples = bladeRF.samples_to_narray(samples, num_samples)
-            if bladeRF.squelched(samples, squelch):
-                return stream.current()
+        if squelch and not squelch.keep(samples, num_samples):
+            return stream.current()
 
-        buff = stream.current_as_buffer()
-        outfile.write(buff)
+        if mixer or decimator:
+            out = bladeRF.samples_to_narray(samples, num_samples, out=iq)
+            if mixer:
+                out = mixer.process(out, out=out)
+            if decimator:
+                out = decimator.process(out, out=decimated)
+            bladeRF.narray_to_samples(out, out=iq_raw)
+            recorder.write(iq_raw, len(out))
+        else:
+            recorder.write(samples, num_samples)
+        # A rolling recording never fills up.
+        if getattr(recorder, 'full', False):
+            stream.running = False
         return stream.next()
 
 
@@ -61,11 +138,19 @@ def get_stream(args):
         int(args['--num-samples']),
         int(args['--num-transfers']),
         )
-    return stream
+    return stream, recorder
 
 
 def main():
-    get_stream(get_args()).run()
+    stream, recorder = get_stream(get_args())
+    try:
+        stream.run()
+    finally:
+        recorder.close()
+        sys.stderr.write('RX %r\nRecorder %r\n' % (stream.stats.snapshot(),
+                                                   recorder.stats()))
+        # The stream's Module keeps the Device open until now.
+        stream.device.device.close()
 
 
 if __name__ == '__main__':
@@ -12,7 +12,7 @@ import sys, Queue
 
 # bladeRF Setup 
 import bladeRF
-from bladeRF._cffi import ffi
+from bladeRF.dsp import SpectrumEstimator
 device = bladeRF.Device()
 
 device.rx.frequency = 440000000
@@ -22,13 +22,14 @@ device.rx.sample_rate = 4000000
 num_buffers = 16
 num_transfers = 8
 buffer_size = 2**16
-nFFT = buffer_size/2
+nFFT = buffer_size//2
 timeout_ms = 3500
 Nf = 512     # No. of frames
 Ns = 2048    # Signal length
 
 averaging = 100
-averaging_buffer = np.zeros((averaging,nFFT))
+estimator = SpectrumEstimator(nFFT, averaging='boxcar', num_average=averaging)
+spectrum_db = np.empty(nFFT, np.float32)
 
 
 queue = Queue.Queue(num_buffers)
@@ -47,29 +48,17 @@ p1.showGrid(x=True, y=True)
 p1.setLabel('bottom',"Frequency (Hz)")
 p1.setLabel('left',"Power (dBFS)")
 p1_data = p1.plot([0])
-p1_freq_range = np.linspace(device.rx.frequency-device.rx.sample_rate/2.0,device.rx.frequency+device.rx.sample_rate/2.0,nFFT)
+p1_freq_range = estimator.frequencies(device.rx.sample_rate, device.rx.frequency)
 
 
-metadata = ffi.new("struct bladerf_metadata [1]")
-metadata[0].flags = bladeRF.BLADERF_META_FLAG_RX_NOW
+rx_data = np.empty(buffer_size, np.complex64)
+chunks = device.rx.iter_rx(buffer_size, timeout_ms=timeout_ms)
 
 def update():
-    global metadata, averaging_buffer
-    samples = device.rx(buffer_size, metadata=metadata, timeout_ms = timeout_ms)
-    num_samples = metadata[0].actual_count
-    metadata[0].timestamp = 0
-    data = bladeRF.samples_to_narray(samples, num_samples)
-    data = data[:nFFT]
-    try:
-        # For some reason we seem to get a lot of NaNs in our received sample data.
-        # This is a bit of a hack to avoid allowing any NaN values into our averaging array.
-        data_fft = np.fft.fftshift(10*np.log10(np.abs(np.fft.fft(data**2.0))))
-        if(not np.isnan(data_fft).any()):
-            averaging_buffer = np.roll(averaging_buffer,1,axis=0)
-            averaging_buffer[0] = data_fft
-            p1_data.setData(p1_freq_range,averaging_buffer.mean(axis=0))
-    except:
-        pass
+    chunk = next(chunks)
+    data = bladeRF.samples_to_narray(chunk.samples, chunk.actual_count, out=rx_data)
+    if estimator.update(data):
+        p1_data.setData(p1_freq_range, estimator.db(out=spectrum_db))
 
 
 win = QtGui.QWidget()
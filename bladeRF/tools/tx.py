@@ -16,16 +16,18 @@ Options:
   -n --num-buffers=<nb>    Number of transfer buffers [default: 32].
   -t --num-transfers=<nt>  Number of transfers [default: 16].
   -l --num-samples=<ns>    Numper of samples per transfer buffer [default: 4096].
+  -r --repeat              Loop the file until interrupted.
+  -o --start=<n>           Start this many samples into the file [default: 0].
 """
 import sys
 import bladeRF
-from numpy import vdot, log10
-from docopt import docopt
 
 
 def main():
+    from docopt import docopt
     args = docopt(__doc__, version='bladeRF Transmitter 1.0')
-    infile = sys.stdin if args['--file'] == '-' else open(args['--file'], 'rb')
+    playback = bladeRF.Playback(args['--file'], loop=args['--repeat'],
+                                start=int(args['--start']))
 
     device = bladeRF.Device(args['--device'])
     device.tx.enabled = True
@@ -35,7 +37,7 @@ def main():
 
     def tx(device, stream, meta_data, samples, num_samples, user_data):
         next = stream.next()
-        if not infile.readinto(bladeRF.ffi.buffer(next, num_samples)):
+        if next is None or not playback.fill(next, num_samples):
             return
         return next
 
@@ -46,7 +48,10 @@ def main():
         int(args['--num-samples']),
         int(args['--num-transfers']))
 
-    stream.run()
+    try:
+        stream.run()
+    finally:
+        playback.close()
 
 
 if __name__ == '__main__':
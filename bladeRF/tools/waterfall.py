@@ -1,33 +1,36 @@
+import sys
 import numpy
 import matplotlib.pyplot
 import matplotlib.animation
 
+from bladeRF.dsp import SpectrumEstimator, Waterfall
+
+# Reads complex64 samples from stdin, one FFT per line.
 HEIGHT = 500
-WIDTH = 1024
+FFTPOINTS = 1024
+WIDTH = FFTPOINTS
 
 fig = matplotlib.pyplot.figure()
-im_data = numpy.zeros((HEIGHT, WIDTH), dtype=numpy.float32)
-im = matplotlib.pyplot.imshow(im_data, cmap=matplotlib.pyplot.get_cmap('gray'))
+waterfall = Waterfall(HEIGHT, WIDTH, db=True, scale=(-100.0, 0.0))
+im = matplotlib.pyplot.imshow(waterfall.view(), cmap=matplotlib.pyplot.get_cmap('gray'))
 im.set_clim(0.0, 1.0)
 
-data = numpy.zeros(FFTPOINTS, dtype=numpy.float32)
+estimator = SpectrumEstimator(FFTPOINTS, overlap=0, averaging='exponential', alpha=1.0)
+line = numpy.empty(FFTPOINTS, dtype=numpy.float32)
+stdin = getattr(sys.stdin, 'buffer', sys.stdin)
 
 def init_image():
-    im.set_array(numpy.zeros((HEIGHT, WIDTH), dtype=numpy.float32))
+    im.set_array(waterfall.view())
     return (im,)
 
 def update_image(i):
-
-    data[:] = numpy.fromstring(
-        sys.stdin.read(8192),
-        dtype=numpy.complex64,
-        )
-
-    fft = numpy.fft.rfft(data)
-    line = numpy.sqrt(numpy.real(fft)**2+numpy.imag(fft)**2)
-    im_data[:,:WIDTH-1] = im_data[:,1:]
-    im_data[:,WIDTH-1] = line
-    im.set_array(im_data)
+    raw = stdin.read(FFTPOINTS * 8)
+    if len(raw) < FFTPOINTS * 8:
+        return (im,)
+    data = numpy.frombuffer(raw, dtype=numpy.complex64)
+    estimator.update(data)
+    waterfall.add(estimator.spectrum(out=line))
+    im.set_array(waterfall.view())
     return (im,)
 
 
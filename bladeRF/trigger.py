@@ -0,0 +1,252 @@
+"""Capturing bursts, with the samples before each trigger, from a stream."""
+import collections
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from bladeRF._cffi import ffi, as_pointer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+sample_size = ffi.sizeof('int16_t') * 2
+
+
+def threshold_trigger(level):
+    """Return a trigger that fires on a buffer in which I or Q reaches
+    ``level`` counts in magnitude."""
+    def trigger(samples, num_samples):
+        iq = np.frombuffer(ffi.buffer(as_pointer(samples), num_samples * sample_size),
+                           np.int16)
+        return iq.max() >= level or iq.min() <= -level
+    return trigger
+
+
+class TriggeredCapture(object):
+    """
+    Records only bursts from a stream of SC16_Q11 buffers, each with the
+    ``pre_seconds`` before it, into its own file in ``directory``.
+
+    ``write()`` copies every buffer into one of ``num_slots`` preallocated
+    slots of ``buffer_samples`` samples and calls
+    ``trigger(samples, num_samples)`` on it.  The trigger may be a
+    ``Squelch``, whose ``keep()`` is the power trigger, the result of
+    ``threshold_trigger()`` or any function returning True for a buffer
+    holding a burst.  While no burst is under way the slots covering the
+    last ``pre_seconds`` form a ring, and older ones are reused.
+
+    When the trigger fires the ring and the triggering buffer are handed
+    to a writer thread, as is every buffer after them until the trigger
+    has stayed quiet for ``post_seconds``, or ``max_seconds`` have
+    passed since the trigger.  Both times are counted from the start of
+    the triggering buffer, and the ring starts again empty after a
+    burst.  Each burst is written to ``burst-NNNNNN.sc16`` with a
+    ``.json`` sidecar giving the trigger's sample count, device
+    timestamp and wall clock time, the number of pre-trigger samples and
+    ``metadata``.
+
+    A buffer arriving when every slot is waiting to be written is
+    dropped.  The trigger still sees it, and during a burst it counts
+    towards the post-trigger and maximum lengths; the sidecar's ``gaps``
+    lists ``[offset, count]`` for the samples missing from the file.
+    Outside a burst a drop empties the ring, so pre-trigger samples are
+    always contiguous with the burst.
+
+    If the writer thread fails, ``write()`` and ``close()`` raise its
+    error.
+    """
+
+    def __init__(self, directory, trigger, sample_rate, pre_seconds=0.005,
+                 post_seconds=0.005, max_seconds=None, buffer_samples=16384,
+                 num_slots=None, metadata=None):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.trigger = getattr(trigger, 'keep', trigger)
+        self.pre_samples = int(pre_seconds * sample_rate)
+        self.post_samples = int(post_seconds * sample_rate)
+        self.max_samples = int(max_seconds * sample_rate) if max_seconds else None
+        self.buffer_samples = buffer_samples
+        self.metadata = metadata or {}
+        if num_slots is None:
+            num_slots = -(-self.pre_samples // buffer_samples) + 64
+        self.slots = [ffi.new('int16_t[]', 2 * buffer_samples) for i in range(num_slots)]
+        self.free = queue.Queue()
+        for slot in self.slots:
+            self.free.put(slot)
+
+        self.ring = collections.deque()
+        self.ring_samples = 0
+        self.received = 0
+        self.next_timestamp = 0
+        self.dropped = 0
+        self.full = False
+        self.error = None
+        self.num_events = 0
+        self.event = None
+        self.span = 0
+        self.jobs = queue.Queue()
+        self.writer = threading.Thread(target=self._writer)
+        self.writer.daemon = True
+        self.writer.start()
+
+    @property
+    def backlog(self):
+        return self.jobs.qsize()
+
+    def write(self, samples, num_samples, timestamp=None):
+        """Copy ``num_samples`` samples, a stream buffer or an int16
+        array, received at device ``timestamp`` if known, and run the
+        trigger on them.  Returns False if they were dropped."""
+        if self.error is not None:
+            raise self.error
+        if num_samples > self.buffer_samples:
+            raise ValueError('at most %d samples per write' % self.buffer_samples)
+        if timestamp is not None:
+            self.next_timestamp = timestamp
+        triggered = self.trigger(samples, num_samples)
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            slot = None
+        sample, timestamp = self.received, self.next_timestamp
+        self.received += num_samples
+        self.next_timestamp += num_samples
+
+        if slot is None:
+            self.dropped += 1
+            if self.event is None:
+                # The ring no longer leads up to the next buffer.
+                self._clear_ring()
+                if triggered:
+                    self._start(sample, timestamp)
+            if self.event is not None:
+                self._advance(None, num_samples, triggered)
+            return False
+
+        ffi.memmove(slot, as_pointer(samples), num_samples * sample_size)
+        if self.event is None and triggered:
+            self._start(sample, timestamp)
+        if self.event is not None:
+            self._advance(slot, num_samples, triggered)
+        else:
+            self.ring.append((slot, num_samples, sample))
+            self.ring_samples += num_samples
+            while self.ring and self.ring_samples - self.ring[0][1] >= self.pre_samples:
+                old = self.ring.popleft()
+                self.ring_samples -= old[1]
+                self.free.put(old[0])
+        return True
+
+    def _clear_ring(self):
+        while self.ring:
+            self.free.put(self.ring.popleft()[0])
+        self.ring_samples = 0
+
+    def _start(self, sample, timestamp):
+        self.event = {
+            'number': self.num_events,
+            'trigger_sample': sample,
+            'trigger_timestamp': timestamp,
+            'trigger_time': time.time(),
+            'pre_samples': 0,
+            'num_samples': 0,
+            'dropped': 0,
+            'gaps': [],
+            }
+        self.num_events += 1
+        self.jobs.put(('open', self.event))
+        window_start = sample - self.pre_samples
+        while self.ring:
+            slot, count, ring_sample = self.ring.popleft()
+            skip = max(window_start - ring_sample, 0)
+            self._send(slot, skip, count)
+            self.event['pre_samples'] += count - skip
+        self.ring_samples = 0
+        # The maximum length does not include the pre-trigger samples.
+        self.span = 0
+
+    def _advance(self, slot, count, triggered):
+        # Dropped buffers, with no slot, count towards the lengths too.
+        if triggered:
+            self.remaining = self.post_samples
+        else:
+            count = min(count, self.remaining)
+            self.remaining -= count
+        if self.max_samples is not None:
+            count = min(count, self.max_samples - self.span)
+        if slot is not None:
+            self._send(slot, 0, count)
+        else:
+            self.event['dropped'] += 1
+            if count:
+                self.event['gaps'].append([self.event['num_samples'], count])
+                self.span += count
+        if not self.remaining or self.span == self.max_samples:
+            self._end()
+
+    def _send(self, slot, start, stop):
+        self.event['num_samples'] += stop - start
+        self.span += stop - start
+        self.jobs.put(('data', (slot, start, stop)))
+
+    def _end(self):
+        self.jobs.put(('close', self.event))
+        self.event = None
+
+    def _writer(self):
+        f = None
+        while True:
+            job, argument = self.jobs.get()
+            if job is None:
+                break
+            try:
+                if self.error is not None:
+                    pass
+                elif job == 'open':
+                    name = 'burst-%06d.sc16' % argument['number']
+                    f = open(os.path.join(self.directory, name), 'wb')
+                elif job == 'data':
+                    slot, start, stop = argument
+                    if stop > start:
+                        f.write(ffi.buffer(slot + 2 * start, (stop - start) * sample_size))
+                elif job == 'close':
+                    f.close()
+                    with open(f.name + '.json', 'w') as sidecar:
+                        json.dump(dict(self.metadata, **argument), sidecar,
+                                  indent=2, sort_keys=True)
+            except Exception as error:
+                self.error = error
+                self.full = True
+            finally:
+                # Slots are handed back even after a failure, so write()
+                # raises the error rather than dropping every buffer.
+                if job == 'data':
+                    self.free.put(argument[0])
+        if f is not None:
+            f.close()
+
+    def stats(self):
+        """Return the capture counters as a dict."""
+        return {
+            'received': self.received,
+            'events': self.num_events,
+            'dropped': self.dropped,
+            'backlog': self.backlog,
+            }
+
+    def close(self):
+        """End the burst under way and write out everything queued.
+        Raises the error the writer thread failed with, if any."""
+        if self.event is not None:
+            self._end()
+        self.jobs.put((None, None))
+        self.writer.join()
+        self._clear_ring()
+        if self.error is not None:
+            raise self.error
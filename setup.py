@@ -11,6 +11,9 @@ setup(
   version="0.0.1",
   packages=find_packages(exclude=['tests.*', 'tests', '.virt']),
 
+  setup_requires=['cffi>=1.0.0'],
+  cffi_modules=['bladeRF/_build.py:ffibuilder'],
+
   tests_require=['nose'],
   test_suite='nose.collector',
 
@@ -21,7 +24,7 @@ setup(
   license='LGPL v3',
   url='https://github.com/michelp/pyczmq',
   install_requires=[
-        'cffi',
+        'cffi>=1.0.0',
         'docopt',
         'nose',
         ],
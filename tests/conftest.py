@@ -0,0 +1,16 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def wait_for():
+    """Return a function waiting for ``condition()`` to become true,
+    which fails the test after ``timeout`` seconds."""
+    def wait(condition, timeout=5.0):
+        deadline = time.time() + timeout
+        while not condition():
+            if time.time() > deadline:
+                pytest.fail('timed out waiting for %s' % condition.__name__)
+            time.sleep(0.001)
+    return wait
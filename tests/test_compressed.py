@@ -0,0 +1,127 @@
+import os
+import zlib
+
+import numpy
+import pytest
+
+from bladeRF.compressed import CompressedRecorder, CompressedReader, codecs, trailer
+
+
+def samples(num_samples):
+    # A slowly varying tone compresses well after the delta filter.
+    t = numpy.arange(num_samples)
+    iq = numpy.empty((num_samples, 2), numpy.int16)
+    iq[:, 0] = 2000 * numpy.cos(t * 0.01)
+    iq[:, 1] = 2000 * numpy.sin(t * 0.01)
+    return iq
+
+
+def record(path, data, block, **kwargs):
+    recorder = CompressedRecorder(path, chunk_samples=1000, num_chunks=16, **kwargs)
+    for start in range(0, len(data), block):
+        assert recorder.write(data[start:start + block], len(data[start:start + block]))
+    recorder.close()
+    return recorder
+
+
+@pytest.mark.parametrize('codec', sorted(codecs))
+@pytest.mark.parametrize('delta', [True, False])
+@pytest.mark.parametrize('shuffle', [True, False])
+def test_compressed_random_access(codec, delta, shuffle, tmp_path):
+    path = str(tmp_path / 'capture.iqz')
+    data = samples(10500)
+    recorder = record(path, data, 700, codec=codec, delta=delta, shuffle=shuffle)
+    assert recorder.stats()['chunks'] == 11
+    reader = CompressedReader(path)
+    assert reader.num_samples == len(data)
+    assert numpy.array_equal(reader.read(0, len(data)), data)
+    for start, count in [(0, 1), (999, 2), (4321, 3000), (10400, 500)]:
+        assert numpy.array_equal(reader.read(start, count), data[start:start + count])
+    for start, count in [(-1, 10), (0, -1)]:
+        with pytest.raises(ValueError):
+            reader.read(start, count)
+    assert reader.metadata['codec'] == codec
+    reader.close()
+    if codec != 'none':
+        assert os.path.getsize(path) < data.nbytes
+
+
+def test_compressed_timestamps(tmp_path):
+    path = str(tmp_path / 'capture.iqz')
+    data = samples(3000)
+    recorder = CompressedRecorder(path, chunk_samples=1000, num_chunks=4)
+    recorder.write(data[:1500], 1500, timestamp=5000)
+    recorder.write(data[1500:], 1500, timestamp=10000)
+    recorder.close()
+    reader = CompressedReader(path)
+    # The discontinuity ends the second chunk early.
+    assert list(reader.index['timestamp']) == [5000, 6000, 10000, 11000]
+    assert reader.sample_at(6499) == 1499
+    assert reader.sample_at(10001) == 1501
+    assert reader.sample_at(7000) is None
+    assert reader.sample_at(4999) is None
+    reader.close()
+
+
+def test_compressed_unclosed(tmp_path):
+    path = str(tmp_path / 'capture.iqz')
+    data = samples(2500)
+    record(path, data, 500, codec='none', delta=False)
+    with open(path, 'rb+') as f:
+        f.seek(-trailer.size, 2)
+        f.truncate()
+    reader = CompressedReader(path)
+    assert reader.num_samples == len(data)
+    assert numpy.array_equal(reader.read(1200, 800), data[1200:2000])
+    reader.close()
+
+
+def test_compressed_drops_whole_buffers(tmp_path):
+    path = str(tmp_path / 'capture.iqz')
+    data = samples(3000)
+    recorder = CompressedRecorder(path, chunk_samples=1000, num_workers=1, num_chunks=1)
+    recorder.free.get()
+    assert not recorder.write(data[:500], 500)
+    recorder.free.put(numpy.empty((1000, 2), numpy.int16))
+    assert recorder.write(data[500:1000], 500)
+    recorder.close()
+    reader = CompressedReader(path)
+    assert reader.metadata['dropped'] == 1
+    assert list(reader.index['timestamp']) == [500]
+    assert numpy.array_equal(reader.read(0, 1000), data[500:1000])
+    reader.close()
+
+
+def test_compressed_rejects_bad_settings():
+    with pytest.raises(ValueError):
+        CompressedRecorder(os.devnull, codec='bzip2')
+    with pytest.raises(ValueError):
+        CompressedRecorder(os.devnull, codec='zlib', level=12)
+
+
+def test_compressed_worker_error(tmp_path, wait_for):
+    path = str(tmp_path / 'capture.iqz')
+    data = samples(4000)
+    recorder = CompressedRecorder(path, chunk_samples=1000, num_workers=1, num_chunks=8)
+    compress = recorder.compress
+    calls = []
+
+    def failing(data, level):
+        calls.append(level)
+        if len(calls) == 2:
+            raise zlib.error('failed')
+        return compress(data, level)
+
+    recorder.compress = failing
+    assert recorder.write(data[:2000], 2000)
+    wait_for(lambda: recorder.error is not None)
+    assert not recorder.write(data[2000:], 2000)
+    assert recorder.full
+    with pytest.raises(zlib.error):
+        recorder.close()
+    # Only the chunk written before the failure can be read back.
+    reader = CompressedReader(path)
+    assert reader.metadata == {}
+    assert reader.num_samples == 1000
+    assert numpy.array_equal(reader.read(0, 1000), data[:1000])
+    reader.close()
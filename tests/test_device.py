@@ -1,4 +1,10 @@
+import gc
+
+import numpy
+import pytest
+
 import bladeRF
+from bladeRF.device import RingStream, Stream
 
 
 def test_device():
@@ -30,3 +36,238 @@ def test_device():
     assert len(samples) == 4096
 
     device.tx(1024, raw)
+
+
+class FakeSyncLib(object):
+    """Stands in for the sync helpers of ``bladeRF.lib``."""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def sync_rx_into(self, dev, samples, num_samples, chunk_samples, metadata,
+                     timeout_ms, transferred, overruns, max_overruns, num_overruns):
+        self.calls.append((num_samples, chunk_samples, metadata.flags if metadata else None))
+        bladeRF.ffi.buffer(samples, num_samples * 4)[:] = self.data[:num_samples].tobytes()
+        transferred[0] = num_samples
+        overruns[0] = 100
+        num_overruns[0] = 1
+        return 0
+
+    def sync_tx_from(self, dev, samples, num_samples, chunk_samples, metadata,
+                     timeout_ms, transferred):
+        self.calls.append((num_samples, chunk_samples,
+                           (metadata.flags, metadata.timestamp) if metadata else None))
+        self.data = numpy.frombuffer(bladeRF.ffi.buffer(samples, num_samples * 4)[:],
+                                     numpy.int16).reshape(-1, 2)
+        transferred[0] = num_samples
+        return 0
+
+
+def fake_device(monkeypatch):
+    closed = []
+    monkeypatch.setattr(bladeRF, 'open', lambda identifier: bladeRF.ffi.new('struct bladerf **'))
+    monkeypatch.setattr(bladeRF, 'close', closed.append)
+    return bladeRF.Device(), closed
+
+
+def test_device_kept_open_by_modules(monkeypatch):
+    device, closed = fake_device(monkeypatch)
+    rx = device.rx
+    del device
+    gc.collect()
+    # The module still needs the handle.
+    assert closed == []
+    assert rx.device.raw_device == rx.raw_device
+    del rx
+    gc.collect()
+    assert len(closed) == 1
+
+
+def test_device_close(monkeypatch):
+    device, closed = fake_device(monkeypatch)
+    with device as entered:
+        assert entered is device
+    assert len(closed) == 1
+    device.close()
+    del device
+    gc.collect()
+    assert len(closed) == 1
+
+
+def test_read_into(monkeypatch):
+    data = numpy.arange(2000, dtype=numpy.int16).reshape(-1, 2)
+    lib = FakeSyncLib(data)
+    device, closed = fake_device(monkeypatch)
+    monkeypatch.setattr(bladeRF, 'lib', lib)
+    device.rx.format = bladeRF.FORMAT_SC16_Q11_META
+    array = numpy.zeros((1000, 2), numpy.int16)
+    assert device.rx.read_into(array, chunk_samples=256) == (1000, [100])
+    assert numpy.array_equal(array, data)
+    assert lib.calls == [(1000, 256, bladeRF.BLADERF_META_FLAG_RX_NOW)]
+    assert device.rx.stats.overruns == 1
+
+
+def test_write_from(monkeypatch):
+    data = numpy.arange(2000, dtype=numpy.int16).reshape(-1, 2)
+    lib = FakeSyncLib(None)
+    device, closed = fake_device(monkeypatch)
+    monkeypatch.setattr(bladeRF, 'lib', lib)
+    assert device.tx.write_from(data) == 1000
+    assert numpy.array_equal(lib.data, data)
+    device.tx.format = bladeRF.FORMAT_SC16_Q11_META
+    device.tx.write_from(data, timestamp=12345, chunk_samples=500)
+    assert lib.calls == [(1000, 16384, None), (1000, 500, (0, 12345))]
+
+
+def test_read_into_error(monkeypatch):
+    error = bladeRF.lib.BLADERF_ERR_UNEXPECTED
+    lib = FakeSyncLib(None)
+    lib.sync_rx_into = lambda *args: error
+    device, closed = fake_device(monkeypatch)
+    monkeypatch.setattr(bladeRF, 'lib', lib)
+    with pytest.raises(bladeRF.errors.UnexpectedError):
+        device.rx.read_into(numpy.zeros((10, 2), numpy.int16))
+
+
+
+def test_iter_rx(monkeypatch):
+    device, closed = fake_device(monkeypatch)
+    calls = []
+
+    def rx(dev, samples, num_samples, metadata, timeout_ms):
+        n = len(calls)
+        calls.append(int(bladeRF.ffi.cast('uintptr_t', samples)))
+        metadata.timestamp = 1000 + 100 * n
+        # The third transfer comes up short, after an overrun.
+        metadata.actual_count = 60 if n == 2 else num_samples
+        if n == 2:
+            metadata.status = bladeRF.BLADERF_META_STATUS_OVERRUN
+        bladeRF.ffi.buffer(samples, num_samples * 4)[:] = \
+            numpy.full(2 * num_samples, n, numpy.int16).tobytes()
+
+    monkeypatch.setattr(bladeRF, 'rx', rx)
+    with pytest.raises(ValueError):
+        next(device.rx.iter_rx(100))
+    assert calls == []
+    device.rx.format = bladeRF.FORMAT_SC16_Q11_META
+    chunks = []
+    for chunk in device.rx.iter_rx(100, n_buffers=2, num_chunks=4):
+        # Copy, as the buffer is reused two chunks later.
+        chunks.append(chunk._replace(samples=chunk.samples.copy()))
+    assert [(c.timestamp, c.overrun, c.actual_count) for c in chunks] == \
+        [(1000, False, 100), (1100, False, 100), (1200, True, 60), (1300, False, 100)]
+    assert [c.samples.shape for c in chunks] == [(100, 2), (100, 2), (60, 2), (100, 2)]
+    assert [int(c.samples[0, 0]) for c in chunks] == [0, 1, 2, 3]
+    # Two buffers, used in turn.
+    assert calls[0] == calls[2] and calls[1] == calls[3] and calls[0] != calls[1]
+    assert device.rx.stats.delivered == 4
+    assert device.rx.stats.overruns == 1
+
+
+def test_stream_buffer_arrays():
+    stream = Stream.__new__(Stream)
+    memory = [bladeRF.ffi.new('int16_t[]', 2 * 8) for i in range(3)]
+    stream.buffers = bladeRF.ffi.new('void *[]', memory)
+    stream.num_buffers = 3
+    stream.num_samples = 8
+    stream.running = True
+    stream.arrays = stream.buffer_arrays()
+    assert [array.shape for array in stream.arrays] == [(8, 2)] * 3
+    assert all(array.dtype == numpy.int16 for array in stream.arrays)
+    # The views share memory with the buffers, in both directions.
+    stream.arrays[1][2] = (5, -5)
+    assert (memory[1][4], memory[1][5]) == (5, -5)
+    memory[2][15] = 7
+    assert stream.arrays[2][7, 1] == 7
+    stream.current_buff = 2
+    assert stream.current_as_array() is stream.arrays[2]
+    stream.next()
+    assert stream.current_as_array() is stream.arrays[0]
+
+
+class FakeTransfers(object):
+    """Plays the part of libbladeRF for a ``RingStream``: allocates its
+    buffers and completes transfers through the C callback."""
+
+    def __init__(self, monkeypatch, num_buffers, num_transfers, num_samples=16):
+        self.memory = [bladeRF.ffi.new('int16_t[]', 2 * num_samples)
+                       for i in range(num_buffers)]
+        buffers = bladeRF.ffi.new('void *[]', self.memory)
+        monkeypatch.setattr(bladeRF, 'init_stream',
+                            lambda *args: (bladeRF.ffi.NULL, buffers))
+        device, closed = fake_device(monkeypatch)
+        self.stream = RingStream(device, bladeRF.MODULE_RX, num_buffers,
+                                 bladeRF.FORMAT_SC16_Q11, num_samples, num_transfers)
+        self.device = device
+        self.num_samples = num_samples
+        # libbladeRF submits the first num_transfers buffers itself.
+        self.in_flight = list(range(num_transfers))
+        self.count = 0
+
+    def complete(self):
+        """Fill the oldest transfer's buffer with the next count and
+        hand it to the callback.  Returns the buffer it gets back, or
+        None on shutdown."""
+        index = self.in_flight.pop(0)
+        self.stream.arrays[index][:] = self.count
+        self.count += 1
+        next_buffer = bladeRF.lib.sample_ring_callback(
+            bladeRF.ffi.NULL, bladeRF.ffi.NULL, bladeRF.ffi.NULL,
+            self.stream.buffers[index], self.num_samples, self.stream.ring)
+        if next_buffer == bladeRF.ffi.NULL:
+            return None
+        index = self.stream._index[int(bladeRF.ffi.cast('uintptr_t', next_buffer))]
+        self.in_flight.append(index)
+        return index
+
+
+def test_ring_stream_wraps_around(monkeypatch):
+    transfers = FakeTransfers(monkeypatch, 6, 2)
+    stream = transfers.stream
+    received = []
+    # Many more times round than either queue holds.
+    for i in range(25):
+        for j in range(i % 3 + 1):
+            transfers.complete()
+        batch = stream.get(timeout=0)
+        assert len(batch) == i % 3 + 1
+        received.extend(int(stream.arrays[index][0, 0]) for index in batch)
+        stream.release()
+    assert received == list(range(transfers.count))
+    stream.stats.update()
+    assert (stream.stats.delivered, stream.stats.dropped, stream.stats.pending) == \
+        (transfers.count, 0, 0)
+
+
+def test_ring_stream_drops_when_nothing_is_released(monkeypatch):
+    transfers = FakeTransfers(monkeypatch, 4, 2)
+    stream = transfers.stream
+    # Two buffers start out free; after that the callback refills the
+    # buffer it was just given.
+    assert [transfers.complete() for i in range(2)] == [2, 3]
+    assert transfers.complete() == 2
+    assert transfers.complete() == 3
+    stream.stats.update()
+    assert (stream.stats.delivered, stream.stats.dropped, stream.stats.pending) == \
+        (2, 2, 2)
+    batch = stream.get(timeout=0)
+    assert [int(stream.arrays[index][0, 0]) for index in batch] == [0, 1]
+    assert stream.get(timeout=0.01) == []
+    # Releasing one buffer lets the next transfer through.
+    stream.release(1)
+    assert stream.held == batch[1:]
+    assert transfers.complete() == batch[0]
+    assert [int(stream.arrays[index][0, 0]) for index in stream.get(timeout=0)] == [4]
+    stream.stats.update()
+    assert (stream.stats.delivered, stream.stats.dropped) == (3, 2)
+
+
+def test_ring_stream_stop(monkeypatch):
+    transfers = FakeTransfers(monkeypatch, 4, 2)
+    stream = transfers.stream
+    stream.stop()
+    # get() returns at once rather than waiting forever.
+    assert stream.get() == []
+    assert transfers.complete() is None
+    assert stream.stats.snapshot()['delivered'] == 0
@@ -0,0 +1,148 @@
+import numpy
+
+from bladeRF.dsp import (lowpass, Decimator, SpectrumEstimator, SpectrumPipeline,
+                         IQCorrector, Waterfall, Channelizer, Mixer, Resampler,
+                         resampling_ratio)
+
+
+def noise(num_samples, seed=0):
+    rng = numpy.random.RandomState(seed)
+    return (rng.randn(num_samples) + 1j * rng.randn(num_samples)).astype(numpy.complex64)
+
+
+def test_decimator_matches_filter_across_buffers():
+    taps = lowpass(50, 0.2)
+    samples = noise(10000)
+    expected = numpy.convolve(samples, taps)[:len(samples)][::5]
+
+    decimator = Decimator(5, taps)
+    out = numpy.empty(decimator.output_size(3000), numpy.complex64)
+    chunks = []
+    for start, stop in [(0, 1), (1, 4), (4, 1000), (1000, 4000), (4000, 7000), (7000, 10000)]:
+        chunks.append(decimator.process(samples[start:stop], out=out).copy())
+    decimated = numpy.concatenate(chunks)
+    assert len(decimated) == len(expected)
+    assert numpy.allclose(decimated, expected, atol=1e-5)
+
+
+def test_spectrum_estimator_tone():
+    nfft = 256
+    t = numpy.arange(10000)
+    tone = numpy.exp(2j * numpy.pi * 32 * t / nfft).astype(numpy.complex64)
+    for averaging in ('exponential', 'boxcar'):
+        estimator = SpectrumEstimator(nfft, averaging=averaging)
+        segments = estimator.update(tone[:5000]) + estimator.update(tone[5000:])
+        assert segments == (len(tone) - nfft) // estimator.step + 1
+        db = estimator.db()
+        assert numpy.argmax(db) == nfft // 2 + 32
+        assert abs(db.max()) < 0.01
+        freqs = estimator.frequencies(nfft, center=1000)
+        assert freqs[numpy.argmax(db)] == 1032
+
+
+def test_spectrum_pipeline_matches_estimator():
+    samples = noise(20000)
+    expected = SpectrumEstimator(512)
+    pipeline = SpectrumPipeline(SpectrumEstimator(512), num_workers=3, num_jobs=64)
+    for start in range(0, len(samples), 700):
+        expected.update(samples[start:start + 700])
+        assert pipeline.submit(samples[start:start + 700])
+    pipeline.flush()
+    pipeline.close()
+    assert pipeline.estimator.count == expected.count
+    assert numpy.allclose(pipeline.db(), expected.db(), atol=1e-3)
+
+
+def test_iq_corrector_removes_dc_and_imbalance():
+    clean = noise(40000)
+    # Q with 20% extra gain and a 5 degree phase error, plus DC.
+    phase = numpy.radians(5)
+    samples = (clean.real + 1j * 1.2 * (numpy.cos(phase) * clean.imag + numpy.sin(phase) * clean.real)
+               + (0.1 - 0.05j)).astype(numpy.complex64)
+    corrector = IQCorrector()
+    for start in range(0, len(samples), 4000):
+        chunk = samples[start:start + 4000]
+        corrector.process(chunk, out=chunk)
+    assert abs(corrector.dc - (0.1 - 0.05j)) < 0.02
+    tail = samples[-4000:]
+    assert abs(tail.mean()) < 0.05
+    assert abs(numpy.mean(tail.real * tail.imag)) < 0.05
+    assert abs(numpy.var(tail.imag) / numpy.var(tail.real) - 1) < 0.1
+
+
+def test_waterfall_ring_order():
+    waterfall = Waterfall(3, 2, decimation=2, average=2)
+    for i in range(10):
+        waterfall.add(numpy.full(4, i, numpy.float32))
+    # Rows are the means of lines (0, 1), (2, 3), ... (8, 9).
+    assert waterfall.count == 5
+    assert waterfall.latest()[0] == 8.5
+    assert list(waterfall.view()[:, 0]) == [8.5, 6.5, 4.5]
+    assert list(waterfall.view(newest_first=False)[:, 1]) == [4.5, 6.5, 8.5]
+
+
+def test_waterfall_db_scale():
+    waterfall = Waterfall(2, 3, db=True, scale=(-20.0, 0.0))
+    waterfall.add([1.0, 0.1, 1e-6])
+    assert numpy.allclose(waterfall.latest(), [1.0, 0.5, 0.0])
+
+
+def test_channelizer_matches_mix_filter_decimate():
+    num_channels = 8
+    channelizer = Channelizer(num_channels, taps_per_channel=4)
+    taps = channelizer.window.ravel()[::-1]
+    samples = noise(4000)
+    n = numpy.arange(len(samples))
+    chunks = []
+    for start, stop in [(0, 5), (5, 1000), (1000, 1003), (1003, 4000)]:
+        out = channelizer.process(samples[start:stop])
+        assert out.shape[0] == num_channels
+        chunks.append(out)
+    channels = numpy.concatenate(chunks, axis=1)
+    for k in (0, 1, 5):
+        mixed = samples * numpy.exp(-2j * numpy.pi * k * n / num_channels)
+        expected = numpy.convolve(mixed, taps)[:len(samples)]
+        expected = expected[::num_channels]
+        assert channels.shape[1] == len(expected)
+        assert numpy.allclose(channels[k], expected, atol=1e-4)
+
+
+def test_mixer_phase_continuous_across_buffers():
+    samples = noise(5000)
+    mixer = Mixer(1000.0, 48000.0, table_size=700)
+    n = numpy.arange(len(samples))
+    expected = samples * numpy.exp(2j * numpy.pi * 1000.0 * n / 48000.0)
+    shifted = samples.copy()
+    for start, stop in [(0, 3), (3, 2000), (2000, 5000)]:
+        mixer.process(shifted[start:stop], out=shifted[start:stop])
+    assert numpy.allclose(shifted, expected, atol=1e-4)
+
+    mixer.frequency = -500.0
+    more = mixer.process(numpy.ones(100, numpy.complex64))
+    phase = 2 * numpy.pi * 1000.0 * len(samples) / 48000.0
+    assert numpy.allclose(more, numpy.exp(1j * (phase - 2 * numpy.pi * 500.0 * numpy.arange(100) / 48000.0)),
+                          atol=1e-4)
+
+
+def test_resampler_matches_upsample_filter_downsample():
+    for up, down in [(3, 5), (5, 3), (1, 2)]:
+        taps = lowpass(12 * max(up, down), 0.8 / max(up, down))
+        samples = noise(3000)
+        upsampled = numpy.zeros(len(samples) * up, numpy.complex64)
+        upsampled[::up] = samples
+        expected = numpy.convolve(upsampled, taps * up)[:len(upsampled)][::down]
+
+        resampler = Resampler(up, down, taps)
+        chunks = []
+        for start, stop in [(0, 1), (1, 7), (7, 1500), (1500, 1501), (1501, 3000)]:
+            out = numpy.empty(resampler.output_size(stop - start), numpy.complex64)
+            chunks.append(resampler.process(samples[start:stop], out=out).copy())
+        resampled = numpy.concatenate(chunks)
+        assert len(resampled) == len(expected)
+        assert numpy.allclose(resampled, expected, atol=1e-4)
+
+
+def test_resampling_ratio_from_rational_rate():
+    assert resampling_ratio((30720000, 0, 1), 48000) == (1, 640)
+    assert resampling_ratio((4000000, 1, 3), 2000000) == (6000000, 12000001)
+    assert resampling_ratio((4000000, 1, 3), 2000000, max_factor=10) == (1, 2)
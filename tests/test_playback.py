@@ -0,0 +1,53 @@
+import os
+
+import numpy
+
+from bladeRF.playback import Playback
+
+
+def recording(directory, num_samples):
+    path = str(directory / 'recording.sc16')
+    data = numpy.arange(2 * num_samples, dtype=numpy.int16).reshape(-1, 2)
+    data.tofile(path)
+    return path, data
+
+
+def test_playback_loops_from_start(tmp_path):
+    path, data = recording(tmp_path, 10)
+    playback = Playback(path, loop=True, start=4)
+    out = numpy.empty((8, 2), numpy.int16)
+    assert playback.fill(out, 8) == 8
+    assert numpy.array_equal(out, numpy.concatenate([data[4:], data[4:6]]))
+    playback.close()
+
+
+def test_playback_pads_last_buffer(tmp_path):
+    path, data = recording(tmp_path, 10)
+    with open(path, 'rb') as f:
+        for source in (path, f):
+            playback = Playback(source)
+            out = numpy.ones((6, 2), numpy.int16)
+            assert playback.fill(out, 6) == 6
+            assert playback.fill(out, 6) == 4
+            assert numpy.array_equal(out[:4], data[6:])
+            assert not out[4:].any()
+            assert playback.fill(out, 6) == 0
+            playback.close()
+        # Playback leaves a file object it was given open.
+        assert not f.closed
+
+
+def test_playback_reads_pipes(tmp_path):
+    path, data = recording(tmp_path, 10)
+    read_end, write_end = os.pipe()
+    os.write(write_end, data.tobytes())
+    os.close(write_end)
+    f = os.fdopen(read_end, 'rb')
+    playback = Playback(f)
+    out = numpy.empty((8, 2), numpy.int16)
+    assert playback.fill(out, 8) == 8
+    assert numpy.array_equal(out, data[:8])
+    assert playback.fill(out, 8) == 2
+    assert numpy.array_equal(out[:2], data[8:])
+    playback.close()
+    f.close()
@@ -0,0 +1,106 @@
+import errno
+import json
+import os
+import threading
+
+import numpy
+import pytest
+
+from bladeRF.recorder import Recorder
+
+
+def buffers(num_buffers, num_samples):
+    data = numpy.arange(num_buffers * num_samples * 2, dtype=numpy.int16)
+    return data.reshape(num_buffers, num_samples, 2)
+
+
+class BlockedFile(object):
+    """A file whose writes wait until ``unblock`` is set."""
+
+    def __init__(self):
+        self.unblock = threading.Event()
+        self.data = []
+
+    def write(self, data):
+        self.unblock.wait()
+        self.data.append(bytes(data))
+
+    def flush(self):
+        pass
+
+
+class FullDisk(object):
+    """A file whose writes fail after ``limit`` of them."""
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def write(self, data):
+        if not self.limit:
+            raise IOError(errno.ENOSPC, 'No space left on device')
+        self.limit -= 1
+
+    def flush(self):
+        pass
+
+
+def test_recorder_writer_thread(tmp_path):
+    path = str(tmp_path / 'capture.sc16')
+    recorder = Recorder(path, buffer_samples=100, num_slots=16,
+                        metadata={'frequency': 915000000})
+    data = buffers(10, 100)
+    for i, block in enumerate(data):
+        assert recorder.write(block, 100, timestamp=5000 + 100 * i)
+    recorder.close()
+    assert numpy.array_equal(numpy.fromfile(path, numpy.int16), data.ravel())
+    with open(path + '.json') as sidecar:
+        metadata = json.load(sidecar)
+    assert metadata.pop('start_time') > 0
+    assert metadata == {'frequency': 915000000, 'num_samples': 1000, 'dropped': 0,
+                        'start_timestamp': 5000}
+
+
+def test_recorder_drops_when_slots_are_full():
+    f = BlockedFile()
+    recorder = Recorder(f, buffer_samples=100, num_slots=4)
+    data = buffers(6, 100)
+    # The writer holds every slot until the file is unblocked.
+    assert [recorder.write(block, 100) for block in data] == [True] * 4 + [False] * 2
+    assert recorder.stats()['dropped'] == 2
+    assert recorder.max_backlog >= 3
+    f.unblock.set()
+    recorder.close()
+    assert b''.join(f.data) == data[:4].tobytes()
+    assert recorder.stats() == {'written': 400, 'dropped': 2, 'backlog': 0,
+                                'max_backlog': recorder.max_backlog}
+
+
+def test_recorder_preallocated(tmp_path):
+    path = str(tmp_path / 'capture.sc16')
+    recorder = Recorder(path, num_samples=250)
+    assert os.path.getsize(path) == 1000
+    data = buffers(3, 100)
+    assert recorder.write(data[0], 100)
+    assert recorder.write(data[1], 100)
+    assert not recorder.write(data[2], 100)
+    assert recorder.full
+    # Once full, even buffers that would fit are dropped, so the file
+    # has no holes.
+    assert not recorder.write(data[2], 50)
+    recorder.close()
+    recorded = numpy.fromfile(path, numpy.int16)
+    assert numpy.array_equal(recorded, data.reshape(-1)[:400])
+    assert recorder.stats()['dropped'] == 2
+
+
+def test_recorder_write_error(wait_for):
+    recorder = Recorder(FullDisk(2), buffer_samples=100, num_slots=8)
+    data = buffers(3, 100)
+    for block in data:
+        assert recorder.write(block, 100)
+    wait_for(lambda: recorder.error is not None)
+    assert recorder.full
+    with pytest.raises(IOError):
+        recorder.write(data[0], 100)
+    with pytest.raises(IOError):
+        recorder.close()
@@ -0,0 +1,113 @@
+import os
+import time
+
+import numpy
+import pytest
+
+from bladeRF.rolling import RollingRecorder, SegmentIndex
+
+
+def samples(num_samples):
+    data = numpy.arange(2 * num_samples, dtype=numpy.int16)
+    return data.reshape(num_samples, 2)
+
+
+@pytest.fixture
+def wait_ready(wait_for):
+    # A real stream leaves the housekeeping thread a segment's duration
+    # to get the next segment ready.
+    return lambda recorder: wait_for(lambda: not recorder.ready.empty())
+
+
+def test_rolling_keeps_newest_segments(tmp_path, wait_ready):
+    directory = str(tmp_path)
+    data = samples(1000)
+    recorder = RollingRecorder(directory, 100, segment_seconds=1, num_segments=4,
+                               start_timestamp=5000)
+    for start in range(0, 1000, 50):
+        wait_ready(recorder)
+        assert recorder.write(data[start:start + 50], 50)
+    recorder.close()
+    assert recorder.dropped == 0
+    # Segment 6 was recycled into the spare segment 10, which was
+    # removed when the recorder closed.
+    assert sorted(os.listdir(directory)) == [
+        'index.json', 'segment-00000007.sc16', 'segment-00000008.sc16',
+        'segment-00000009.sc16']
+    index = SegmentIndex.load(directory)
+    assert index.start == 5700
+    assert index.locate(5699) is None
+    assert index.locate(5850) == (os.path.join(directory, 'segment-00000008.sc16'), 50)
+    assert numpy.array_equal(index.read(5700, 1000), data[700:])
+    assert len(index.read(5650, 100)) == 0
+
+
+def test_rolling_timestamp_gaps_and_wall_clock(tmp_path):
+    directory = str(tmp_path)
+    data = samples(300)
+    recorder = RollingRecorder(directory, 100, segment_seconds=2, num_segments=3)
+    before = time.time()
+    recorder.write(data[:100], 100, timestamp=1000)
+    recorder.write(data[100:150], 50, timestamp=2000)
+    recorder.write(data[150:], 150)
+    recorder.close()
+    index = recorder.index()
+    assert [run[0] for run in index.runs] == [1000, 2000, 2100]
+    assert numpy.array_equal(index.read(1050, 100), data[50:100])
+    assert numpy.array_equal(index.read(2000, 200), data[100:])
+    assert index.timestamp_at(before - 1) is None
+    assert index.timestamp_at(index.runs[1][1]) == 2000
+    assert os.path.getsize(os.path.join(directory, 'segment-00000001.sc16')) == 100 * 4
+
+
+def test_rolling_drops_when_next_segment_is_late(tmp_path):
+    directory = str(tmp_path)
+    data = samples(400)
+    recorder = RollingRecorder(directory, 100, segment_seconds=1, num_segments=3)
+    spare = recorder.ready.get()
+    # The first 60 samples fill the segment, the rest are dropped.
+    assert recorder.write(data[:40], 40)
+    assert not recorder.write(data[40:200], 160)
+    assert recorder.dropped == 1
+    recorder.ready.put(spare)
+    assert recorder.write(data[200:300], 100)
+    recorder.close()
+    index = SegmentIndex.load(directory)
+    assert [run[0] for run in index.runs] == [0, 200]
+    assert numpy.array_equal(index.read(0, 200), data[:100])
+    assert numpy.array_equal(index.read(200, 100), data[200:300])
+    assert index.locate(150) is None
+
+
+def test_rolling_stale_index(tmp_path, wait_ready):
+    directory = str(tmp_path)
+    data = samples(500)
+    recorder = RollingRecorder(directory, 100, segment_seconds=1, num_segments=3)
+    recorder.write(data[:100], 100)
+    wait_ready(recorder)
+    recorder.write(data[100:200], 100)
+    index = recorder.index()
+    for start in range(200, 500, 100):
+        wait_ready(recorder)
+        recorder.write(data[start:start + 100], 100)
+    recorder.close()
+    with pytest.raises(IOError):
+        index.read(0, 100)
+
+
+def test_rolling_housekeeper_error(tmp_path, wait_for):
+    directory = str(tmp_path)
+    data = samples(300)
+    recorder = RollingRecorder(directory, 100, segment_seconds=1, num_segments=3)
+
+    def prepare(sequence):
+        raise OSError('no space left')
+
+    recorder._prepare = prepare
+    # Moving to the ready segment asks for the next one to be prepared.
+    assert recorder.write(data[:150], 150)
+    wait_for(lambda: recorder.error is not None)
+    with pytest.raises(OSError):
+        recorder.write(data[150:], 150)
+    with pytest.raises(OSError):
+        recorder.close()
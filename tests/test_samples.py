@@ -0,0 +1,41 @@
+import numpy
+import pytest
+
+import bladeRF
+
+
+def test_samples_to_narray():
+    num_samples = 1024
+    raw = bladeRF.ffi.new('int16_t[]', 2 * num_samples)
+    for i in range(2 * num_samples):
+        raw[i] = i % 4096 - 2048
+    out = numpy.empty(2 * num_samples, numpy.complex64)
+    array = bladeRF.samples_to_narray(raw, num_samples, out=out)
+    assert len(array) == num_samples
+    assert array.base is out
+    assert not numpy.isnan(array).any()
+    assert array[0] == -1.0 + (-2047 / 2048.0) * 1j
+    assert array[-1].imag == (2 * num_samples - 1 - 2048) / 2048.0
+
+
+def test_narray_to_samples():
+    array = numpy.array([0.5 + 0.5j, 1.0 - 1.0j, -1.2, 0.0], numpy.complex64)
+    out = numpy.empty(2 * len(array), numpy.int16)
+    samples, clipped = bladeRF.narray_to_samples(array, out=out)
+    assert samples is out
+    assert clipped == 2
+    assert list(out) == [1024, 1024, 2047, -2048, -2048, 0, 0, 0]
+
+    raw, clipped = bladeRF.narray_to_samples(array[:1])
+    assert clipped == 0
+    assert bladeRF.samples_to_narray(raw, 1)[0] == 0.5 + 0.5j
+
+
+def test_narray_to_samples_checks_out():
+    array = numpy.zeros(4, numpy.complex64)
+    for out in (numpy.empty(7, numpy.int16), bladeRF.ffi.new('int16_t[]', 7),
+                bytearray(14)):
+        with pytest.raises(ValueError):
+            bladeRF.narray_to_samples(array, out=out)
+    out = bladeRF.ffi.new('int16_t[]', 8)
+    assert bladeRF.narray_to_samples(array, out=out)[0] is out
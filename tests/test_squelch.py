@@ -0,0 +1,42 @@
+import numpy
+import pytest
+
+from bladeRF.squelch import Squelch
+
+
+def tone(num_samples, amplitude):
+    iq = numpy.zeros((num_samples, 2), numpy.int16)
+    iq[:, 0] = amplitude
+    return iq
+
+
+def test_squelch_hysteresis_and_hang():
+    squelch = Squelch(-20.0, hysteresis=6.0, hang_blocks=1, block_size=100)
+    # -20 dBFS is 205 counts, -26 dBFS is 103.
+    quiet, loud, between = tone(300, 50), tone(300, 300), tone(300, 150)
+    assert not squelch.keep(quiet, 300)
+    assert not squelch.keep(between, 300)
+    assert squelch.process(loud, 300) == 3
+    assert squelch.keep(between, 300)
+    assert squelch.process(quiet, 250) == 1
+    assert list(squelch.mask[0:squelch.num_blocks]) == [1, 0, 0]
+    assert not squelch.is_open
+
+
+def test_squelch_mask_per_block():
+    squelch = Squelch(-20.0, block_size=100)
+    samples = numpy.concatenate([tone(100, 0), tone(100, 1000), tone(50, 0)])
+    assert squelch.process(samples, 250) == 1
+    assert list(squelch.mask[0:3]) == [0, 1, 0]
+
+
+def test_squelch_settings():
+    with pytest.raises(ValueError):
+        Squelch(-20.0, block_size=0)
+    squelch = Squelch(-20.0, hysteresis=6.0, block_size=100)
+    assert squelch.keep(tone(100, 300), 100)
+    # 110 counts is -25.4 dBFS, between the two close levels.
+    squelch.hysteresis = 10.0
+    assert squelch.keep(tone(100, 110), 100)
+    squelch.hysteresis = 3.0
+    assert not squelch.keep(tone(100, 110), 100)
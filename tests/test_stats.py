@@ -0,0 +1,20 @@
+import bladeRF
+from bladeRF.stats import StreamStats
+
+
+def test_stream_stats():
+    stats = StreamStats()
+    for microseconds in [3] * 98 + [900, 5000]:
+        stats.duration(microseconds / 1000000.0)
+    assert stats.percentile(0.5) == 4 / 1000000.0
+    assert stats.percentile(0.99) == 1024 / 1000000.0
+
+    meta = bladeRF.ffi.new('struct bladerf_metadata *')
+    for timestamp in (0, 100, 250):
+        meta.timestamp = timestamp
+        meta.actual_count = 100
+        meta.status = bladeRF.BLADERF_META_STATUS_OVERRUN if timestamp else 0
+        stats.metadata(meta)
+    snapshot = stats.snapshot()
+    assert snapshot['timestamp_gaps'] == 1
+    assert snapshot['overruns'] == 2
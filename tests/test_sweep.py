@@ -0,0 +1,85 @@
+import numpy
+import pytest
+
+import bladeRF
+from bladeRF.sweep import Sweep
+
+
+class FakeReceiver(object):
+    """Receives a tone at ``tone`` Hz wherever it is tuned to."""
+
+    def __init__(self, tone):
+        self.tone = tone
+        self.sample_rate = 1000000
+        self.timestamp = 0
+        self.tuned = [0]
+
+    @property
+    def frequency(self):
+        return self.tuned[-1]
+
+    @frequency.setter
+    def frequency(self, frequency):
+        self.tuned.append(frequency)
+
+    def __call__(self, num_samples, samples=None, metadata=None, timeout_ms=0):
+        t = numpy.arange(num_samples) / float(self.sample_rate)
+        offset = self.tone - self.frequency
+        # Anything outside the band is filtered out.
+        amplitude = 0.5 if abs(offset) < self.sample_rate / 2 else 0.0
+        tone = amplitude * numpy.exp(2j * numpy.pi * offset * t)
+        iq = numpy.frombuffer(bladeRF.ffi.buffer(samples), numpy.int16).reshape(-1, 2)
+        iq[:num_samples, 0] = numpy.round(2048 * tone.real)
+        iq[:num_samples, 1] = numpy.round(2048 * tone.imag)
+        metadata.actual_count = num_samples
+        return samples
+
+
+class FakeDevice(object):
+
+    def __init__(self, tone):
+        self.rx = FakeReceiver(tone)
+        self.tx = FakeReceiver(tone)
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_sweep_stitches_steps(pipelined):
+    device = FakeDevice(tone=1912345678)
+    frequencies = [1900000000 + 750000 * i for i in range(40)]
+    sweep = Sweep(device, frequencies, num_samples=4096, nfft=256,
+                  num_buffers=3, pipelined=pipelined)
+    power = sweep.run()
+    sweep.close()
+    assert device.rx.tuned[1:] == frequencies
+    assert power.shape == sweep.frequency_axis.shape == (40 * 192,)
+    # The axis is continuous across the steps.
+    assert numpy.allclose(numpy.diff(sweep.frequency_axis), 1e6 / 256)
+    peak = sweep.frequency_axis[numpy.argmax(power)]
+    assert abs(peak - 1912345678) <= 1e6 / 256
+    assert power.max() > power.mean() + 40
+    assert sweep.sweeps == 1
+    assert sweep.sweeps_per_second > 0
+
+
+@pytest.mark.parametrize('pipelined', [True, False])
+def test_sweep_processing_error(pipelined):
+    device = FakeDevice(tone=1912345678)
+    frequencies = [1900000000 + 750000 * i for i in range(10)]
+    sweep = Sweep(device, frequencies, num_samples=1024, nfft=256,
+                  num_buffers=2, pipelined=pipelined)
+    process = sweep.process
+
+    def failing(step, buffer, count):
+        if step == 3:
+            raise RuntimeError('processing failed')
+        process(step, buffer, count)
+
+    sweep.process = failing
+    with pytest.raises(RuntimeError):
+        sweep.run()
+    # Every buffer was handed back, so the next sweep runs.
+    sweep.process = process
+    assert sweep.free.qsize() == 2
+    sweep.run()
+    sweep.close()
+    assert sweep.sweeps == 1
@@ -0,0 +1,85 @@
+import numpy
+import pytest
+
+import bladeRF
+from bladeRF.timeline import Timeline
+
+
+class FakeModule(object):
+    """Stands in for a ``Module`` configured with FORMAT_SC16_Q11_META."""
+
+    def __init__(self, timestamp):
+        self.sample_rate = 1000000
+        self.timestamp = timestamp
+        self.calls = []
+
+    def __call__(self, num_samples, samples=None, metadata=None, timeout_ms=0):
+        self.calls.append((num_samples, int(metadata.flags), int(metadata.timestamp)))
+        metadata.actual_count = num_samples
+        return samples
+
+
+class FakeDevice(object):
+
+    def __init__(self):
+        self.rx = FakeModule(1000)
+        self.tx = FakeModule(5000)
+
+
+def test_timeline_rx_at():
+    device = FakeDevice()
+    timeline = Timeline(device)
+    assert timeline.tx_offset == 4000
+    assert 1000 <= timeline.rx_time() < 1000 + device.rx.sample_rate
+    samples = bladeRF.ffi.new('int16_t[]', 200)
+    assert timeline.rx_at(20000, 100, samples) == (samples, 100)
+    assert device.rx.calls == [(100, 0, 20000)]
+    # The clock follows the end of the last transfer.
+    assert timeline.anchor_timestamp == 20100
+    assert timeline.rx_time() >= 20100
+    assert timeline.tx_time() >= 24100
+
+
+def test_timeline_tx_bursts():
+    device = FakeDevice()
+    timeline = Timeline(device)
+    start = bladeRF.BLADERF_META_FLAG_TX_BURST_START
+    end = bladeRF.BLADERF_META_FLAG_TX_BURST_END
+    # The length comes from the samples.
+    assert timeline.tx_at(9000, bladeRF.ffi.new('int16_t[]', 200)) == 9100
+    assert timeline.tx_at(10000, numpy.zeros((50, 2), numpy.int16), burst=False) == 10050
+    assert timeline.tx_at(None, numpy.zeros(60, numpy.int16), burst=False) == 10080
+    with pytest.raises(ValueError):
+        timeline.tx_at(20000, numpy.zeros((10, 2), numpy.int16))
+    assert timeline.tx_at(10080, numpy.zeros((20, 2), numpy.int16), num_samples=5) == 10085
+    assert device.tx.calls == [(100, start | end, 9000), (50, start, 10000),
+                               (30, 0, 10000), (5, end, 10000)]
+
+
+def test_timeline_tx_needs_timestamp():
+    timeline = Timeline(FakeDevice())
+    with pytest.raises(ValueError):
+        timeline.tx_at(None, numpy.zeros((10, 2), numpy.int16))
+    pointer = bladeRF.ffi.cast('int16_t *', bladeRF.ffi.new('int16_t[]', 20))
+    with pytest.raises(ValueError):
+        timeline.tx_at(1000, pointer)
+    assert timeline.tx_at(1000, pointer, num_samples=10) == 1010
+
+
+def test_timeline_tx_error_leaves_burst_closed():
+    device = FakeDevice()
+    timeline = Timeline(device)
+    module = device.tx
+
+    def failing(*args, **kwargs):
+        raise bladeRF.errors.TimeoutError('timed out')
+
+    device.tx = failing
+    with pytest.raises(bladeRF.errors.TimeoutError):
+        timeline.tx_at(1000, numpy.zeros((10, 2), numpy.int16), burst=False)
+    assert not timeline.burst_open
+    device.tx = module
+    # A new burst can start anywhere.
+    assert timeline.tx_at(2000, numpy.zeros((10, 2), numpy.int16)) == 2010
+    assert module.calls == [(10, bladeRF.BLADERF_META_FLAG_TX_BURST_START |
+                             bladeRF.BLADERF_META_FLAG_TX_BURST_END, 2000)]
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy
+import pytest
+
+from bladeRF.squelch import Squelch
+from bladeRF.trigger import TriggeredCapture, threshold_trigger
+
+
+def stream(num_buffers, num_samples, bursts):
+    rng = numpy.random.RandomState(0)
+    data = rng.randint(-10, 10, (num_buffers * num_samples, 2)).astype(numpy.int16)
+    for start, stop in bursts:
+        data[start:stop] = 1500
+    return data.reshape(num_buffers, num_samples, 2)
+
+
+def run(directory, trigger, data, **kwargs):
+    capture = TriggeredCapture(directory, trigger, 1000, buffer_samples=100, **kwargs)
+    for block in data:
+        assert capture.write(block, len(block))
+    capture.close()
+    return capture, directory
+
+
+def burst(directory, number):
+    path = os.path.join(directory, 'burst-%06d.sc16' % number)
+    with open(path + '.json') as sidecar:
+        return numpy.fromfile(path, numpy.int16).reshape(-1, 2), json.load(sidecar)
+
+
+def test_trigger_pre_and_post(tmp_path):
+    data = stream(20, 100, [(520, 560), (1530, 1700)])
+    capture, directory = run(str(tmp_path), threshold_trigger(1000), data,
+                             pre_seconds=0.15, post_seconds=0.12,
+                             metadata={'frequency': 915000000})
+    assert capture.num_events == 2
+    assert sorted(os.listdir(directory)) == [
+        'burst-000000.sc16', 'burst-000000.sc16.json',
+        'burst-000001.sc16', 'burst-000001.sc16.json']
+    flat = data.reshape(-1, 2)
+    samples, info = burst(directory, 0)
+    # 150 samples before the triggering buffer at 500, and 120 after the
+    # last buffer holding the burst.
+    assert info['trigger_sample'] == 500
+    assert info['pre_samples'] == 150
+    assert info['frequency'] == 915000000
+    assert numpy.array_equal(samples, flat[350:720])
+    samples, info = burst(directory, 1)
+    assert info['trigger_sample'] == 1500
+    assert numpy.array_equal(samples, flat[1350:1820])
+
+
+def test_trigger_power_and_max_length(tmp_path):
+    data = stream(10, 100, [(200, 1000)])
+    capture, directory = run(str(tmp_path), Squelch(-10, block_size=50), data,
+                             pre_seconds=0.05, post_seconds=0.1, max_seconds=0.3)
+    assert capture.num_events == 3
+    samples, info = burst(directory, 0)
+    # The maximum length is counted from the trigger.
+    assert numpy.array_equal(samples, data.reshape(-1, 2)[150:500])
+    assert info['num_samples'] == 350
+    # The burst is still on, so the next buffer triggers again, without
+    # pre-trigger samples.
+    samples, info = burst(directory, 1)
+    assert info['trigger_sample'] == 500
+    assert info['pre_samples'] == 0
+
+
+def steal_slots(capture):
+    # Take every slot not held by the ring, waiting for the writer to
+    # hand back the ones it has.
+    return [capture.free.get(timeout=1)
+            for i in range(len(capture.slots) - len(capture.ring))]
+
+
+def give_back(capture, slots):
+    for slot in slots:
+        capture.free.put(slot)
+
+
+def test_trigger_drop_before_burst_empties_ring(tmp_path):
+    directory = str(tmp_path)
+    data = stream(6, 100, [(300, 400)])
+    capture = TriggeredCapture(directory, threshold_trigger(1000), 1000,
+                               pre_seconds=0.15, post_seconds=0.1, buffer_samples=100)
+    assert capture.write(data[0], 100)
+    assert capture.write(data[1], 100)
+    stolen = steal_slots(capture)
+    assert not capture.write(data[2], 100)
+    give_back(capture, stolen)
+    for block in data[3:]:
+        assert capture.write(block, 100)
+    capture.close()
+    samples, info = burst(directory, 0)
+    # The ring before the dropped buffer is not contiguous with the burst.
+    assert info['pre_samples'] == 0
+    assert info['trigger_sample'] == 300
+    assert info['gaps'] == []
+    assert numpy.array_equal(samples, data.reshape(-1, 2)[300:500])
+
+
+def test_trigger_dropped_buffers_in_burst(tmp_path):
+    directory = str(tmp_path)
+    data = stream(6, 100, [(0, 100)])
+    capture = TriggeredCapture(directory, threshold_trigger(1000), 1000,
+                               pre_seconds=0, post_seconds=0.25, buffer_samples=100)
+    stolen = steal_slots(capture)
+    # The dropped triggering buffer still starts the burst, and the drops
+    # count towards the post-trigger time.
+    assert not capture.write(data[0], 100)
+    assert not capture.write(data[1], 100)
+    give_back(capture, stolen)
+    for block in data[2:]:
+        assert capture.write(block, 100)
+    capture.close()
+    assert capture.num_events == 1
+    samples, info = burst(directory, 0)
+    assert info['trigger_sample'] == 0
+    assert info['dropped'] == 2
+    assert info['gaps'] == [[0, 100], [0, 100]]
+    assert numpy.array_equal(samples, data.reshape(-1, 2)[200:350])
+
+
+def test_trigger_writer_error(tmp_path, wait_for):
+    directory = str(tmp_path)
+    # The burst file cannot be created.
+    os.mkdir(os.path.join(directory, 'burst-000000.sc16'))
+    data = stream(4, 100, [(0, 100)])
+    capture = TriggeredCapture(directory, threshold_trigger(1000), 1000,
+                               pre_seconds=0, post_seconds=0.05, buffer_samples=100)
+    assert capture.write(data[0], 100)
+    wait_for(lambda: capture.error is not None)
+    with pytest.raises(EnvironmentError):
+        capture.write(data[1], 100)
+    assert capture.full
+    with pytest.raises(EnvironmentError):
+        capture.close()
+    assert capture.free.qsize() == len(capture.slots)
+
+
+def test_trigger_max_length_shorter_than_pre_trigger(tmp_path):
+    directory = str(tmp_path)
+    data = stream(8, 4, [(16, 32)])
+    capture = TriggeredCapture(directory, threshold_trigger(1000), 1000,
+                               pre_seconds=0.008, post_seconds=0.004,
+                               max_seconds=0.005, buffer_samples=4)
+    for block in data:
+        capture.write(block, 4)
+    capture.close()
+    samples, info = burst(directory, 0)
+    assert info['pre_samples'] == 8
+    assert info['num_samples'] == len(samples) == 13
+    assert numpy.array_equal(samples, data.reshape(-1, 2)[8:21])